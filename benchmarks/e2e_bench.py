@@ -0,0 +1,311 @@
+"""
+Offline end-to-end benchmark: crawls the local listing site from `offline_stack` with a
+real browser and extracts through the real `LLMExtractionStrategy`, pointed at the stub
+LLM via OPENAI_API_BASE, so no request leaves the machine.
+
+    python -m benchmarks.e2e_bench [--sizes 20,100] [--concurrency 1,5] [--batch-size 1]
+                                   [--entrypoints fetch_and_process_page,crawl_cars,http_fetch]
+                                   [--llm-latency-ms 300] [--llm-rps 20]
+                                   [--compare benchmarks/results/<earlier run>.json]
+
+Every combination of entry point, page size and concurrency runs in its own process,
+so peak RSS is per scenario, and fails unless it extracted exactly the cars the site shows. The http_fetch entry point reads the same listings from the
+data the page embeds, without the browser or LLM, as a baseline for both. The report lists cars/sec, p50/p95 LLM latency per listing,
+peak RSS of the Python process and of the browser, and tokens. Results are saved to
+benchmarks/results/. With --compare, the script exits with status 1 when a scenario's
+cars/sec dropped by more than --tolerance against the earlier run.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.offline_stack import OfflineStack
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+# Listings the crawl_cars scenarios reveal per scroll
+LISTINGS_PER_SCROLL = 20
+
+
+def percentile(values: list, q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def time_llm_calls(llm_strategy, listing_latencies: list):
+    """
+    Wraps `llm_strategy.run` so the duration of every call is recorded once for each
+    listing it extracted, i.e. the time each listing waited for the LLM.
+    """
+    run = llm_strategy.run
+
+    def timed_run(url, sections):
+        start = time.perf_counter()
+        try:
+            return run(url, sections)
+        finally:
+            listings = max(1, sections[0].count("LISTING "))
+            listing_latencies.extend([time.perf_counter() - start] * listings)
+
+    llm_strategy.run = timed_run
+    return llm_strategy
+
+
+async def run_fetch_and_process_page(scenario: dict, site_url: str, listing_latencies: list):
+    from config import CSS_SELECTOR, REQUIRED_KEYS
+    from utils.dedup_utils import ListingDedup
+    from utils.processing_utils import fetch_and_process_page, get_batch_llm_strategy, get_llm_strategy
+    from utils.text_reduction_utils import TextReducer
+
+    batch_size = scenario["batch_size"]
+    llm_strategy = get_batch_llm_strategy() if batch_size > 1 else get_llm_strategy()
+    time_llm_calls(llm_strategy, listing_latencies)
+    cars = await fetch_and_process_page(
+        None,
+        site_url,
+        CSS_SELECTOR,
+        llm_strategy,
+        REQUIRED_KEYS,
+        ListingDedup(":memory:", scenario["size"], 0.001, 3),
+        batch_size=batch_size,
+        max_concurrency=scenario["concurrency"],
+        text_reducer=TextReducer(),
+    )
+    return cars, llm_strategy
+
+
+async def run_crawl_cars(scenario: dict, site_url: str, listing_latencies: list):
+    import main
+    from utils import processing_utils
+    from utils.data_loader_utils import read_cars
+
+    # The crawl is configured through main's settings; everything it writes stays in the
+    # scenario's temporary directory
+    main.SEARCH_URLS = [site_url]
+    main.MAX_LISTINGS = scenario["size"]
+    main.MAX_SCROLLS = scenario["size"] // LISTINGS_PER_SCROLL + 1
+    main.SCROLL_WAIT_MS = 500
+    main.LOAD_MORE_SELECTOR = "#load-more"
+    main.EXTRACTION_BATCH_SIZE = scenario["batch_size"]
+    main.MAX_CONCURRENT_EXTRACTIONS = scenario["concurrency"]
+    main.RULE_FAST_PATH = False
+    main.OUTPUT_FORMAT = "csv"
+    main.OUTPUT_PATH = "complete_cars.csv"
+    # The page embeds no data, but the host must not be tried over HTTP either
+    main.HTTP_FETCH = False
+    # The stub answers every model alike, so scenarios measure the main model alone
+    main.MODEL_CASCADE = []
+
+    llm_strategies = []
+
+    def timed(get_strategy):
+        def get_timed_strategy(*args):
+            llm_strategies.append(time_llm_calls(get_strategy(*args), listing_latencies))
+            return llm_strategies[-1]
+
+        return get_timed_strategy
+
+    # main imports the strategy factories when it builds its helpers, so they are patched where they live
+    processing_utils.get_llm_strategy = timed(processing_utils.get_llm_strategy)
+    processing_utils.get_batch_llm_strategy = timed(processing_utils.get_batch_llm_strategy)
+
+    await main.crawl_cars()
+    return list(read_cars("csv", main.OUTPUT_PATH)), llm_strategies[0]
+
+
+async def run_http_fetch(scenario: dict, site_url: str, listing_latencies: list):
+    from utils.dedup_utils import ListingDedup
+    from utils.http_fetch_utils import HttpFetcher, fetch_cars_over_http
+
+    http_fetcher = HttpFetcher(scenario["concurrency"], 20)
+    try:
+        fetched = await fetch_cars_over_http(
+            http_fetcher, site_url, ListingDedup(":memory:", scenario["size"], 0.001, 3), scenario["size"]
+        )
+    finally:
+        await http_fetcher.close()
+    return fetched[0] if fetched is not None else [], None
+
+
+def check_cars(cars: list, size: int) -> None:
+    """Fails the scenario unless it extracted exactly the cars the listing site shows."""
+    from benchmarks.offline_stack import build_records
+    from utils.data_loader_utils import car_identifier
+    from utils.http_fetch_utils import car_from_record
+
+    expected = sorted(car_identifier(car_from_record(record)) for record in build_records(size))
+    extracted = sorted(car_identifier(car) for car in cars)
+    assert extracted == expected, (
+        f"extracted {len(extracted)} cars, expected {len(expected)}; "
+        f"first differences: {sorted(set(extracted) ^ set(expected))[:3]}"
+    )
+
+
+RUNNERS = {
+    "fetch_and_process_page": run_fetch_and_process_page,
+    "crawl_cars": run_crawl_cars,
+    "http_fetch": run_http_fetch,
+}
+
+
+def run_scenario(scenario: dict, site_url: str, llm_base_url: str, results) -> None:
+    """Runs one scenario in this (fresh) process and puts its measurements on `results`."""
+    os.chdir(tempfile.mkdtemp(prefix="web-miner-bench-"))
+    os.environ["OPENAI_API_KEY"] = "sk-offline-bench"
+    os.environ["OPENAI_API_BASE"] = llm_base_url
+
+    from utils.metrics_utils import configure_logging
+
+    configure_logging("ERROR")
+    listing_latencies = []
+    runner = RUNNERS[scenario["entrypoint"]]
+
+    start = time.perf_counter()
+    cars, llm_strategy = asyncio.run(runner(scenario, site_url, listing_latencies))
+    elapsed = time.perf_counter() - start
+    check_cars(cars, scenario["size"])
+    cars = len(cars)
+
+    results.put(
+        {
+            **scenario,
+            "cars": cars,
+            "seconds": elapsed,
+            "cars_per_second": cars / elapsed if elapsed else 0.0,
+            "p50_listing_latency_ms": percentile(listing_latencies, 0.5) * 1000,
+            "p95_listing_latency_ms": percentile(listing_latencies, 0.95) * 1000,
+            # ru_maxrss is in kilobytes on Linux; the browser is a child process of the crawl
+            "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+            "peak_browser_rss_mb": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024,
+            # http_fetch makes no LLM requests
+            "prompt_tokens": llm_strategy.total_usage.prompt_tokens if llm_strategy else 0,
+            "completion_tokens": llm_strategy.total_usage.completion_tokens if llm_strategy else 0,
+            "llm_requests": len(llm_strategy.usages) if llm_strategy else 0,
+        }
+    )
+
+
+def scenario_key(result: dict) -> tuple:
+    return result["entrypoint"], result["size"], result["concurrency"], result["batch_size"]
+
+
+def print_report(results: list) -> None:
+    print(
+        f"\n{'Entry point':<24} {'Size':>5} {'Conc':>5} {'Cars':>5} {'Cars/s':>8} {'p50 ms':>8} {'p95 ms':>8} "
+        f"{'RSS MB':>8} {'Browser':>8} {'Prompt tk':>10} {'Compl tk':>9}"
+    )
+    print("-" * 110)
+    for result in results:
+        print(
+            f"{result['entrypoint']:<24} {result['size']:>5} {result['concurrency']:>5} {result['cars']:>5} "
+            f"{result['cars_per_second']:>8.2f} {result['p50_listing_latency_ms']:>8.0f} "
+            f"{result['p95_listing_latency_ms']:>8.0f} {result['peak_rss_mb']:>8.0f} "
+            f"{result['peak_browser_rss_mb']:>8.0f} {result['prompt_tokens']:>10,} {result['completion_tokens']:>9,}"
+        )
+
+
+def compare(results: list, baseline_path: str, tolerance: float) -> list:
+    """Returns the scenarios whose cars/sec dropped by more than `tolerance` against the baseline."""
+    with open(baseline_path, encoding="utf-8") as file:
+        baseline = {scenario_key(result): result for result in json.load(file)["results"]}
+
+    regressions = []
+    print(f"\nAgainst {baseline_path}:")
+    for result in results:
+        previous = baseline.get(scenario_key(result))
+        if previous is None or not previous["cars_per_second"]:
+            continue
+        change = result["cars_per_second"] / previous["cars_per_second"] - 1
+        print(f"{result['entrypoint']:<24} {result['size']:>5} {result['concurrency']:>5} cars/s {change:>+8.1%}")
+        if change < -tolerance:
+            regressions.append(result)
+    return regressions
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end crawl benchmark.")
+    parser.add_argument("--sizes", default="20,100", help="listings per page, comma separated")
+    parser.add_argument("--concurrency", default="1,5", help="concurrent LLM requests, comma separated")
+    parser.add_argument("--batch-size", type=int, default=1, help="listings per LLM request")
+    parser.add_argument("--entrypoints", default="fetch_and_process_page,crawl_cars")
+    parser.add_argument("--llm-latency-ms", type=float, default=300, help="latency of every stub LLM response")
+    parser.add_argument("--llm-rps", type=float, default=20, help="stub LLM requests per second before 429s; 0 for none")
+    parser.add_argument("--compare", help="earlier results file to compare cars/sec against")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="allowed cars/sec drop against --compare")
+    args = parser.parse_args()
+
+    scenarios = [
+        {"entrypoint": entrypoint, "size": int(size), "concurrency": int(concurrency), "batch_size": args.batch_size}
+        for entrypoint in args.entrypoints.split(",")
+        for size in args.sizes.split(",")
+        for concurrency in args.concurrency.split(",")
+    ]
+
+    context = multiprocessing.get_context("spawn")
+    results = []
+    with OfflineStack(args.llm_latency_ms, args.llm_rps) as stack:
+        for scenario in scenarios:
+            # fetch_and_process_page only sees the initial page load, so it gets every listing at once
+            per_scroll = LISTINGS_PER_SCROLL if scenario["entrypoint"] == "crawl_cars" else scenario["size"]
+            queue = context.Queue()
+            process = context.Process(
+                target=run_scenario,
+                args=(
+                    scenario,
+                    stack.site_url(scenario["size"], per_scroll, embed=scenario["entrypoint"] == "http_fetch"),
+                    stack.llm_base_url,
+                    queue,
+                ),
+            )
+            print(f"[INFO] Running {scenario}")
+            process.start()
+            process.join()
+            if process.exitcode != 0:
+                print(f"[ERROR] Scenario {scenario} failed with exit code {process.exitcode}")
+                continue
+            results.append(queue.get())
+        print(f"[INFO] Stub LLM served {stack.llm_requests} requests and refused {stack.llm_rate_limited} (429)")
+
+    print_report(results)
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    results_path = os.path.join(RESULTS_DIR, f"e2e-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(results_path, mode="w", encoding="utf-8") as file:
+        json.dump(
+            {
+                "created_at": time.time(),
+                "commit": git_commit(),
+                "python": platform.python_version(),
+                "settings": vars(args),
+                "results": results,
+            },
+            file,
+            indent=2,
+        )
+    print(f"\nResults saved to '{results_path}'.")
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} scenarios are more than {args.tolerance:.0%} slower.")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Microbenchmark for the per-element overhead of turning listing HTML into the markdown
+that is sent to the LLM, before and after dropping the temporary file round trip.
+
+    python -m benchmarks.element_overhead_bench [iterations]
+
+No LLM is called; only the HTML -> markdown step is measured.
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+from crawl4ai import AsyncWebCrawler, CrawlerRunConfig
+
+from utils.processing_utils import get_browser_config, html_to_markdown
+
+SAMPLE_LISTING_HTML = (
+    '<div class="MuiStack-root css-ufpmpi"><a class="MuiBox-root css-1x3sg7" href="/cars/12345">'
+    '<img class="MuiBox-root css-ak3bw" src="https://images.clutch.ca/12345.jpg" alt="car"/>'
+    '<div class="MuiStack-root css-1v6cq7k"><h6 class="MuiTypography-root MuiTypography-subtitle1 css-1p8b5yr">'
+    '2020 Mercedes-Benz C-Class C 300 4MATIC</h6>'
+    '<p class="MuiTypography-root MuiTypography-body2 css-1qf6xz4">72,942 km</p>'
+    '<div class="MuiStack-root css-9jay18"><span class="MuiTypography-root css-1vkq3c">SALE</span>'
+    '<span class="MuiTypography-root MuiTypography-h6 css-nz9yd4">$32,990</span>'
+    '<span class="MuiTypography-root MuiTypography-caption css-16f4ktd">or $321/biweekly</span></div>'
+    '<svg class="MuiSvgIcon-root" viewBox="0 0 24 24"><path d="M12 2C6.48 2 2 6.48 2 12s4.48 10 10 10 10-4.48 10-10S17.52 2 12 2z"></path></svg>'
+    '</div></a></div>'
+)
+
+
+async def markdown_via_tempfile(crawler: AsyncWebCrawler, element_html: str) -> str:
+    """
+    The previous path: write the element to a temporary file and load it back through crawl4ai.
+    """
+    with tempfile.NamedTemporaryFile(mode='w', suffix='.html', delete=False, encoding='utf-8') as temp_file:
+        temp_file.write(f"<html><body>{element_html}</body></html>")
+        temp_file_path = temp_file.name
+    try:
+        result = await crawler.arun(
+            url=f"file://{temp_file_path.replace(chr(92), '/')}",
+            config=CrawlerRunConfig(cache_mode="BYPASS", css_selector="", verbose=False),
+        )
+        return result.markdown
+    finally:
+        os.unlink(temp_file_path)
+
+
+async def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    browser_config = get_browser_config()
+    browser_config.verbose = False
+
+    async with AsyncWebCrawler(config=browser_config) as crawler:
+        # Warm up both paths so one-off imports and browser start-up are not measured
+        await markdown_via_tempfile(crawler, SAMPLE_LISTING_HTML)
+        html_to_markdown(f"<html><body>{SAMPLE_LISTING_HTML}</body></html>")
+
+        start = time.perf_counter()
+        for _ in range(iterations):
+            await markdown_via_tempfile(crawler, SAMPLE_LISTING_HTML)
+        before = (time.perf_counter() - start) / iterations
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        html_to_markdown(f"<html><body>{SAMPLE_LISTING_HTML}</body></html>")
+    after = (time.perf_counter() - start) / iterations
+
+    print(f"Iterations:                   {iterations}")
+    print(f"tempfile + crawler.arun:      {before * 1000:8.3f} ms per element")
+    print(f"in-memory html_to_markdown:   {after * 1000:8.3f} ms per element")
+    print(f"Speed-up:                     {before / after:8.1f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,260 @@
+"""
+Local stand-ins for the two services a crawl talks to, served from one HTTP server on
+127.0.0.1 so benchmarks run without network access:
+
+- GET /cars?size=N&per_scroll=M  a listing page built from the recorded listings in
+  benchmarks/fixtures. It shows M listings and appends the next M when the page is
+  scrolled to the bottom or the "#load-more" button is clicked, until N are shown.
+  With &embed=1 the page also embeds all N listings as Next.js page data.
+- GET /api/cars?size=N&page=P&per_page=M  the same listings as JSON records, M per page.
+- POST /v1/chat/completions      an OpenAI-compatible stub LLM that answers crawl4ai's
+  extraction prompt with the cars it finds with regular expressions, after
+  `llm_latency_ms`, and answers 429 once more than `llm_requests_per_second` arrive.
+"""
+import html
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from benchmarks.text_reduction_bench import load_fixtures
+
+CONTENT_PATTERN = re.compile(r"<url_content>\n(.*)\n</url_content>", re.DOTALL)
+LISTING_HEADING_PATTERN = re.compile(r"LISTING (\d+)")
+MARKDOWN_IMAGE_PATTERN = re.compile(r"!\[[^\]]*\]\([^)]*\)")
+MARKDOWN_LINK_TARGET_PATTERN = re.compile(r"\]\(<?[^)]*>?\)")
+STRUCK_PATTERN = re.compile(r"~~[^~]*~~")
+CAR_PATTERN = re.compile(
+    r"(?<!\d)((?:19|20)\d{2})\s+(.+?)\s*(\d{1,3}(?:,\d{3})*\s*km).*?(\$\d{1,3}(?:,\d{3})*)",
+    re.DOTALL,
+)
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html><head><title>Offline listings</title>
+<style>.MuiStack-root.css-ufpmpi {{ min-height: 320px; }}</style></head>
+<body><main id="listings">{initial}</main><button id="load-more">Load more</button>
+{embedded}<script>
+const remaining = {remaining};
+const perScroll = {per_scroll};
+function loadMore() {{
+  const main = document.getElementById("listings");
+  remaining.splice(0, perScroll).forEach(listing => main.insertAdjacentHTML("beforeend", listing));
+}}
+document.getElementById("load-more").addEventListener("click", loadMore);
+window.addEventListener("scroll", () => {{
+  if (window.innerHeight + window.scrollY >= document.body.scrollHeight - 10) loadMore();
+}});
+</script></body></html>"""
+
+
+def numbered_name(name: str, number: int) -> str:
+    # In parentheses, so the number does not run into the mileage that follows the title in markdown
+    return f"{name} ({number})"
+
+
+def build_listing(fixture: dict, number: int) -> str:
+    """A recorded listing with its own link and model name, so every listing is a distinct car."""
+    car = fixture["car"]
+    title = f"{car['year']} {car['name']}"
+    numbered_title = f"{car['year']} {numbered_name(car['name'], number)}"
+    listing_html = fixture["html"].replace(title, numbered_title)
+    if html.escape(title) != title:
+        listing_html = listing_html.replace(html.escape(title), html.escape(numbered_title))
+    return listing_html.replace('href="/cars/', f'href="/cars/{number}-', 1)
+
+
+def build_record(fixture: dict, number: int) -> dict:
+    """The listing `build_listing` renders, as a site's JSON API would serve it."""
+    car = fixture["car"]
+    make, model = car["name"].split(" ", 1)
+    return {
+        "id": number,
+        "year": car["year"],
+        "make": make,
+        "model": numbered_name(model, number),
+        "mileage": {"value": int(re.sub(r"[^\d]", "", car["kilometers"])), "unitCode": "KMT"},
+        "price": int(re.sub(r"[^\d]", "", car["price"])),
+        "currency": "CAD",
+        "url": re.search(r'href="([^"]*)"', build_listing(fixture, number)).group(1),
+    }
+
+
+def build_records(size: int) -> list:
+    fixtures = load_fixtures()
+    return [build_record(fixtures[number % len(fixtures)], number) for number in range(size)]
+
+
+def build_listing_page(size: int, per_scroll: int, embed: bool = False) -> str:
+    fixtures = load_fixtures()
+    listings = [build_listing(fixtures[number % len(fixtures)], number) for number in range(size)]
+    embedded = ""
+    if embed:
+        data = {"props": {"pageProps": {"listings": build_records(size)}}}
+        embedded = f'<script id="__NEXT_DATA__" type="application/json">{json.dumps(data)}</script>\n'
+    return PAGE_TEMPLATE.format(
+        initial="".join(listings[:per_scroll]),
+        remaining=json.dumps(listings[per_scroll:]).replace("</", "<\\/"),
+        per_scroll=per_scroll,
+        embedded=embedded,
+    )
+
+
+def extract_cars(content: str) -> list:
+    """
+    Finds the cars in the listing markdown or reduced text of one extraction prompt.
+    Batched listings get the index of their 'LISTING <n>' heading.
+    """
+    content = content.replace("\\n", "\n").replace('\\"', '"')
+    content = STRUCK_PATTERN.sub("", MARKDOWN_LINK_TARGET_PATTERN.sub(" ", MARKDOWN_IMAGE_PATTERN.sub(" ", content)))
+    parts = LISTING_HEADING_PATTERN.split(content)
+    sections = [(None, content)] if len(parts) == 1 else [(int(parts[i]), parts[i + 1]) for i in range(1, len(parts), 2)]
+
+    cars = []
+    for index, section in sections:
+        match = CAR_PATTERN.search(section)
+        if match is None:
+            continue
+        car = {"year": int(match.group(1)), "name": match.group(2).strip(" #[]"), "kilometers": match.group(3), "price": match.group(4)}
+        if index is not None:
+            car = {"index": index, **car}
+        cars.append(car)
+    return cars
+
+
+class RequestRateLimiter:
+    """Token bucket of `requests_per_second` requests, with one second of burst."""
+
+    def __init__(self, requests_per_second: float):
+        self.requests_per_second = requests_per_second
+        self.tokens = requests_per_second
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def allow(self) -> bool:
+        if not self.requests_per_second:
+            return True
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.requests_per_second, self.tokens + (now - self.updated_at) * self.requests_per_second)
+            self.updated_at = now
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+class OfflineStack:
+    """
+    Runs the local site and stub LLM in a background thread:
+
+        with OfflineStack(llm_latency_ms=300, llm_requests_per_second=20) as stack:
+            stack.site_url(size=100, per_scroll=20), stack.llm_base_url
+
+    `llm_requests` and `llm_rate_limited` count the completions served and refused.
+    """
+
+    def __init__(self, llm_latency_ms: float = 0, llm_requests_per_second: float = 0):
+        self.llm_latency_ms = llm_latency_ms
+        self.rate_limiter = RequestRateLimiter(llm_requests_per_second)
+        self.llm_requests = 0
+        self.llm_rate_limited = 0
+        self.page_cache = {}
+        self.server = None
+        self.thread = None
+
+    def site_url(self, size: int, per_scroll: int, embed: bool = False) -> str:
+        url = f"http://127.0.0.1:{self.server.server_port}/cars?size={size}&per_scroll={per_scroll}"
+        return f"{url}&embed=1" if embed else url
+
+    def api_url(self, size: int, per_page: int) -> str:
+        """The listings API of a search, with the `{page}` placeholder of LISTINGS_API_URLS."""
+        return f"http://127.0.0.1:{self.server.server_port}/api/cars?size={size}&per_page={per_page}&page={{page}}"
+
+    @property
+    def llm_base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_port}/v1"
+
+    def listing_page(self, size: int, per_scroll: int, embed: bool = False) -> bytes:
+        key = (size, per_scroll, embed)
+        if key not in self.page_cache:
+            self.page_cache[key] = build_listing_page(size, per_scroll, embed).encode("utf-8")
+        return self.page_cache[key]
+
+    def api_page(self, size: int, page: int, per_page: int) -> bytes:
+        records = build_records(size)[(page - 1) * per_page : page * per_page]
+        return json.dumps({"page": page, "results": records}).encode("utf-8")
+
+    def complete(self, request: dict) -> dict:
+        prompt = request["messages"][-1]["content"]
+        match = CONTENT_PATTERN.search(prompt)
+        cars = extract_cars(match.group(1)) if match else []
+        content = f"<blocks>{json.dumps(cars)}</blocks>\n<score>5</score>"
+        prompt_tokens, completion_tokens = len(prompt) // 4, len(content) // 4
+        return {
+            "id": f"chatcmpl-offline-{self.llm_requests}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "gpt-4o"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+    def __enter__(self) -> "OfflineStack":
+        stack = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def send_body(self, status: int, content_type: str, body: bytes):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                query = parse_qs(url.query)
+                size = int(query.get("size", ["20"])[0])
+                if url.path == "/api/cars":
+                    page = int(query.get("page", ["1"])[0])
+                    per_page = int(query.get("per_page", ["20"])[0])
+                    self.send_body(200, "application/json", stack.api_page(size, page, per_page))
+                    return
+                if url.path != "/cars":
+                    self.send_body(404, "text/plain", b"not found")
+                    return
+                per_scroll = int(query.get("per_scroll", [str(size)])[0])
+                embed = query.get("embed", ["0"])[0] == "1"
+                self.send_body(200, "text/html; charset=utf-8", stack.listing_page(size, per_scroll, embed))
+
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                if not self.path.endswith("/chat/completions"):
+                    self.send_body(404, "application/json", b'{"error": {"message": "not found"}}')
+                    return
+                if not stack.rate_limiter.allow():
+                    stack.llm_rate_limited += 1
+                    error = {"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}}
+                    self.send_body(429, "application/json", json.dumps(error).encode("utf-8"))
+                    return
+                time.sleep(stack.llm_latency_ms / 1000)
+                stack.llm_requests += 1
+                self.send_body(200, "application/json", json.dumps(stack.complete(request)).encode("utf-8"))
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
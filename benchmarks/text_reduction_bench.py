@@ -0,0 +1,89 @@
+"""
+Tokens sent to the LLM per listing with and without the text reduction stage, and a
+regression check that reduction keeps extraction accuracy on the saved fixtures.
+
+    python -m benchmarks.text_reduction_bench [--llm]
+
+Without `--llm` nothing is sent to the LLM: the check is that every field of the expected
+car is still present in the reduced text. With `--llm` every fixture is extracted from
+both the markdown and the reduced text with `get_llm_strategy`, and the reduced text must
+get at least as many cars right. The script exits with status 1 on a regression.
+"""
+import json
+import os
+import sys
+
+from dotenv import load_dotenv
+
+from utils.processing_utils import LISTING_URL, get_llm_strategy, listing_markdown
+from utils.text_reduction_utils import count_tokens, reduce_listing_html
+
+FIXTURES_PATH = os.path.join(os.path.dirname(__file__), "fixtures", "listings.json")
+
+
+def load_fixtures():
+    with open(FIXTURES_PATH, encoding="utf-8") as file:
+        return json.load(file)
+
+
+def missing_fields(text: str, car: dict) -> list:
+    return [key for key, value in car.items() if str(value) not in text]
+
+
+def extract_with_llm(llm_strategy, content: str):
+    extracted_data = llm_strategy.run(LISTING_URL, [content])
+    car = extracted_data[0] if extracted_data else None
+    if not isinstance(car, dict):
+        return None
+    return {key: car.get(key) for key in ("year", "name", "kilometers", "price")}
+
+
+def main():
+    use_llm = "--llm" in sys.argv[1:]
+    fixtures = load_fixtures()
+    llm_strategy = None
+    if use_llm:
+        load_dotenv()
+        llm_strategy = get_llm_strategy()
+        llm_strategy.verbose = False
+
+    regressions = []
+    total_before = total_after = 0
+    correct_before = correct_after = 0
+    print(f"{'Listing':<8} {'Tokens before':>14} {'Tokens after':>13} {'Reduction':>10}")
+    print("-" * 48)
+    for number, fixture in enumerate(fixtures, 1):
+        markdown = listing_markdown([fixture["html"]], False)
+        reduced = reduce_listing_html(fixture["html"])
+        before, after = count_tokens(markdown), count_tokens(reduced)
+        total_before += before
+        total_after += after
+        print(f"{number:<8} {before:>14,} {after:>13,} {1 - after / before:>10.1%}")
+
+        missing = missing_fields(reduced, fixture["car"])
+        if missing:
+            regressions.append(f"Listing {number}: reduced text lost {missing}")
+
+        if use_llm:
+            correct_before += extract_with_llm(llm_strategy, markdown) == fixture["car"]
+            correct_after += extract_with_llm(llm_strategy, reduced) == fixture["car"]
+
+    print("-" * 48)
+    print(f"{'Average':<8} {total_before / len(fixtures):>14,.1f} {total_after / len(fixtures):>13,.1f} "
+          f"{1 - total_after / total_before:>10.1%}")
+    if use_llm:
+        print(f"\nLLM accuracy: markdown {correct_before}/{len(fixtures)}, reduced {correct_after}/{len(fixtures)}")
+        if correct_after < correct_before:
+            regressions.append(f"Reduced text extracted {correct_after} cars correctly, markdown {correct_before}")
+        llm_strategy.show_usage()
+
+    if regressions:
+        print("\nRegressions:")
+        for regression in regressions:
+            print(f"- {regression}")
+        sys.exit(1)
+    print(f"\nNo regressions on {len(fixtures)} fixtures.")
+
+
+if __name__ == "__main__":
+    main()
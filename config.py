@@ -7,4 +7,158 @@ REQUIRED_KEYS = [
     "name",
     "kilometers",
     "price",
-]
\ No newline at end of file
+]
+
+# Number of listings packed into a single LLM request (1 disables batching)
+EXTRACTION_BATCH_SIZE = 10
+# How many times listings that failed inside a batch are re-sent
+BATCH_RETRIES = 1
+
+# Maximum number of LLM extraction requests in flight at the same time
+MAX_CONCURRENT_EXTRACTIONS = 5
+
+# Model cascade: listings are first extracted with these cheaper (or locally served)
+# models, in order, and only escalated to the next one, and finally to openai/gpt-4o,
+# when the car a model returns does not validate or does not match the listing's text.
+# MODEL_API_BASES maps a model to the URL it is served at, e.g.
+# {"ollama/llama3.1": "http://localhost:11434"}. An empty list sends every listing to gpt-4o.
+MODEL_CASCADE = ["openai/gpt-4o-mini"]
+MODEL_API_BASES = {}
+
+# On-disk cache of extracted cars, keyed by listing content and extraction version
+EXTRACTION_CACHE_PATH = "extraction_cache.sqlite3"
+EXTRACTION_CACHE_TTL_SECONDS = 7 * 24 * 60 * 60
+EXTRACTION_CACHE_MAX_ENTRIES = 100_000
+
+# Parse listings with fixed patterns first and only send the ones the rules cannot handle to the LLM
+RULE_FAST_PATH = True
+
+# Infinite scrolling: stop after this many listings or scrolls, or when a scroll brings
+# no new listings within SCROLL_WAIT_MS
+MAX_LISTINGS = 500
+MAX_SCROLLS = 50
+SCROLL_WAIT_MS = 5000
+# Selector of a "load more" button for sites that paginate instead of scrolling
+LOAD_MORE_SELECTOR = None
+
+# Search URLs crawled in parallel on the shared browser
+SEARCH_URLS = [BASE_URL]
+# Warm pages kept by the shared browser, and how many crawls a page serves before it is replaced
+BROWSER_POOL_SIZE = 2
+BROWSER_PAGE_MAX_USES = 20
+
+# Navigation profile for listing pages: these resource types and domains are never
+# loaded. Set ALLOWED_DOMAINS to a list to block every other domain as well.
+BLOCK_RESOURCES = True
+BLOCKED_RESOURCE_TYPES = ["image", "media", "font"]
+BLOCKED_DOMAINS = [
+    "google-analytics.com",
+    "googletagmanager.com",
+    "doubleclick.net",
+    "googlesyndication.com",
+    "facebook.net",
+    "facebook.com",
+    "hotjar.com",
+    "segment.io",
+    "segment.com",
+    "tiktok.com",
+    "bing.com",
+]
+ALLOWED_DOMAINS = None
+
+# Browserless fetching: a search is first fetched over pooled HTTP (HTTP/2 when the h2
+# package is installed) and its cars are read from the data the page embeds (Next.js
+# __NEXT_DATA__, JSON-LD) or from the site's listings API, without the LLM. The browser
+# and LLM only crawl searches whose data could not be read, and scroll for the rest of a
+# search whose page embeds fewer than MAX_LISTINGS listings and has no API. LISTINGS_API_URLS
+# maps a search URL to its JSON API, with a {page} placeholder counted from 1.
+HTTP_FETCH = True
+LISTINGS_API_URLS = {}
+HTTP_MAX_CONNECTIONS = 8
+HTTP_TIMEOUT_SECONDS = 20
+
+# Cars are appended to the output as they are extracted, in batches of OUTPUT_FLUSH_EVERY.
+# OUTPUT_FORMAT is "csv" (OUTPUT_PATH is a file) or "parquet" (OUTPUT_PATH is a directory).
+OUTPUT_FORMAT = "csv"
+OUTPUT_PATH = "complete_cars.csv"
+OUTPUT_FLUSH_EVERY = 20
+# Keep the output of an interrupted run and skip the cars it already holds
+RESUME_RUN = False
+
+# Send listings to the LLM as their visible text, without markup and payment details,
+# instead of markdown. With REPORT_REDUCTION_TOKENS the summary also counts the tokens
+# the markdown would have taken, which costs an extra conversion per listing.
+REDUCE_LISTING_TEXT = True
+REPORT_REDUCTION_TOKENS = False
+
+# Every listing ever crawled, so unchanged listings are not extracted again, and the
+# file the added/removed/re-priced listings of each run are written to
+LISTING_INDEX_PATH = "listing_index.sqlite3"
+LISTING_DIFF_PATH = "listing_diff.json"
+
+# Listings are deduplicated by their link (or content digest) in DEDUP_PATH, which a
+# resumed run and the worker processes of a crawl share. A Bloom filter sized for
+# DEDUP_EXPECTED_LISTINGS at DEDUP_FALSE_POSITIVE_RATE keeps most lookups in memory. A
+# listing with the same year, name and kilometers as one of an earlier run that this run
+# has not seen, whose text fingerprint is at most NEAR_DUPLICATE_MAX_DISTANCE bits (of 64)
+# away, is the same car relisted. It is counted, not dropped.
+DEDUP_PATH = "listing_dedup.sqlite3"
+DEDUP_EXPECTED_LISTINGS = 1_000_000
+DEDUP_FALSE_POSITIVE_RATE = 0.001
+NEAR_DUPLICATE_MAX_DISTANCE = 3
+
+# Lowest level that is logged ("DEBUG" logs every listing, "INFO" only progress, "ERROR"
+# only failures), as "text" lines or one "json" object per line
+LOG_LEVEL = "INFO"
+LOG_FORMAT = "text"
+# Stage timings and event counters of each run, as JSON and as a Prometheus textfile.
+# Worker processes add their worker id to both file names.
+METRICS_JSON_PATH = "metrics.json"
+METRICS_PROMETHEUS_PATH = "metrics.prom"
+
+# Coordinator/worker mode: with more than one worker process, SEARCH_URLS are queued in
+# WORK_QUEUE_PATH and crawled by that many processes. Workers on other hosts join with
+# `python main.py --worker --workers N` when WORK_QUEUE_PATH and WORKER_OUTPUT_DIR are on
+# shared storage, N being the number of processes of the crawl they split the rate limits with.
+WORKER_PROCESSES = 1
+WORK_QUEUE_PATH = "work_queue.sqlite3"
+WORKER_OUTPUT_DIR = "worker_output"
+# A unit whose worker does not renew its lease for this long is handed to another worker,
+# and a unit is given up on after this many attempts
+WORK_LEASE_SECONDS = 300
+WORK_MAX_ATTEMPTS = 3
+WORK_POLL_SECONDS = 2
+
+# Daemon mode (`python main.py --daemon`): the browser, LLM strategy and caches stay warm
+# and crawl jobs are submitted to a local HTTP API, on DAEMON_SOCKET_PATH if set (a Unix
+# socket) or else on DAEMON_HOST:DAEMON_PORT. Jobs beyond DAEMON_MAX_CONCURRENT_JOBS wait,
+# and the cars of the last DAEMON_MAX_FINISHED_JOBS finished jobs are kept in memory.
+DAEMON_HOST = "127.0.0.1"
+DAEMON_PORT = 8765
+DAEMON_SOCKET_PATH = None
+DAEMON_MAX_CONCURRENT_JOBS = 2
+DAEMON_MAX_FINISHED_JOBS = 100
+
+# Request scheduling: LLM and site requests wait for token buckets of requests (and, for
+# the LLM, tokens) per minute, and run at most as many at a time as an AIMD limit allows,
+# which grows while requests succeed quickly and halves on throttling (429) or slow
+# responses. 0 disables a bucket. The limits are shared by the processes of one crawl:
+# each of its worker processes (`--workers`) gets its share.
+SCHEDULE_REQUESTS = True
+LLM_REQUESTS_PER_MINUTE = 500
+LLM_TOKENS_PER_MINUTE = 30000
+SITE_REQUESTS_PER_MINUTE = 60
+SITE_MAX_CONCURRENCY = 2
+# Failed and throttled requests are retried this many times, after a random delay of up
+# to REQUEST_BACKOFF_BASE_SECONDS * 2^attempt (at most REQUEST_BACKOFF_MAX_SECONDS)
+REQUEST_MAX_RETRIES = 5
+REQUEST_BACKOFF_BASE_SECONDS = 1.0
+REQUEST_BACKOFF_MAX_SECONDS = 60.0
+# A response slower than this many times the fastest recent one counts as congestion
+REQUEST_LATENCY_TOLERANCE = 3.0
+
+# Dashboard (data_exploration.py): rows per page of its tables, and the number of cars
+# above which scatter and bubble charts show exact counts per bin instead of every car
+DASHBOARD_PAGE_SIZE = 100
+DASHBOARD_MAX_POINTS = 5000
+DASHBOARD_BINS = 50
@@ -1,9 +1,13 @@
 import streamlit as st
+import numpy as np
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 
+from config import DASHBOARD_BINS, DASHBOARD_MAX_POINTS, DASHBOARD_PAGE_SIZE, OUTPUT_FORMAT, OUTPUT_PATH
+from utils.aggregation_utils import KM_LABELS, PRICE_LABELS, CarAggregates, ParquetCars, dataset_version, label_rows
+
 # Set page configuration
 st.set_page_config(page_title="Car Data Explorer", layout="wide")
 
@@ -16,43 +20,68 @@ This app provides an interactive exploration of used car data, including perspec
 
 # Helper function to clean the data
 def clean_data(df):
-    # Clean kilometers: remove " km" and commas, convert to int
-    df['kilometers'] = df['kilometers'].str.replace(' km', '').str.replace(',', '').astype(int)
-
-    # Clean price: remove "$" and commas, convert to int
-    df['price'] = df['price'].str.replace('$', '').str.replace(',', '').astype(int)
+    # Kilometers are stored as integers and prices as integer cents, so no parsing is needed
+    df['price'] = df['price_cents'] / 100
 
-    # Extract brand from name (first word of the name)
-    df['brand'] = df['name'].str.split().str[0]
+    # The make is split off the name when cars are saved
+    df['brand'] = df['make']
 
     return df
 
 
-# Load and clean the data
-@st.cache_data
-def load_data():
-    df = pd.read_csv("complete_cars.csv")
+# Load and clean the data, and aggregate it once per version of the file. The version is
+# the content hash, so the aggregates are rebuilt when the crawler rewrites the file
+@st.cache_resource(max_entries=2)
+def load_aggregates(output_format, path, version):
+    if output_format == "parquet":
+        # Columnar: only the columns the dashboard uses are read, and the tables query
+        # their pages from the output with the filters pushed down to the scan
+        cars = ParquetCars(path, ['year', 'make', 'name', 'kilometers', 'price_cents'],
+                           prepare=lambda page: label_rows(clean_data(page)))
+        df = cars.read()
+        df['make'] = df['make'].astype('category')
+    else:
+        cars = None
+        df = pd.read_csv(
+            path,
+            dtype={'year': 'int16', 'make': 'category', 'kilometers': 'int64', 'price_cents': 'int64', 'currency': 'category'},
+        )
     df = clean_data(df)
-    return df
+    return CarAggregates(df, cars)
+
 
+# Tables show one page of the cars matching `filters`, so only that page is read and sent
+# to the browser. The number of matching cars comes from the aggregates
+def show_page(filters, key):
+    count = aggregates.summary(filters)['count']
+    pages = max(1, -(-count // DASHBOARD_PAGE_SIZE))
+    page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, key=key) if pages > 1 else 1
+    start = (page - 1) * DASHBOARD_PAGE_SIZE
+    st.dataframe(aggregates.page(filters, start, start + DASHBOARD_PAGE_SIZE))
+    st.caption(f"Rows {min(start + 1, count):,}-{min(start + DASHBOARD_PAGE_SIZE, count):,} of {count:,}")
 
-df = load_data()
+
+aggregates = load_aggregates(OUTPUT_FORMAT, OUTPUT_PATH, dataset_version(OUTPUT_PATH))
+df = aggregates.df
+# Past DASHBOARD_MAX_POINTS cars, scatter and bubble charts show binned counts instead of every car
+large_data = len(df) > DASHBOARD_MAX_POINTS
 
 # --- Overview Section ---
 st.header("📊 Overview")
-st.write(f"**Total Cars:** {len(df)}")
-st.write(f"**Average Price:** ${df['price'].mean():,.2f}")
-st.write(f"**Average Kilometers:** {df['kilometers'].mean():,.0f} km")
-st.write(f"**Oldest Car:** {df['year'].min()}")
-st.write(f"**Newest Car:** {df['year'].max()}")
+summary = aggregates.summary()
+st.write(f"**Total Cars:** {summary['count']}")
+st.write(f"**Average Price:** ${summary['average_price']:,.2f}")
+st.write(f"**Average Kilometers:** {summary['average_kilometers']:,.0f} km")
+st.write(f"**Oldest Car:** {summary['oldest_year']}")
+st.write(f"**Newest Car:** {summary['newest_year']}")
 
 # Display raw data
 st.subheader("Raw Data")
-st.dataframe(df)
+show_page({}, "raw_page")
 
 # --- Cars by Year ---
 st.header("📅 Cars by Year")
-year_counts = df['year'].value_counts().sort_index()
+year_counts = aggregates.counts('year')
 fig_year = px.bar(
     x=year_counts.index,
     y=year_counts.values,
@@ -64,39 +93,37 @@ fig_year = px.bar(
 st.plotly_chart(fig_year, use_container_width=True)
 
 # Filter by year
-selected_years = st.multiselect("Filter by Year", options=sorted(df['year'].unique()),
-                                default=sorted(df['year'].unique()))
-filtered_by_year = df[df['year'].isin(selected_years)]
-st.write(f"**Cars in Selected Years ({len(filtered_by_year)} cars):**")
-st.dataframe(filtered_by_year)
+selected_years = st.multiselect("Filter by Year", options=aggregates.options['year'],
+                                default=aggregates.options['year'])
+year_filter = {'year': selected_years}
+st.write(f"**Cars in Selected Years ({aggregates.summary(year_filter)['count']} cars):**")
+show_page(year_filter, "year_page")
 
 # --- Price Analysis ---
 st.header("💰 Price Analysis")
 
-# Histogram of prices
-fig_price_hist = px.histogram(
-    df,
-    x='price',
-    nbins=10,
+# Histogram of prices, binned on the server
+price_counts, price_edges = aggregates.price_histogram(10)
+fig_price_hist = px.bar(
+    x=(price_edges[:-1] + price_edges[1:]) / 2,
+    y=price_counts,
     title="Distribution of Car Prices",
-    labels={'price': 'Price ($)'},
+    labels={'x': 'Price ($)', 'y': 'count'},
     color_discrete_sequence=['#00CC96']
 )
+fig_price_hist.update_traces(width=price_edges[1] - price_edges[0])
 st.plotly_chart(fig_price_hist, use_container_width=True)
 
 # Most and least expensive cars
-most_expensive = df.loc[df['price'].idxmax()]
-least_expensive = df.loc[df['price'].idxmin()]
+most_expensive = aggregates.most_expensive
+least_expensive = aggregates.least_expensive
 st.write(
     f"**Most Expensive Car:** {most_expensive['name']} ({most_expensive['year']}) - ${most_expensive['price']:,.0f}")
 st.write(
     f"**Least Expensive Car:** {least_expensive['name']} ({least_expensive['year']}) - ${least_expensive['price']:,.0f}")
 
 # Price range analysis
-price_bins = [0, 20000, 30000, 40000, 50000, float('inf')]
-price_labels = ['< $20,000', '$20,000-$30,000', '$30,000-$40,000', '$40,000-$50,000', '> $50,000']
-df['price_range'] = pd.cut(df['price'], bins=price_bins, labels=price_labels, include_lowest=True)
-price_range_counts = df['price_range'].value_counts().sort_index()
+price_range_counts = aggregates.counts('price_range')
 fig_price_range = px.bar(
     x=price_range_counts.index,
     y=price_range_counts.values,
@@ -108,33 +135,46 @@ fig_price_range = px.bar(
 st.plotly_chart(fig_price_range, use_container_width=True)
 
 # Filter by price range
-selected_price_range = st.multiselect("Filter by Price Range", options=price_labels, default=price_labels)
-filtered_by_price = df[df['price_range'].isin(selected_price_range)]
-st.write(f"**Cars in Selected Price Range ({len(filtered_by_price)} cars):**")
-st.dataframe(filtered_by_price)
+selected_price_range = st.multiselect("Filter by Price Range", options=PRICE_LABELS, default=PRICE_LABELS)
+price_filter = {'price_range': selected_price_range}
+st.write(f"**Cars in Selected Price Range ({aggregates.summary(price_filter)['count']} cars):**")
+show_page(price_filter, "price_page")
 
 # --- Kilometers Analysis ---
 st.header("🛞 Kilometers Analysis")
 
 # Scatter plot of kilometers vs price
-fig_km_price = px.scatter(
-    df,
-    x='kilometers',
-    y='price',
-    color='year',
-    size='price',
-    hover_data=['name'],
-    title="Kilometers vs Price (Color by Year, Size by Price)",
-    labels={'kilometers': 'Kilometers Driven', 'price': 'Price ($)'},
-    color_continuous_scale='Plasma'
-)
+if large_data:
+    km_price_counts, km_edges, price_edges = aggregates.density('kilometers', 'price', DASHBOARD_BINS)
+    fig_km_price = go.Figure(go.Heatmap(
+        x=(km_edges[:-1] + km_edges[1:]) / 2,
+        y=(price_edges[:-1] + price_edges[1:]) / 2,
+        z=np.where(km_price_counts > 0, km_price_counts, np.nan),
+        colorscale='Plasma',
+        colorbar={'title': 'Cars'},
+        hovertemplate="Kilometers: %{x:,.0f}<br>Price: $%{y:,.0f}<br>Cars: %{z:,}<extra></extra>",
+    ))
+    fig_km_price.update_layout(
+        title=f"Kilometers vs Price (Cars per Bin, {len(df):,} Cars)",
+        xaxis_title='Kilometers Driven',
+        yaxis_title='Price ($)',
+    )
+else:
+    fig_km_price = px.scatter(
+        df,
+        x='kilometers',
+        y='price',
+        color='year',
+        size='price',
+        hover_data=['name'],
+        title="Kilometers vs Price (Color by Year, Size by Price)",
+        labels={'kilometers': 'Kilometers Driven', 'price': 'Price ($)'},
+        color_continuous_scale='Plasma'
+    )
 st.plotly_chart(fig_km_price, use_container_width=True)
 
 # Kilometer range analysis
-km_bins = [0, 25000, 50000, 75000, 100000, float('inf')]
-km_labels = ['0-25,000 km', '25,001-50,000 km', '50,001-75,000 km', '75,001-100,000 km', '> 100,000 km']
-df['km_range'] = pd.cut(df['kilometers'], bins=km_bins, labels=km_labels, include_lowest=True)
-km_range_counts = df['km_range'].value_counts().sort_index()
+km_range_counts = aggregates.counts('km_range')
 fig_km_range = px.bar(
     x=km_range_counts.index,
     y=km_range_counts.values,
@@ -146,16 +186,16 @@ fig_km_range = px.bar(
 st.plotly_chart(fig_km_range, use_container_width=True)
 
 # Filter by kilometer range
-selected_km_range = st.multiselect("Filter by Kilometer Range", options=km_labels, default=km_labels)
-filtered_by_km = df[df['km_range'].isin(selected_km_range)]
-st.write(f"**Cars in Selected Kilometer Range ({len(filtered_by_km)} cars):**")
-st.dataframe(filtered_by_km)
+selected_km_range = st.multiselect("Filter by Kilometer Range", options=KM_LABELS, default=KM_LABELS)
+km_filter = {'km_range': selected_km_range}
+st.write(f"**Cars in Selected Kilometer Range ({aggregates.summary(km_filter)['count']} cars):**")
+show_page(km_filter, "km_page")
 
 # --- Brand Analysis ---
 st.header("🏷️ Brand Analysis")
 
 # Pie chart of brands
-brand_counts = df['brand'].value_counts()
+brand_counts = aggregates.counts('brand').sort_values(ascending=False)
 fig_brand_pie = px.pie(
     names=brand_counts.index,
     values=brand_counts.values,
@@ -165,39 +205,58 @@ fig_brand_pie = px.pie(
 st.plotly_chart(fig_brand_pie, use_container_width=True)
 
 # Filter by brand
-selected_brands = st.multiselect("Filter by Brand", options=sorted(df['brand'].unique()),
-                                 default=sorted(df['brand'].unique()))
-filtered_by_brand = df[df['brand'].isin(selected_brands)]
-st.write(f"**Cars by Selected Brand ({len(filtered_by_brand)} cars):**")
-st.dataframe(filtered_by_brand)
+selected_brands = st.multiselect("Filter by Brand", options=aggregates.options['brand'],
+                                 default=aggregates.options['brand'])
+brand_filter = {'brand': selected_brands}
+st.write(f"**Cars by Selected Brand ({aggregates.summary(brand_filter)['count']} cars):**")
+show_page(brand_filter, "brand_page")
 
 # --- Creative Visualizations ---
 st.header("🎨 Creative Visualizations")
 
 # Bubble chart: Year vs Price, size by kilometers, color by brand
-fig_bubble = px.scatter(
-    df,
-    x='year',
-    y='price',
-    size='kilometers',
-    color='brand',
-    hover_data=['name', 'kilometers'],
-    title="Bubble Chart: Year vs Price (Size by Kilometers, Color by Brand)",
-    labels={'year': 'Year', 'price': 'Price ($)'},
-    color_discrete_sequence=px.colors.qualitative.D3
-)
+if large_data:
+    bubbles = aggregates.bubbles(DASHBOARD_BINS)
+    fig_bubble = px.scatter(
+        bubbles,
+        x='year',
+        y='price',
+        size='count',
+        color='brand',
+        hover_data={'count': ':,', 'kilometers': ':,.0f'},
+        title="Bubble Chart: Year vs Price (Size by Number of Cars, Color by Brand)",
+        labels={'year': 'Year', 'price': 'Price ($)', 'count': 'Cars', 'kilometers': 'Average Kilometers'},
+        color_discrete_sequence=px.colors.qualitative.D3
+    )
+else:
+    fig_bubble = px.scatter(
+        df,
+        x='year',
+        y='price',
+        size='kilometers',
+        color='brand',
+        hover_data=['name', 'kilometers'],
+        title="Bubble Chart: Year vs Price (Size by Kilometers, Color by Brand)",
+        labels={'year': 'Year', 'price': 'Price ($)'},
+        color_discrete_sequence=px.colors.qualitative.D3
+    )
 st.plotly_chart(fig_bubble, use_container_width=True)
 
-# Box plot: Price distribution by year
-fig_box = px.box(
-    df,
-    x='year',
-    y='price',
-    title="Price Distribution by Year",
-    labels={'year': 'Year', 'price': 'Price ($)'},
-    color='year',
-    color_discrete_sequence=px.colors.qualitative.Set1
-)
+# Box plot: Price distribution by year, from quartiles computed on the server
+price_by_year = aggregates.price_by_year()
+fig_box = go.Figure()
+for color, row in zip(px.colors.qualitative.Set1 * len(price_by_year), price_by_year.itertuples()):
+    fig_box.add_trace(go.Box(
+        x=[row.year],
+        lowerfence=[row.min],
+        q1=[row.q1],
+        median=[row.median],
+        q3=[row.q3],
+        upperfence=[row.max],
+        name=str(row.year),
+        marker_color=color,
+    ))
+fig_box.update_layout(title="Price Distribution by Year", xaxis_title='Year', yaxis_title='Price ($)')
 st.plotly_chart(fig_box, use_container_width=True)
 
 # --- Footer ---
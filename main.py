@@ -1,64 +1,623 @@
+import argparse
 import asyncio
+import multiprocessing
+import os
 import random
+import shutil
+import signal
 
-from crawl4ai import AsyncWebCrawler
 from dotenv import load_dotenv
 
-from config import BASE_URL, CSS_SELECTOR, REQUIRED_KEYS
-from utils.data_loader_utils import (
-    save_cars_to_csv,
-)
-from utils.data_loader_utils import (
-    fetch_and_process_page,
-    get_browser_config,
-    get_llm_strategy,
+from config import (
+    ALLOWED_DOMAINS,
+    BATCH_RETRIES,
+    BLOCK_RESOURCES,
+    BLOCKED_DOMAINS,
+    BLOCKED_RESOURCE_TYPES,
+    BROWSER_PAGE_MAX_USES,
+    BROWSER_POOL_SIZE,
+    CSS_SELECTOR,
+    DAEMON_HOST,
+    DAEMON_MAX_CONCURRENT_JOBS,
+    DAEMON_MAX_FINISHED_JOBS,
+    DAEMON_PORT,
+    DAEMON_SOCKET_PATH,
+    DEDUP_EXPECTED_LISTINGS,
+    DEDUP_FALSE_POSITIVE_RATE,
+    DEDUP_PATH,
+    EXTRACTION_BATCH_SIZE,
+    EXTRACTION_CACHE_MAX_ENTRIES,
+    EXTRACTION_CACHE_PATH,
+    EXTRACTION_CACHE_TTL_SECONDS,
+    HTTP_FETCH,
+    HTTP_MAX_CONNECTIONS,
+    HTTP_TIMEOUT_SECONDS,
+    LISTING_DIFF_PATH,
+    LISTING_INDEX_PATH,
+    LISTINGS_API_URLS,
+    LLM_REQUESTS_PER_MINUTE,
+    LLM_TOKENS_PER_MINUTE,
+    LOAD_MORE_SELECTOR,
+    LOG_FORMAT,
+    LOG_LEVEL,
+    MAX_CONCURRENT_EXTRACTIONS,
+    MAX_LISTINGS,
+    MAX_SCROLLS,
+    METRICS_JSON_PATH,
+    METRICS_PROMETHEUS_PATH,
+    MODEL_API_BASES,
+    MODEL_CASCADE,
+    NEAR_DUPLICATE_MAX_DISTANCE,
+    OUTPUT_FLUSH_EVERY,
+    OUTPUT_FORMAT,
+    OUTPUT_PATH,
+    REQUIRED_KEYS,
+    REDUCE_LISTING_TEXT,
+    REPORT_REDUCTION_TOKENS,
+    REQUEST_BACKOFF_BASE_SECONDS,
+    REQUEST_BACKOFF_MAX_SECONDS,
+    REQUEST_LATENCY_TOLERANCE,
+    REQUEST_MAX_RETRIES,
+    RESUME_RUN,
+    RULE_FAST_PATH,
+    SCHEDULE_REQUESTS,
+    SCROLL_WAIT_MS,
+    SEARCH_URLS,
+    SITE_MAX_CONCURRENCY,
+    SITE_REQUESTS_PER_MINUTE,
+    WORK_LEASE_SECONDS,
+    WORK_MAX_ATTEMPTS,
+    WORK_POLL_SECONDS,
+    WORK_QUEUE_PATH,
+    WORKER_OUTPUT_DIR,
+    WORKER_PROCESSES,
 )
+from utils.metrics_utils import ERROR, INFO, configure_logging, log, metrics
+from utils.work_queue_utils import WorkQueue, default_worker_id
+
+# crawl4ai, Playwright and the modules built on them take most of a second to import, so
+# they are imported by the functions that crawl. The coordinator, the CLI itself and
+# spawned workers only pay for what they use.
 
 load_dotenv()
 
 
-async def crawl_cars():
+def get_crawl_helpers(processes=1):
     """
-    Main function to crawl car data from the website using infinite scrolling.
+    Builds the LLM strategy, the cascade of cheaper models tried before it and the helpers
+    that sit in front of them, shared by every crawl in the process. The request rate
+    limits are split evenly between `processes` processes crawling at the same time.
     """
-    browser_config = get_browser_config()
-    llm_strategy = get_llm_strategy()
-    session_id = "car_crawl_session"
-
-    all_cars = []
-    seen_identifiers = set()
-
-    async with AsyncWebCrawler(config=browser_config) as crawler:
-        # Fetch and process data using infinite scrolling
-        cars = await fetch_and_process_page(
-            crawler,
-            BASE_URL,
-            CSS_SELECTOR,
-            llm_strategy,
-            session_id,
-            REQUIRED_KEYS,
-            seen_identifiers,
+    from utils.cache_utils import ExtractionCache, extraction_version
+    from utils.cascade_utils import ModelCascade
+    from utils.navigation_utils import NavigationProfile
+    from utils.processing_utils import get_batch_llm_strategy, get_llm_strategy
+    from utils.rate_limit_utils import RequestScheduler
+    from utils.rule_extraction_utils import RuleExtractor
+    from utils.text_reduction_utils import TextReducer
+
+    get_strategy = get_batch_llm_strategy if EXTRACTION_BATCH_SIZE > 1 else get_llm_strategy
+    llm_strategy = get_strategy()
+    model_cascade = (
+        ModelCascade([get_strategy(provider, MODEL_API_BASES.get(provider)) for provider in MODEL_CASCADE])
+        if MODEL_CASCADE
+        else None
+    )
+    extraction_cache = ExtractionCache(
+        EXTRACTION_CACHE_PATH,
+        extraction_version(llm_strategy),
+        EXTRACTION_CACHE_TTL_SECONDS,
+        EXTRACTION_CACHE_MAX_ENTRIES,
+        [tier.version for tier in model_cascade.tiers] if model_cascade is not None else (),
+    )
+    rule_extractor = RuleExtractor() if RULE_FAST_PATH else None
+    navigation_profile = (
+        NavigationProfile(BLOCKED_RESOURCE_TYPES, BLOCKED_DOMAINS, ALLOWED_DOMAINS) if BLOCK_RESOURCES else None
+    )
+    text_reducer = TextReducer(REPORT_REDUCTION_TOKENS) if REDUCE_LISTING_TEXT else None
+    request_scheduler = (
+        RequestScheduler(
+            LLM_REQUESTS_PER_MINUTE / processes,
+            LLM_TOKENS_PER_MINUTE / processes,
+            MAX_CONCURRENT_EXTRACTIONS,
+            SITE_REQUESTS_PER_MINUTE / processes,
+            SITE_MAX_CONCURRENCY,
+            REQUEST_MAX_RETRIES,
+            REQUEST_BACKOFF_BASE_SECONDS,
+            REQUEST_BACKOFF_MAX_SECONDS,
+            REQUEST_LATENCY_TOLERANCE,
         )
+        if SCHEDULE_REQUESTS
+        else None
+    )
+    return (
+        llm_strategy,
+        extraction_cache,
+        rule_extractor,
+        navigation_profile,
+        text_reducer,
+        request_scheduler,
+        model_cascade,
+    )
+
+
+def open_listing_dedup(path=None, expected_listings=None):
+    from utils.dedup_utils import ListingDedup
+
+    return ListingDedup(
+        path or DEDUP_PATH,
+        expected_listings or DEDUP_EXPECTED_LISTINGS,
+        DEDUP_FALSE_POSITIVE_RATE,
+        NEAR_DUPLICATE_MAX_DISTANCE,
+    )
+
+
+def open_http_fetcher():
+    """The pooled HTTP client searches are tried with before the browser, or None when HTTP_FETCH is off."""
+    if not HTTP_FETCH:
+        return None
+    from utils.http_fetch_utils import HttpFetcher
 
-        if not cars:
-            print("No cars extracted.")
-        else:
-            all_cars.extend(cars)
+    return HttpFetcher(HTTP_MAX_CONNECTIONS, HTTP_TIMEOUT_SECONDS)
 
-    if all_cars:
-        save_cars_to_csv(all_cars, "complete_cars.csv")
-        print(f"Saved {len(all_cars)} cars to 'complete_cars.csv'.")
+
+async def close_http_fetcher(http_fetcher):
+    if http_fetcher is not None:
+        http_fetcher.show_stats()
+        await http_fetcher.close()
+
+
+def start_listing_dedup():
+    """
+    Opens the listings of the run: a resumed run keeps the listings the interrupted one
+    saved and retries the rest, any other run starts with none.
+    """
+    seen_listings = open_listing_dedup()
+    if RESUME_RUN:
+        seen_listings.discard_unconfirmed()
     else:
-        print("No cars were found during the crawl.")
+        seen_listings.reset()
+    return seen_listings
+
 
+def show_crawl_stats(
+    llm_strategy, extraction_cache, rule_extractor, navigation_profile, text_reducer, request_scheduler, model_cascade
+):
     llm_strategy.show_usage()
+    if model_cascade is not None:
+        model_cascade.show_stats()
+    extraction_cache.show_stats()
+    if rule_extractor is not None:
+        rule_extractor.show_stats()
+    if text_reducer is not None:
+        text_reducer.show_stats()
+    if navigation_profile is not None:
+        navigation_profile.show_stats()
+    if request_scheduler is not None:
+        request_scheduler.show_stats()
+    metrics.show_stats()
+
+
+def export_metrics(worker_id=None):
+    if worker_id is None:
+        metrics.export(METRICS_JSON_PATH, METRICS_PROMETHEUS_PATH)
+        return
+    json_root, json_extension = os.path.splitext(METRICS_JSON_PATH)
+    prometheus_root, prometheus_extension = os.path.splitext(METRICS_PROMETHEUS_PATH)
+    metrics.export(
+        f"{json_root}.{worker_id}{json_extension}",
+        f"{prometheus_root}.{worker_id}{prometheus_extension}",
+    )
+
+
+async def crawl_url(
+    browser_pool,
+    url,
+    car_sink,
+    seen_listings,
+    llm_strategy,
+    extraction_cache,
+    rule_extractor,
+    navigation_profile,
+    listing_index,
+    text_reducer,
+    request_scheduler,
+    css_selector=None,
+    max_listings=None,
+    max_scrolls=None,
+    http_fetcher=None,
+    model_cascade=None,
+):
+    """
+    Crawls one search URL into `car_sink` and returns the number of cars saved. The
+    selector and limits default to CSS_SELECTOR, MAX_LISTINGS and MAX_SCROLLS.
+
+    With an `http_fetcher`, the search is fetched over HTTP first, and the browser only
+    crawls it when the site's data could not be read or held just the first listings.
+    Raises `CrawlError` when the page failed to load or the crawl broke off, so a failure
+    is not mistaken for an empty search.
+    """
+    from utils.processing_utils import stream_cars
+
+    saved_count = 0
+    if http_fetcher is not None:
+        from utils.http_fetch_utils import fetch_cars_over_http
+
+        fetched = await fetch_cars_over_http(
+            http_fetcher,
+            url,
+            seen_listings,
+            max_listings or MAX_LISTINGS,
+            listings_api_url=LISTINGS_API_URLS.get(url),
+            listing_index=listing_index,
+            request_scheduler=request_scheduler,
+        )
+        if fetched is not None:
+            cars, complete = fetched
+            with metrics.time("saving"):
+                for car in cars:
+                    car_sink.write(car)
+            saved_count = len(cars)
+            if complete:
+                metrics.count("cars_saved", saved_count)
+                return saved_count
+
+    # Extract cars while the page keeps scrolling in more listings
+    async for car in stream_cars(
+        browser_pool,
+        url,
+        css_selector or CSS_SELECTOR,
+        llm_strategy,
+        REQUIRED_KEYS,
+        seen_listings,
+        max_listings or MAX_LISTINGS,
+        max_scrolls or MAX_SCROLLS,
+        SCROLL_WAIT_MS,
+        load_more_selector=LOAD_MORE_SELECTOR,
+        batch_size=EXTRACTION_BATCH_SIZE,
+        batch_retries=BATCH_RETRIES,
+        max_concurrency=MAX_CONCURRENT_EXTRACTIONS,
+        extraction_cache=extraction_cache,
+        rule_extractor=rule_extractor,
+        navigation_profile=navigation_profile,
+        listing_index=listing_index,
+        text_reducer=text_reducer,
+        request_scheduler=request_scheduler,
+        model_cascade=model_cascade,
+    ):
+        with metrics.time("saving"):
+            car_sink.write(car)
+        saved_count += 1
+    metrics.count("cars_saved", saved_count)
+    return saved_count
+
+
+async def crawl_cars():
+    """
+    Main function to crawl car data from the website using infinite scrolling.
+    """
+    from utils.browser_utils import BrowserPool
+    from utils.data_loader_utils import open_car_sink
+    from utils.listing_index_utils import ListingIndex
+    from utils.processing_utils import get_browser_config
+
+    helpers = get_crawl_helpers()
+    llm_strategy, extraction_cache, rule_extractor, navigation_profile, text_reducer, request_scheduler, model_cascade = helpers
+    listing_index = ListingIndex(LISTING_INDEX_PATH)
+    seen_listings = start_listing_dedup()
+    http_fetcher = open_http_fetcher()
+
+    # Claimed listings count as saved once their cars are flushed to the output
+    car_sink = open_car_sink(OUTPUT_FORMAT, OUTPUT_PATH, OUTPUT_FLUSH_EVERY, RESUME_RUN, on_flush=seen_listings.confirm)
+
+    # All search URLs share one browser and its pool of warm pages
+    with car_sink:
+        async with BrowserPool(get_browser_config(), BROWSER_POOL_SIZE, BROWSER_PAGE_MAX_USES) as browser_pool:
+            saved_counts = await asyncio.gather(
+                *(
+                    crawl_url(
+                        browser_pool,
+                        url,
+                        car_sink,
+                        seen_listings,
+                        llm_strategy,
+                        extraction_cache,
+                        rule_extractor,
+                        navigation_profile,
+                        listing_index,
+                        text_reducer,
+                        request_scheduler,
+                        http_fetcher=http_fetcher,
+                        model_cascade=model_cascade,
+                    )
+                    for url in SEARCH_URLS
+                ),
+                # One search URL that fails must not cancel the others
+                return_exceptions=True,
+            )
+
+    failed_urls = [url for url, result in zip(SEARCH_URLS, saved_counts) if isinstance(result, Exception)]
+    for url in failed_urls:
+        log(ERROR, "Crawl failed; a run with RESUME_RUN = True retries it", url=url)
+    if sum(count for count in saved_counts if not isinstance(count, Exception)) == 0 and not failed_urls:
+        print("No cars were found during the crawl.")
+
+    show_crawl_stats(*helpers)
+    seen_listings.show_stats()
+    await close_http_fetcher(http_fetcher)
+    listing_index.write_diff(LISTING_DIFF_PATH)
+    export_metrics()
+    extraction_cache.close()
+    listing_index.close()
+    seen_listings.close()
+
+
+def worker_output_path(worker_id):
+    extension = ".csv" if OUTPUT_FORMAT == "csv" else ""
+    return os.path.join(WORKER_OUTPUT_DIR, f"{worker_id}{extension}")
+
+
+async def crawl_worker(worker_id=None, processes=WORKER_PROCESSES):
+    """
+    Crawls search URLs leased from the work queue until the queue is drained.
+    `processes` is the number of worker processes of the crawl, which split the request
+    rate limits between them.
+
+    The worker writes its cars to its own output in WORKER_OUTPUT_DIR, which the
+    coordinator merges once every worker is done. Each page of the worker's browser pool
+    works on its own search URL.
+    """
+    from utils.browser_utils import BrowserPool
+    from utils.data_loader_utils import open_car_sink
+    from utils.listing_index_utils import ListingIndex
+    from utils.processing_utils import get_browser_config
+
+    worker_id = worker_id or default_worker_id()
+    log(INFO, "Worker started", worker=worker_id)
+    work_queue = WorkQueue(WORK_QUEUE_PATH, WORK_LEASE_SECONDS, WORK_MAX_ATTEMPTS)
+    helpers = get_crawl_helpers(processes)
+    llm_strategy, extraction_cache, rule_extractor, navigation_profile, text_reducer, request_scheduler, model_cascade = helpers
+    listing_index = ListingIndex(LISTING_INDEX_PATH)
+    # Shared with the other workers; the coordinator started it for this run
+    seen_listings = open_listing_dedup()
+    http_fetcher = open_http_fetcher()
+
+    os.makedirs(WORKER_OUTPUT_DIR, exist_ok=True)
+    car_sink = open_car_sink(
+        OUTPUT_FORMAT, worker_output_path(worker_id), OUTPUT_FLUSH_EVERY, resume=True, on_flush=seen_listings.confirm
+    )
+
+    async def keep_leased(unit):
+        while True:
+            await asyncio.sleep(WORK_LEASE_SECONDS / 3)
+            if not work_queue.extend_lease(unit, worker_id):
+                log(ERROR, "Worker lost its lease", worker=worker_id, unit=unit.payload)
+                return
+
+    async def work(browser_pool):
+        while True:
+            unit = work_queue.lease(worker_id)
+            if unit is None:
+                if work_queue.is_drained():
+                    return
+                # Other workers still hold leases that may expire and need to be taken over
+                await asyncio.sleep(WORK_POLL_SECONDS)
+                continue
+
+            log(INFO, "Worker leased a unit", worker=worker_id, unit=unit.payload, attempt=unit.attempts)
+            heartbeat = asyncio.create_task(keep_leased(unit))
+            try:
+                saved_count = await crawl_url(
+                    browser_pool,
+                    unit.payload["url"],
+                    car_sink,
+                    seen_listings,
+                    llm_strategy,
+                    extraction_cache,
+                    rule_extractor,
+                    navigation_profile,
+                    listing_index,
+                    text_reducer,
+                    request_scheduler,
+                    http_fetcher=http_fetcher,
+                    model_cascade=model_cascade,
+                )
+                with metrics.time("saving"):
+                    car_sink.flush()
+                work_queue.ack(unit, worker_id)
+                log(INFO, "Worker finished a unit", worker=worker_id, unit=unit.payload, cars=saved_count)
+            except Exception as e:
+                # The cars saved before the failure are kept; the retry skips their listings
+                with metrics.time("saving"):
+                    car_sink.flush()
+                log(ERROR, "Worker failed on a unit", worker=worker_id, unit=unit.payload, error=e)
+                work_queue.fail(unit, worker_id, str(e))
+            finally:
+                heartbeat.cancel()
+
+    with car_sink:
+        async with BrowserPool(get_browser_config(), BROWSER_POOL_SIZE, BROWSER_PAGE_MAX_USES) as browser_pool:
+            await asyncio.gather(*(work(browser_pool) for _ in range(BROWSER_POOL_SIZE)))
+
+    show_crawl_stats(*helpers)
+    seen_listings.show_stats()
+    await close_http_fetcher(http_fetcher)
+    export_metrics(worker_id)
+    extraction_cache.close()
+    listing_index.close()
+    seen_listings.close()
+    work_queue.close()
+
+
+def run_worker(processes):
+    configure_logging(LOG_LEVEL, LOG_FORMAT)
+    asyncio.run(crawl_worker(processes=processes))
+
+
+async def crawl_cars_with_workers(worker_processes):
+    """
+    Queues SEARCH_URLS, crawls them with `worker_processes` local worker processes (and
+    any worker that joins from another host), then merges the workers' outputs into
+    OUTPUT_PATH. With RESUME_RUN, cars the output already holds are not written again.
+    """
+    from utils.data_loader_utils import merge_car_outputs
+    from utils.listing_index_utils import ListingIndex
+
+    work_queue = WorkQueue(WORK_QUEUE_PATH, WORK_LEASE_SECONDS, WORK_MAX_ATTEMPTS)
+    if not RESUME_RUN:
+        work_queue.reset()
+        shutil.rmtree(WORKER_OUTPUT_DIR, ignore_errors=True)
+    os.makedirs(WORKER_OUTPUT_DIR, exist_ok=True)
+    for url in SEARCH_URLS:
+        work_queue.enqueue("search_url", {"url": url})
+    seen_listings = start_listing_dedup()
+
+    # Opened before the workers start, so the diff covers everything they record
+    listing_index = ListingIndex(LISTING_INDEX_PATH)
+
+    # Spawned rather than forked, so no worker inherits the coordinator's SQLite connections
+    context = multiprocessing.get_context("spawn")
+    workers = [context.Process(target=run_worker, args=(worker_processes,)) for _ in range(worker_processes)]
+    for worker in workers:
+        worker.start()
+    log(INFO, "Started worker processes", workers=worker_processes, search_urls=len(SEARCH_URLS))
+
+    # A crashed worker's lease expires and is picked up by its replacement, but a worker
+    # that keeps crashing, e.g. because the browser cannot start, is not replaced forever
+    replacements_left = worker_processes * WORK_MAX_ATTEMPTS
+    while not work_queue.is_drained():
+        for idx, worker in enumerate(workers):
+            if worker.is_alive() or worker.exitcode == 0 or worker.exitcode is None:
+                continue
+            log(ERROR, "Worker process exited", pid=worker.pid, exit_code=worker.exitcode)
+            # Its unit is crawled again once the lease expires; the listings it claimed but did not save must be too
+            seen_listings.discard_unconfirmed(default_worker_id(worker.pid))
+            if replacements_left > 0:
+                replacements_left -= 1
+                workers[idx] = context.Process(target=run_worker, args=(worker_processes,))
+                workers[idx].start()
+        if not any(worker.is_alive() for worker in workers):
+            log(ERROR, "No local worker is left, merging what the workers saved so far")
+            break
+        await asyncio.sleep(WORK_POLL_SECONDS)
+    for worker in workers:
+        await asyncio.to_thread(worker.join)
+
+    shard_paths = sorted(os.path.join(WORKER_OUTPUT_DIR, name) for name in os.listdir(WORKER_OUTPUT_DIR))
+    with metrics.time("merging"):
+        saved_count = merge_car_outputs(OUTPUT_FORMAT, shard_paths, OUTPUT_PATH, OUTPUT_FLUSH_EVERY, RESUME_RUN)
+    if saved_count == 0:
+        print("No cars were found during the crawl.")
+
+    work_queue.show_stats()
+    listing_index.write_diff(LISTING_DIFF_PATH)
+    export_metrics()
+    listing_index.close()
+    seen_listings.close()
+    work_queue.close()
+
+
+async def crawl_daemon(host, port, socket_path):
+    """
+    Keeps one browser pool, LLM strategy and set of helpers warm and crawls the jobs
+    submitted to the daemon's API until SIGINT or SIGTERM. Every job's cars are streamed
+    back instead of written to OUTPUT_PATH.
+    """
+    from utils.browser_utils import BrowserPool
+    from utils.daemon_utils import CrawlDaemon
+    from utils.listing_index_utils import ListingIndex
+    from utils.processing_utils import get_browser_config
+
+    helpers = get_crawl_helpers()
+    llm_strategy, extraction_cache, rule_extractor, navigation_profile, text_reducer, request_scheduler, model_cascade = helpers
+    listing_index = ListingIndex(LISTING_INDEX_PATH)
+    http_fetcher = open_http_fetcher()
+
+    async with BrowserPool(get_browser_config(), BROWSER_POOL_SIZE, BROWSER_PAGE_MAX_USES) as browser_pool:
+
+        async def crawl_job(job):
+            # Each job has its own listings, in memory, and is not deduplicated against other jobs
+            seen_listings = open_listing_dedup(":memory:", job.max_listings)
+            try:
+                await crawl_url(
+                    browser_pool,
+                    job.url,
+                    job,
+                    seen_listings,
+                    llm_strategy,
+                    extraction_cache,
+                    rule_extractor,
+                    navigation_profile,
+                    listing_index,
+                    text_reducer,
+                    request_scheduler,
+                    css_selector=job.css_selector,
+                    max_listings=job.max_listings,
+                    max_scrolls=job.max_scrolls,
+                    http_fetcher=http_fetcher,
+                    model_cascade=model_cascade,
+                )
+            finally:
+                seen_listings.close()
+
+        daemon = CrawlDaemon(
+            crawl_job, CSS_SELECTOR, MAX_LISTINGS, MAX_SCROLLS, DAEMON_MAX_CONCURRENT_JOBS, DAEMON_MAX_FINISHED_JOBS
+        )
+        serving = asyncio.create_task(daemon.serve(host, port, socket_path))
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, serving.cancel)
+        try:
+            await serving
+        except asyncio.CancelledError:
+            pass
+
+    show_crawl_stats(*helpers)
+    await close_http_fetcher(http_fetcher)
+    listing_index.write_diff(LISTING_DIFF_PATH)
+    export_metrics()
+    extraction_cache.close()
+    listing_index.close()
 
 
 async def main():
     """
     Entry point of the script.
     """
-    await crawl_cars()
+    parser = argparse.ArgumentParser(description="Crawl car listings.")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=WORKER_PROCESSES,
+        help=(
+            "number of worker processes; 1 crawls in this process without a work queue. "
+            "With --worker, the number of processes of the crawl it joins, which share the rate limits"
+        ),
+    )
+    parser.add_argument(
+        "--worker",
+        action="store_true",
+        help="join a running crawl as a worker and pull search URLs from its work queue",
+    )
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="keep the browser and LLM strategy warm and crawl jobs submitted to a local HTTP API",
+    )
+    parser.add_argument("--host", default=DAEMON_HOST, help="address the daemon listens on")
+    parser.add_argument("--port", type=int, default=DAEMON_PORT, help="port the daemon listens on")
+    parser.add_argument("--socket", default=DAEMON_SOCKET_PATH, help="Unix socket the daemon listens on instead")
+    args = parser.parse_args()
+    configure_logging(LOG_LEVEL, LOG_FORMAT)
+
+    if args.daemon:
+        await crawl_daemon(args.host, args.port, args.socket)
+    elif args.worker:
+        await crawl_worker(processes=args.workers)
+    elif args.workers > 1:
+        await crawl_cars_with_workers(args.workers)
+    else:
+        await crawl_cars()
 
 
 if __name__ == "__main__":
@@ -1,11 +1,192 @@
-from pydantic import BaseModel
+import re
+from array import array
+from decimal import Decimal
+from typing import Iterable, Iterator, List, Tuple
 
+from pydantic import BaseModel, model_validator
 
-class Car(BaseModel):
+# Currency of a price shown with only a symbol. The crawled site is Canadian, so "$" is CAD
+CURRENCY_SYMBOLS = {"$": "CAD", "€": "EUR", "£": "GBP"}
+# Makes whose name is more than the first word of a listing title
+MULTI_WORD_MAKES = ("Alfa Romeo", "Aston Martin", "Land Rover", "Rolls-Royce")
+
+CURRENCY_CODE_PATTERN = re.compile(r"\b(CAD|USD|EUR|GBP)\b")
+AMOUNT_PATTERN = re.compile(r"\d[\d,]*(?:\.\d{1,2})?")
+
+
+def parse_kilometers(text: str) -> int:
+    """Parses a display mileage such as '72,942 km' into whole kilometers."""
+    digits = re.sub(r"[^\d]", "", text.split(".")[0])
+    if not digits:
+        raise ValueError(f"No kilometers in {text!r}")
+    return int(digits)
+
+
+def parse_price(text: str) -> Tuple[int, str]:
     """
-    Represents the data structure of a Car.
+    Parses a display price such as '$32,990' into integer cents and an ISO currency code.
+    An explicit code ('USD 32,990') wins over the symbol.
+    """
+    amount = AMOUNT_PATTERN.search(text)
+    if amount is None:
+        raise ValueError(f"No price in {text!r}")
+    code = CURRENCY_CODE_PATTERN.search(text)
+    if code is not None:
+        currency = code.group(1)
+    else:
+        currency = next((code for symbol, code in CURRENCY_SYMBOLS.items() if symbol in text), None)
+        if currency is None:
+            raise ValueError(f"No currency in {text!r}")
+    return int(Decimal(amount.group(0).replace(",", "")) * 100), currency
+
+
+def strip_price_extras(price: str) -> str:
+    """The main price of a display price the LLM copied with its extras, e.g. '$32,990 or $321/biweekly SALE'."""
+    return price.split(" or ")[0].strip().replace("SALE", "").strip()
+
+
+def make_from_name(name: str) -> str:
+    for make in MULTI_WORD_MAKES:
+        if name.lower().startswith(make.lower()):
+            return make
+    return name.split()[0] if name.split() else ""
+
+
+class ListingCar(BaseModel):
+    """
+    A car as the LLM extracts it from a listing, with the mileage and price as displayed.
     """
     year: int
     name: str
     kilometers: str
     price: str
+
+
+class IndexedCar(ListingCar):
+    """
+    A ListingCar extracted from a batched request, tagged with the position of its
+    listing inside the batch so results can be mapped back to elements.
+    """
+    index: int
+
+
+class Car(BaseModel):
+    """
+    Represents the data structure of a Car.
+
+    Display strings are parsed when a car is validated, so a `ListingCar` dict validates
+    into a `Car`: '72,942 km' becomes 72942, '$32,990' becomes 3299000 cents in CAD, and
+    the make is split off the name.
+    """
+    year: int
+    make: str
+    name: str
+    kilometers: int
+    price_cents: int
+    currency: str
+
+    @model_validator(mode="before")
+    @classmethod
+    def parse_display_fields(cls, data):
+        if not isinstance(data, dict):
+            return data
+        data = dict(data)
+        if isinstance(data.get("kilometers"), str) and not data["kilometers"].isdigit():
+            data["kilometers"] = parse_kilometers(data["kilometers"])
+        if "price_cents" not in data and isinstance(data.get("price"), str):
+            data["price_cents"], data["currency"] = parse_price(data.pop("price"))
+        if not data.get("make") and isinstance(data.get("name"), str):
+            data["make"] = make_from_name(data["name"])
+        return data
+
+
+class CarBatch:
+    """
+    Columnar container of validated `Car` dicts for large result sets.
+
+    Numbers are kept in typed arrays and the make and currency as indexes into a list of
+    distinct values, so a car costs a few dozen bytes plus its name instead of a dict.
+    Iterating yields the cars as dicts again.
+    """
+
+    def __init__(self):
+        self.years = array("H")
+        self.kilometers = array("q")
+        self.prices_cents = array("q")
+        self.names: List[str] = []
+        self.make_codes = array("H")
+        self.currency_codes = array("H")
+        self.makes: List[str] = []
+        self.currencies: List[str] = []
+        self._make_index = {}
+        self._currency_index = {}
+
+    @classmethod
+    def from_cars(cls, cars: Iterable[dict]) -> "CarBatch":
+        batch = cls()
+        batch.extend(cars)
+        return batch
+
+    @staticmethod
+    def _code(value: str, values: List[str], index: dict) -> int:
+        code = index.get(value)
+        if code is None:
+            code = index[value] = len(values)
+            values.append(value)
+        return code
+
+    def append(self, car: dict) -> None:
+        """Appends a dict with the fields of `Car`, e.g. from `Car.model_dump()`."""
+        self.years.append(car["year"])
+        self.kilometers.append(car["kilometers"])
+        self.prices_cents.append(car["price_cents"])
+        self.names.append(car["name"])
+        self.make_codes.append(self._code(car["make"], self.makes, self._make_index))
+        self.currency_codes.append(self._code(car["currency"], self.currencies, self._currency_index))
+
+    def extend(self, cars: Iterable[dict]) -> None:
+        for car in cars:
+            self.append(car)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __getitem__(self, position: int) -> dict:
+        return {
+            "year": self.years[position],
+            "make": self.makes[self.make_codes[position]],
+            "name": self.names[position],
+            "kilometers": self.kilometers[position],
+            "price_cents": self.prices_cents[position],
+            "currency": self.currencies[self.currency_codes[position]],
+        }
+
+    def __iter__(self) -> Iterator[dict]:
+        for position in range(len(self)):
+            yield self[position]
+
+    def columns(self) -> dict:
+        """The cars as one list per `Car` field, e.g. for `pandas.DataFrame(batch.columns())`."""
+        return {
+            "year": self.years.tolist(),
+            "make": [self.makes[code] for code in self.make_codes],
+            "name": list(self.names),
+            "kilometers": self.kilometers.tolist(),
+            "price_cents": self.prices_cents.tolist(),
+            "currency": [self.currencies[code] for code in self.currency_codes],
+        }
+
+    def to_arrow(self):
+        """The cars as a `pyarrow.Table`, with int64 numbers and string text columns."""
+        try:
+            import pyarrow as pa
+        except ImportError as e:
+            raise ImportError("Arrow output requires pyarrow. Install it with 'pip install pyarrow'.") from e
+        schema = pa.schema(
+            [(name, pa.int64() if field.annotation is int else pa.string()) for name, field in Car.model_fields.items()]
+        )
+        return pa.table(self.columns(), schema=schema)
+
+    @classmethod
+    def from_arrow(cls, table) -> "CarBatch":
+        return cls.from_cars(table.select(list(Car.model_fields)).to_pylist())
@@ -0,0 +1,51 @@
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from utils.aggregation_utils import CarAggregates, ParquetCars, label_rows
+
+COLUMNS = ["year", "make", "name", "kilometers", "price_cents"]
+
+
+def clean(df):
+    df["price"] = df["price_cents"] / 100
+    df["brand"] = df["make"]
+    return df
+
+
+@pytest.fixture
+def stored_cars(tmp_path):
+    # Prices and kilometers on and around the range edges, spread over several row groups
+    df = pd.DataFrame(
+        {
+            "year": [2015 + i % 4 for i in range(12)],
+            "make": ["Honda", "Kia", "Ford"] * 4,
+            "name": [f"car {i}" for i in range(12)],
+            "kilometers": [0, 25000, 25001, 50000, 75001, 100000, 100001, 10, 60000, 24999, 80000, 120000],
+            "price_cents": [0, 2000000, 2000001, 3000000, 4500000, 5000000, 5000001, 100, 2500000, 3999999, 1, 9000000],
+        }
+    )
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), tmp_path / "part-0.parquet", row_group_size=4)
+    return df, str(tmp_path)
+
+
+@pytest.mark.parametrize(
+    "filters",
+    [
+        {},
+        {"year": [2016, 2018]},
+        {"brand": ["Kia"]},
+        {"price_range": ["< $20,000", "> $50,000"]},
+        {"km_range": ["25,001-50,000 km", "75,001-100,000 km"]},
+        {"year": [2015, 2016], "price_range": ["$20,000-$30,000", "$40,000-$50,000"], "brand": ["Honda", "Kia"]},
+    ],
+)
+def test_parquet_pages_match_the_cars_in_memory(stored_cars, filters):
+    df, path = stored_cars
+    cars = ParquetCars(path, COLUMNS, prepare=lambda page: label_rows(clean(page)))
+    queried = CarAggregates(clean(cars.read()), cars)
+    in_memory = CarAggregates(clean(df.copy()))
+    for start in (0, 2):
+        assert list(queried.page(filters, start, start + 3)["name"]) == list(in_memory.page(filters, start, start + 3)["name"])
+    assert queried.summary(filters)["count"] == len(in_memory.rows(filters))
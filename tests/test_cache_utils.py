@@ -0,0 +1,22 @@
+from utils.cache_utils import ExtractionCache
+
+CAR = {"year": 2020, "make": "Honda", "name": "Civic", "kilometers": 50000, "price": "$20,000"}
+LISTING_HTML = "<div>2020 Honda Civic 50,000 km $20,000</div>"
+
+
+def test_car_of_a_cheaper_model_is_only_read_back_while_that_model_is_unchanged(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = ExtractionCache(path, "main", 3600, 100, tier_versions=["cheap"])
+    cache.put(LISTING_HTML, CAR, version="cheap")
+    assert cache.get(LISTING_HTML)["name"] == "Civic"
+
+    # Without the cascade, or with another cheap model, the car is not the main model's
+    assert ExtractionCache(path, "main", 3600, 100).get(LISTING_HTML) is None
+    assert ExtractionCache(path, "main", 3600, 100, tier_versions=["other"]).get(LISTING_HTML) is None
+
+
+def test_car_of_the_main_model_is_read_first(tmp_path):
+    cache = ExtractionCache(str(tmp_path / "cache.db"), "main", 3600, 100, tier_versions=["cheap"])
+    cache.put(LISTING_HTML, {**CAR, "name": "Civic EX"}, version="cheap")
+    cache.put(LISTING_HTML, CAR)
+    assert cache.get(LISTING_HTML)["name"] == "Civic"
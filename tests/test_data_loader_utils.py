@@ -0,0 +1,26 @@
+from utils.data_loader_utils import merge_car_outputs, open_car_sink, read_cars
+
+CIVIC = {"year": 2020, "make": "Honda", "name": "Civic", "kilometers": 50000, "price": "$20,000"}
+COROLLA = {"year": 2019, "make": "Toyota", "name": "Corolla", "kilometers": 60000, "price": "$18,000"}
+
+
+def write_output(path, cars):
+    with open_car_sink("csv", str(path), 1, False) as car_sink:
+        for car in cars:
+            car_sink.write(car)
+
+
+def test_merge_keeps_identical_cars_of_distinct_listings(tmp_path):
+    # The same trim at the same price and mileage, listed by two dealers
+    write_output(tmp_path / "worker-1.csv", [CIVIC, COROLLA])
+    write_output(tmp_path / "worker-2.csv", [CIVIC])
+    shard_paths = [str(tmp_path / "worker-1.csv"), str(tmp_path / "worker-2.csv")]
+    assert merge_car_outputs("csv", shard_paths, str(tmp_path / "cars.csv"), 10, False) == 3
+    assert len(read_cars("csv", str(tmp_path / "cars.csv"))) == 3
+
+
+def test_resumed_merge_skips_cars_already_in_the_output(tmp_path):
+    write_output(tmp_path / "cars.csv", [CIVIC])
+    write_output(tmp_path / "worker-1.csv", [CIVIC, COROLLA])
+    assert merge_car_outputs("csv", [str(tmp_path / "worker-1.csv")], str(tmp_path / "cars.csv"), 10, True) == 1
+    assert len(read_cars("csv", str(tmp_path / "cars.csv"))) == 2
@@ -0,0 +1,93 @@
+from utils.dedup_utils import ListingDedup
+
+
+def car(number):
+    return {
+        "year": 2020,
+        "make": "Honda",
+        "name": f"Honda Civic {number}",
+        "kilometers": number,
+        "price_cents": 1_000_000,
+        "currency": "CAD",
+    }
+
+
+def open_dedup():
+    return ListingDedup(":memory:", 100, 0.01, 3)
+
+
+def is_saved(seen_listings, key):
+    row = seen_listings.connection.execute("SELECT saved FROM seen_listings WHERE key = ?", (key,)).fetchone()
+    return row is not None and row[0] == 1
+
+
+def test_confirm_leaves_claims_still_being_extracted_unsaved():
+    seen_listings = open_dedup()
+    assert seen_listings.claim("a")
+    assert seen_listings.claim("b")
+    seen_listings.track("a", car(1))
+
+    # a's car was flushed while b, e.g. of a concurrent crawl, is still being extracted
+    seen_listings.confirm([car(1)])
+    seen_listings.release("b")
+
+    assert is_saved(seen_listings, "a")
+    assert "b" not in seen_listings
+    assert seen_listings.claim("b")
+
+
+def test_confirm_only_marks_the_claims_of_the_flushed_cars():
+    seen_listings = open_dedup()
+    for number, key in enumerate("abc", 1):
+        assert seen_listings.claim(key)
+        seen_listings.track(key, car(number))
+
+    seen_listings.confirm([car(2)])
+
+    assert [is_saved(seen_listings, key) for key in "abc"] == [False, True, False]
+    seen_listings.discard_unconfirmed()
+    assert "a" not in seen_listings and "b" in seen_listings and "c" not in seen_listings
+
+
+def test_identical_cars_confirm_one_claim_each():
+    seen_listings = open_dedup()
+    for key in "ab":
+        assert seen_listings.claim(key)
+        seen_listings.track(key, car(1))
+
+    seen_listings.confirm([car(1)])
+    assert sum(is_saved(seen_listings, key) for key in "ab") == 1
+    seen_listings.confirm([car(1)])
+    assert is_saved(seen_listings, "a") and is_saved(seen_listings, "b")
+
+
+def test_released_claim_can_be_claimed_again():
+    seen_listings = open_dedup()
+    assert seen_listings.claim("a")
+    assert not seen_listings.claim("a")
+    seen_listings.release("a")
+    assert seen_listings.claim("a")
+
+
+LISTING_HTML = '<a href="/cars/{key}"><h3>2024 Honda Civic EX</h3><p>10 km</p><p>{price}</p><p>Dealer lot</p></a>'
+
+
+def test_near_duplicates_within_a_run_are_different_cars():
+    seen_listings = open_dedup()
+    new_car = {**car(10), "name": "Honda Civic EX"}
+    assert seen_listings.claim("a") and seen_listings.claim("b")
+
+    assert seen_listings.relisted_from("a", LISTING_HTML.format(key="a", price="$30,990"), new_car) is None
+    assert seen_listings.relisted_from("b", LISTING_HTML.format(key="b", price="$31,490"), new_car) is None
+    assert seen_listings.relisted == 0
+
+
+def test_near_duplicate_of_an_earlier_run_is_relisted():
+    seen_listings = open_dedup()
+    new_car = {**car(10), "name": "Honda Civic EX"}
+    assert seen_listings.claim("a")
+    seen_listings.relisted_from("a", LISTING_HTML.format(key="a", price="$30,990"), new_car)
+    seen_listings.reset()
+
+    assert seen_listings.claim("b")
+    assert seen_listings.relisted_from("b", LISTING_HTML.format(key="b", price="$29,990"), new_car) == "a"
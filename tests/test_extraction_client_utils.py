@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+
+from utils.extraction_client_utils import MIN_CACHED_PREFIX_TOKENS, SingleFlight
+from utils.processing_utils import get_batch_llm_strategy, get_llm_strategy
+
+
+@pytest.mark.parametrize("get_strategy", [get_llm_strategy, get_batch_llm_strategy])
+def test_prompt_prefix_is_long_enough_to_be_cached(monkeypatch, get_strategy):
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    assert get_strategy().prompt_prefix_tokens >= MIN_CACHED_PREFIX_TOKENS
+
+
+def test_concurrent_calls_share_one_call():
+    async def scenario():
+        single_flight = SingleFlight()
+        calls = []
+
+        async def call():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return [{"year": 2020}]
+
+        results = await asyncio.gather(*(single_flight.run("key", call) for _ in range(3)))
+        return calls, results, single_flight
+
+    calls, results, single_flight = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert results == [[{"year": 2020}]] * 3
+    assert len({id(result) for result in results}) == 3
+    assert single_flight.coalesced == 2 and not single_flight.in_flight
+
+
+def test_cancelled_first_caller_does_not_cancel_the_waiters():
+    async def scenario():
+        single_flight = SingleFlight()
+        release = asyncio.Event()
+
+        async def call():
+            await release.wait()
+            return "car"
+
+        first = asyncio.create_task(single_flight.run("key", call))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(single_flight.run("key", call))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        return first, await waiter
+
+    first, result = asyncio.run(scenario())
+    assert first.cancelled()
+    assert result == "car"
+
+
+def test_errors_reach_every_waiter():
+    async def scenario():
+        single_flight = SingleFlight()
+
+        async def call():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("throttled")
+
+        return await asyncio.gather(*(single_flight.run("key", call) for _ in range(2)), return_exceptions=True)
+
+    assert [str(error) for error in asyncio.run(scenario())] == ["throttled", "throttled"]
@@ -0,0 +1,24 @@
+import pytest
+
+from utils.http_fetch_utils import record_key
+from utils.listing_index_utils import listing_key
+
+BASE_URL = "https://dealer.example/cars?page=2"
+
+
+@pytest.mark.parametrize(
+    "href",
+    ["https://dealer.example/cars/12-honda-civic", "/cars/12-honda-civic", "/cars/12-honda-civic?ref=search#photos"],
+)
+def test_browser_and_http_keys_match_for_any_link_form(href):
+    element_html = f'<div><a href="{href}"><h3>2020 Honda Civic</h3></a></div>'
+    assert listing_key(element_html, BASE_URL) == record_key({"url": href}, BASE_URL) == "url:/cars/12-honda-civic"
+
+
+def test_listing_without_link_is_keyed_by_content():
+    assert listing_key("<div>2020 Honda Civic</div>").startswith("digest:")
+
+
+def test_single_quoted_link_is_found():
+    element_html = "<div><a href='/cars/12-honda-civic?ref=search'><h3>2020 Honda Civic</h3></a></div>"
+    assert listing_key(element_html, BASE_URL) == "url:/cars/12-honda-civic"
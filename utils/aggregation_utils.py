@@ -0,0 +1,262 @@
+import functools
+import hashlib
+import operator
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+PRICE_BINS = [0, 20000, 30000, 40000, 50000, float("inf")]
+PRICE_LABELS = ["< $20,000", "$20,000-$30,000", "$30,000-$40,000", "$40,000-$50,000", "> $50,000"]
+KM_BINS = [0, 25000, 50000, 75000, 100000, float("inf")]
+KM_LABELS = ["0-25,000 km", "25,001-50,000 km", "50,001-75,000 km", "75,001-100,000 km", "> 100,000 km"]
+
+# Columns the dashboard filters and groups by; the aggregate cube has one axis per column
+DIMENSIONS = ("year", "price_range", "km_range", "brand")
+
+_content_hashes = {}
+
+
+def _file_hash(path: str) -> str:
+    stat = os.stat(path)
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    cached = _content_hashes.get(path)
+    if cached is None or cached[0] != stamp:
+        digest = hashlib.sha256()
+        with open(path, mode="rb") as file:
+            for chunk in iter(lambda: file.read(1 << 20), b""):
+                digest.update(chunk)
+        cached = _content_hashes[path] = (stamp, digest.hexdigest())
+    return cached[1]
+
+
+def dataset_version(path: str) -> str:
+    """
+    Version of the dataset at `path`: the hash of its content, or of the content of its
+    Parquet part files when it is a directory. A file is only hashed again when its mtime
+    or size changed, so checking the version on every rerun costs one `os.stat` per file,
+    and a file that was rewritten with the same content keeps its version.
+    """
+    if not os.path.isdir(path):
+        return _file_hash(path)
+    digest = hashlib.sha256()
+    for name in sorted(name for name in os.listdir(path) if name.endswith(".parquet")):
+        digest.update(f"{name}:{_file_hash(os.path.join(path, name))}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def label_rows(df: pd.DataFrame) -> pd.DataFrame:
+    """Turns the brand into a category and adds the price and kilometer range of every car."""
+    df["brand"] = df["brand"].astype("category")
+    df["price_range"] = pd.cut(df["price"], bins=PRICE_BINS, labels=PRICE_LABELS, include_lowest=True)
+    df["km_range"] = pd.cut(df["kilometers"], bins=KM_BINS, labels=KM_LABELS, include_lowest=True)
+    return df
+
+
+def _range_expression(field, bins: list, labels: list, values: List[str]):
+    """The Arrow expression selecting the values of `field` that `pd.cut(bins, labels)` puts in one of `values`."""
+    import pyarrow.dataset as ds
+
+    ranges = []
+    for index, label in enumerate(labels):
+        if label not in values:
+            continue
+        # The bins are closed on the right, and the first one also holds its lower edge
+        in_range = field >= bins[index] if index == 0 else field > bins[index]
+        if bins[index + 1] != float("inf"):
+            in_range = in_range & (field <= bins[index + 1])
+        ranges.append(in_range)
+    return functools.reduce(operator.or_, ranges) if ranges else ds.scalar(False)
+
+
+def filter_expression(filters: Dict[str, List]):
+    """
+    The Arrow expression selecting the stored cars that match dashboard `filters`, or None
+    without filters. Every dimension is read off the stored columns: the brand is the make,
+    and the price ranges are compared in cents.
+    """
+    import pyarrow.dataset as ds
+
+    expressions = []
+    for dimension, values in filters.items():
+        values = list(values)
+        if dimension == "year":
+            expressions.append(ds.field("year").isin(values))
+        elif dimension == "brand":
+            expressions.append(ds.field("make").isin(values))
+        elif dimension == "price_range":
+            cent_bins = [edge * 100 for edge in PRICE_BINS]
+            expressions.append(_range_expression(ds.field("price_cents"), cent_bins, PRICE_LABELS, values))
+        elif dimension == "km_range":
+            expressions.append(_range_expression(ds.field("kilometers"), KM_BINS, KM_LABELS, values))
+        else:
+            raise ValueError(f"Unknown dimension '{dimension}'")
+    return functools.reduce(operator.and_, expressions) if expressions else None
+
+
+class ParquetCars:
+    """
+    The cars of a Parquet output, queried where they are stored. A query reads only the
+    `columns` it needs, skips the row groups whose statistics rule out its filter and
+    stops scanning once it has its rows, so a page of a filtered table costs about a page
+    of reading however many cars the output holds. `prepare` turns the scanned columns
+    of a page into the rows the dashboard shows.
+    """
+
+    def __init__(self, path: str, columns: List[str], prepare=None):
+        try:
+            import pyarrow.dataset as ds
+        except ImportError as e:
+            raise ImportError("Parquet output requires pyarrow. Install it with 'pip install pyarrow'.") from e
+        self.dataset = ds.dataset(path, format="parquet")
+        self.columns = columns
+        self.prepare = prepare or (lambda df: df)
+
+    def read(self, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """Every car, with only `columns`, or the projected columns, as they are stored."""
+        return self.dataset.to_table(columns=columns or self.columns).to_pandas()
+
+    def page(self, filters: Dict[str, List], start: int, stop: int) -> pd.DataFrame:
+        """The cars from position `start` to `stop` among those matching `filters`, in stored order."""
+        scanner = self.dataset.scanner(columns=self.columns, filter=filter_expression(filters))
+        return self.prepare(scanner.head(stop).slice(start).to_pandas())
+
+
+class CarAggregates:
+    """
+    Everything the dashboard shows about one version of the dataset, computed once.
+
+    The cars are binned into price and kilometer ranges and reduced to a cube with one
+    axis per column in `DIMENSIONS`, holding the count and the price and kilometer sums
+    of every combination. Counts and averages under any filter are read from the cube,
+    which is tiny next to the cars. The cars matching a filter are found through an index
+    from every value of a filter column to the positions of its rows, so neither needs a
+    scan of the full frame. With `cars`, the Parquet output the frame was read from, pages
+    of matching cars are queried from the output instead.
+    """
+
+    def __init__(self, df: pd.DataFrame, cars: Optional[ParquetCars] = None):
+        df = label_rows(df.reset_index(drop=True))
+        self.df = df
+        self.cars = cars
+
+        self.options: Dict[str, list] = {
+            "year": sorted(df["year"].unique().tolist()),
+            "price_range": PRICE_LABELS,
+            "km_range": KM_LABELS,
+            "brand": sorted(df["brand"].cat.categories),
+        }
+        self.cube = (
+            df.groupby(list(DIMENSIONS), observed=True)
+            .agg(count=("price", "size"), price_sum=("price", "sum"), kilometers_sum=("kilometers", "sum"))
+            .reset_index()
+        )
+        self.indexes: Dict[str, Dict[object, np.ndarray]] = {
+            dimension: df.groupby(dimension, observed=True).indices for dimension in DIMENSIONS
+        }
+        self.most_expensive = df.loc[df["price"].idxmax()] if len(df) else None
+        self.least_expensive = df.loc[df["price"].idxmin()] if len(df) else None
+        # Plot data, computed on first use and kept with the aggregates
+        self._plots = {}
+
+    def _plot(self, key: tuple, compute):
+        if key not in self._plots:
+            self._plots[key] = compute()
+        return self._plots[key]
+
+    def _active_filters(self, filters: Optional[Dict[str, List]]) -> Dict[str, set]:
+        """The filters that exclude anything; selecting every option is the same as no filter."""
+        return {
+            dimension: set(values)
+            for dimension, values in (filters or {}).items()
+            if not set(self.options[dimension]) <= set(values)
+        }
+
+    def _cube(self, filters: Optional[Dict[str, List]]) -> pd.DataFrame:
+        cube = self.cube
+        for dimension, values in self._active_filters(filters).items():
+            cube = cube[cube[dimension].isin(values)]
+        return cube
+
+    def counts(self, dimension: str, filters: Optional[Dict[str, List]] = None) -> pd.Series:
+        """Number of cars per value of `dimension`, in option order, among the cars matching `filters`."""
+        counts = self._cube(filters).groupby(dimension, observed=True)["count"].sum()
+        return counts.reindex(self.options[dimension], fill_value=0)
+
+    def summary(self, filters: Optional[Dict[str, List]] = None) -> dict:
+        cube = self._cube(filters)
+        count = int(cube["count"].sum())
+        years = cube.loc[cube["count"] > 0, "year"]
+        return {
+            "count": count,
+            "average_price": float(cube["price_sum"].sum() / count) if count else 0.0,
+            "average_kilometers": float(cube["kilometers_sum"].sum() / count) if count else 0.0,
+            "oldest_year": int(years.min()) if count else None,
+            "newest_year": int(years.max()) if count else None,
+        }
+
+    def rows(self, filters: Optional[Dict[str, List]] = None) -> pd.DataFrame:
+        """The cars matching `filters`, in dataset order, looked up in the column indexes."""
+        positions = None
+        for dimension, values in self._active_filters(filters).items():
+            index = self.indexes[dimension]
+            matching = [index[value] for value in values if value in index]
+            selected = np.concatenate(matching) if matching else np.empty(0, dtype=np.int64)
+            positions = selected if positions is None else np.intersect1d(positions, selected, assume_unique=True)
+        if positions is None:
+            return self.df
+        return self.df.iloc[np.sort(positions)]
+
+    def page(self, filters: Optional[Dict[str, List]], start: int, stop: int) -> pd.DataFrame:
+        """The cars from position `start` to `stop` among those matching `filters`."""
+        if self.cars is None:
+            return self.rows(filters).iloc[start:stop]
+        return self.cars.page(self._active_filters(filters), start, stop)
+
+    def price_histogram(self, bins: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Exact counts of cars in `bins` equal-width price bins, and the bin edges."""
+        return self._plot(("price_histogram", bins), lambda: np.histogram(self.df["price"], bins=bins))
+
+    def price_by_year(self) -> pd.DataFrame:
+        """Minimum, quartiles and maximum price per year, for box plots drawn without the points."""
+
+        def compute():
+            quartiles = self.df.groupby("year")["price"].quantile([0.0, 0.25, 0.5, 0.75, 1.0]).unstack()
+            quartiles.columns = ["min", "q1", "median", "q3", "max"]
+            return quartiles.reset_index()
+
+        return self._plot(("price_by_year",), compute)
+
+    def density(self, x: str, y: str, bins: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Exact counts of cars in a `bins` x `bins` grid over columns `x` and `y`, as
+        (counts indexed [y bin, x bin], x bin edges, y bin edges).
+        """
+
+        def compute():
+            counts, x_edges, y_edges = np.histogram2d(self.df[x], self.df[y], bins=bins)
+            return counts.T.astype(np.int64), x_edges, y_edges
+
+        return self._plot(("density", x, y, bins), compute)
+
+    def bubbles(self, price_bins: int) -> pd.DataFrame:
+        """
+        One row per year, price bin and brand: the number of cars, the center of the
+        price bin and the average kilometers. It replaces one bubble per car.
+        """
+
+        def compute():
+            edges = np.histogram_bin_edges(self.df["price"], bins=price_bins)
+            centers = (edges[:-1] + edges[1:]) / 2
+            positions = np.clip(np.searchsorted(edges, self.df["price"], side="right") - 1, 0, len(centers) - 1)
+            grouped = (
+                self.df.assign(price_bin=positions)
+                .groupby(["year", "price_bin", "brand"], observed=True)
+                .agg(count=("price", "size"), kilometers=("kilometers", "mean"))
+                .reset_index()
+            )
+            grouped["price"] = centers[grouped["price_bin"]]
+            return grouped.drop(columns="price_bin")
+
+        return self._plot(("bubbles", price_bins), compute)
@@ -0,0 +1,156 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List, Optional
+
+from crawl4ai import BrowserConfig
+from playwright.async_api import Browser, BrowserContext, Page, Playwright, async_playwright
+
+from utils.metrics_utils import DEBUG, ERROR, INFO, log, metrics
+
+
+class PooledPage:
+    """
+    A warm browser context with a single page, and how many crawls it has served.
+    """
+
+    def __init__(self, context: BrowserContext, page: Page):
+        self.context = context
+        self.page = page
+        self.uses = 0
+
+
+class BrowserPool:
+    """
+    One Chromium shared by every crawl in the process, with up to `size` warm pages.
+
+    Pages are handed out with `async with pool.page() as page:`. A page is health-checked
+    before it is handed out, and its context is replaced once it has served `max_uses`
+    crawls, so long jobs do not accumulate memory in a single context.
+    """
+
+    def __init__(self, browser_config: BrowserConfig, size: int, max_uses: int):
+        self.browser_config = browser_config
+        self.size = max(1, size)
+        self.max_uses = max(1, max_uses)
+        self.playwright: Optional[Playwright] = None
+        self.browser: Optional[Browser] = None
+        self.idle: List[PooledPage] = []
+        self.slots = asyncio.Semaphore(self.size)
+        self.recycled = 0
+
+    async def start(self) -> "BrowserPool":
+        log(INFO, "Launching Playwright browser")
+        try:
+            with metrics.time("launch"):
+                self.playwright = await async_playwright().start()
+                self.browser = await self.playwright.chromium.launch(
+                    headless=self.browser_config.headless,
+                    args=["--no-sandbox", "--disable-gpu", "--disable-dev-shm-usage"],
+                )
+        except Exception:
+            if self.playwright is None:
+                raise
+            await self.playwright.stop()
+            raise
+        log(INFO, "Browser launched successfully")
+        return self
+
+    async def close(self) -> None:
+        for pooled_page in self.idle:
+            await self._close_pooled_page(pooled_page)
+        self.idle = []
+        try:
+            if self.browser is not None:
+                await self.browser.close()
+            log(INFO, "Browser closed successfully")
+        except Exception as e:
+            log(ERROR, "Failed to close browser", error=e)
+        if self.playwright is not None:
+            await self.playwright.stop()
+        self.browser = None
+        self.playwright = None
+
+    async def __aenter__(self) -> "BrowserPool":
+        return await self.start()
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    @asynccontextmanager
+    async def page(self) -> AsyncIterator[Page]:
+        async with self.slots:
+            pooled_page = await self._acquire()
+            try:
+                yield pooled_page.page
+            finally:
+                await self._release(pooled_page)
+
+    async def _new_pooled_page(self) -> PooledPage:
+        start = time.perf_counter()
+        context = await self.browser.new_context(
+            user_agent=self.browser_config.user_agent,
+            viewport={
+                "width": self.browser_config.viewport_width,
+                "height": self.browser_config.viewport_height,
+            },
+        )
+        try:
+            await context.add_init_script("Object.defineProperty(navigator, 'webdriver', { get: () => undefined })")
+            page = await context.new_page()
+        except Exception:
+            await context.close()
+            raise
+        metrics.observe("new_page", time.perf_counter() - start)
+        log(DEBUG, "Browser context and page created")
+        return PooledPage(context, page)
+
+    async def _close_pooled_page(self, pooled_page: PooledPage) -> None:
+        try:
+            await pooled_page.context.close()
+        except Exception as e:
+            log(ERROR, "Failed to close browser context", error=e)
+
+    async def _is_healthy(self, pooled_page: PooledPage) -> bool:
+        if pooled_page.page.is_closed():
+            return False
+        try:
+            await pooled_page.page.evaluate("1")
+            return True
+        except Exception:
+            return False
+
+    async def _acquire(self) -> PooledPage:
+        while self.idle:
+            pooled_page = self.idle.pop()
+            if pooled_page.uses < self.max_uses and await self._is_healthy(pooled_page):
+                return pooled_page
+            self.recycled += 1
+            await self._close_pooled_page(pooled_page)
+        return await self._new_pooled_page()
+
+    async def _release(self, pooled_page: PooledPage) -> None:
+        pooled_page.uses += 1
+        try:
+            # Drop the previous listing page so an idle context holds no DOM
+            await pooled_page.page.goto("about:blank")
+        except Exception:
+            await self._close_pooled_page(pooled_page)
+            return
+        self.idle.append(pooled_page)
+
+
+@asynccontextmanager
+async def borrow_page(browser_pool: Optional[BrowserPool], browser_config: BrowserConfig) -> AsyncIterator[Page]:
+    """
+    Yields a page from `browser_pool`, or from a single-page pool that only lives for
+    this call when no pool is given.
+    """
+    if browser_pool is not None:
+        async with browser_pool.page() as page:
+            yield page
+        return
+
+    async with BrowserPool(browser_config, size=1, max_uses=1) as own_pool:
+        async with own_pool.page() as page:
+            yield page
@@ -0,0 +1,167 @@
+import hashlib
+import json
+import re
+import sqlite3
+import time
+from typing import TYPE_CHECKING, Optional, Sequence
+
+from models.car import Car
+from utils.metrics_utils import ERROR, log
+
+if TYPE_CHECKING:
+    # Only for annotations: ListingIndex imports this module, and it should not need crawl4ai
+    from crawl4ai.extraction_strategy import LLMExtractionStrategy
+
+
+def normalize_listing_html(html: str) -> str:
+    """
+    Collapses whitespace so that cosmetic re-rendering of a listing does not change its digest.
+    """
+    return re.sub(r"\s+", " ", html).strip()
+
+
+def listing_digest(html: str) -> str:
+    """
+    Stable content digest of a listing's HTML. Unlike `hash()`, it is the same in every process.
+    """
+    return hashlib.sha256(normalize_listing_html(html).encode("utf-8")).hexdigest()
+
+
+def extraction_version(llm_strategy: "LLMExtractionStrategy") -> str:
+    """
+    Digest of everything that shapes what the LLM returns for a listing: the model,
+    the instruction and the schema. Changing any of them invalidates cached results.
+    """
+    version_source = json.dumps(
+        {
+            "provider": llm_strategy.provider,
+            "instruction": llm_strategy.instruction,
+            "schema": llm_strategy.schema,
+            "car_fields": list(Car.model_fields.keys()),
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(version_source.encode("utf-8")).hexdigest()[:16]
+
+
+class ExtractionCache:
+    """
+    On-disk cache of validated cars, keyed by listing content digest and extraction version.
+
+    Entries expire `ttl_seconds` after they were stored, and once more than `max_entries`
+    are stored the least recently used ones are evicted.
+
+    Cars are stored under the version of the model that extracted them. `tier_versions`
+    are the versions of the cheaper models of a cascade: a listing is looked up under
+    `version` first and then under each of them, so a car a cheaper model extracted is
+    reused until that model's set-up changes.
+    """
+
+    def __init__(
+        self, path: str, version: str, ttl_seconds: float, max_entries: int, tier_versions: Sequence[str] = ()
+    ):
+        self.path = path
+        self.version = version
+        self.versions = [version] + [tier_version for tier_version in tier_versions if tier_version != version]
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+        # Worker processes share the cache, so wait for each other's writes
+        self.connection = sqlite3.connect(path, timeout=30)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS extractions ("
+            "key TEXT PRIMARY KEY, car TEXT NOT NULL, created_at REAL NOT NULL, last_used_at REAL NOT NULL)"
+        )
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS extractions_last_used_at ON extractions (last_used_at)"
+        )
+        self.connection.commit()
+        self.evict_expired()
+
+    def key(self, html: str, version: Optional[str] = None) -> str:
+        return f"{version or self.version}:{listing_digest(html)}"
+
+    def get(self, html: str) -> Optional[dict]:
+        """
+        Returns a copy of the cached car for this listing HTML, or None on a miss.
+        """
+        now = time.time()
+        for version in self.versions:
+            key = self.key(html, version)
+            row = self.connection.execute(
+                "SELECT car, created_at FROM extractions WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                continue
+            if now - row[1] > self.ttl_seconds:
+                self.connection.execute("DELETE FROM extractions WHERE key = ?", (key,))
+                self.connection.commit()
+                self.evictions += 1
+                continue
+
+            self.connection.execute("UPDATE extractions SET last_used_at = ? WHERE key = ?", (now, key))
+            self.connection.commit()
+            self.hits += 1
+            return json.loads(row[0])
+
+        self.misses += 1
+        return None
+
+    def put(self, html: str, car: dict, version: Optional[str] = None) -> None:
+        """
+        Stores a car for this listing HTML under `version`, the version of the model that
+        extracted it, by default the main one. Cars that do not validate against `Car` are
+        not cached.
+        """
+        try:
+            validated_car = Car.model_validate(car).model_dump()
+        except Exception as e:
+            log(ERROR, "Not caching car that failed validation", error=e, car=car)
+            return
+
+        now = time.time()
+        self.connection.execute(
+            "INSERT OR REPLACE INTO extractions (key, car, created_at, last_used_at) VALUES (?, ?, ?, ?)",
+            (self.key(html, version), json.dumps(validated_car), now, now),
+        )
+        self.stores += 1
+        self.evict_overflow()
+        self.connection.commit()
+
+    def evict_expired(self) -> None:
+        cursor = self.connection.execute(
+            "DELETE FROM extractions WHERE created_at < ?", (time.time() - self.ttl_seconds,)
+        )
+        self.evictions += cursor.rowcount
+        self.connection.commit()
+
+    def evict_overflow(self) -> None:
+        count = self.connection.execute("SELECT COUNT(*) FROM extractions").fetchone()[0]
+        if count <= self.max_entries:
+            return
+        cursor = self.connection.execute(
+            "DELETE FROM extractions WHERE key IN "
+            "(SELECT key FROM extractions ORDER BY last_used_at ASC LIMIT ?)",
+            (count - self.max_entries,),
+        )
+        self.evictions += cursor.rowcount
+
+    def show_stats(self) -> None:
+        """Print a summary of cache activity for this run."""
+        lookups = self.hits + self.misses
+        hit_rate = self.hits / lookups if lookups else 0.0
+        print("\n=== Extraction Cache Summary ===")
+        print(f"{'Type':<15} {'Count':>12}")
+        print("-" * 30)
+        print(f"{'Hits':<15} {self.hits:>12,}")
+        print(f"{'Misses':<15} {self.misses:>12,}")
+        print(f"{'Stored':<15} {self.stores:>12,}")
+        print(f"{'Evicted':<15} {self.evictions:>12,}")
+        print(f"{'Hit rate':<15} {hit_rate:>12.1%}")
+
+    def close(self) -> None:
+        self.connection.close()
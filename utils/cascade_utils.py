@@ -0,0 +1,171 @@
+import re
+import time
+from typing import TYPE_CHECKING, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from models.car import Car, strip_price_extras
+from utils.cache_utils import extraction_version
+from utils.metrics_utils import DEBUG, log, metrics
+from utils.rule_extraction_utils import visible_texts
+
+if TYPE_CHECKING:
+    from crawl4ai.extraction_strategy import LLMExtractionStrategy
+
+# Thousands separators inside numbers, so '72,942' and '72 942' both read as 72942
+THOUSANDS_SEPARATOR_PATTERN = re.compile(r"(?<=\d)[,.\s](?=\d{3}(?!\d))")
+MIN_YEAR = 1900
+MAX_KILOMETERS = 2_000_000
+
+
+def _number_in(number: int, text: str) -> bool:
+    return re.search(rf"(?<!\d){number}(?!\d)", text) is not None
+
+
+def rejection_reason(car: Optional[dict], element_html: str, required_keys: List[str]) -> Optional[str]:
+    """
+    Why a car a model extracted from a listing cannot be trusted, or None when it can.
+
+    The car has to pass the same normalization as `post_process_car` and validate as a
+    `Car`, its values have to be plausible, and its year, kilometers, price and make have
+    to appear in the listing's visible text. A car the listing does not back up is one the
+    model misread or made up.
+    """
+    if not isinstance(car, dict) or not car or car.get("error") is True:
+        return "no car"
+    missing = [key for key in required_keys if key not in car]
+    if missing:
+        return f"missing {', '.join(missing)}"
+    car = dict(car)
+    if isinstance(car.get("price"), str):
+        car["price"] = strip_price_extras(car["price"])
+    try:
+        car = Car.model_validate(car).model_dump()
+    except Exception:
+        return "invalid"
+
+    if not MIN_YEAR <= car["year"] <= time.localtime().tm_year + 1:
+        return "implausible year"
+    if not 0 <= car["kilometers"] <= MAX_KILOMETERS:
+        return "implausible kilometers"
+    if car["price_cents"] <= 0:
+        return "implausible price"
+
+    text = THOUSANDS_SEPARATOR_PATTERN.sub("", " ".join(visible_texts(element_html)))
+    if not _number_in(car["year"], text):
+        return "year not in listing"
+    if not _number_in(car["kilometers"], text):
+        return "kilometers not in listing"
+    if not _number_in(car["price_cents"] // 100, text):
+        return "price not in listing"
+    if not car["make"] or car["make"].lower() not in text.lower():
+        return "make not in listing"
+    return None
+
+
+class CascadeTier:
+    """One model of the cascade and what it did: listings sent, cars accepted, time spent."""
+
+    def __init__(self, llm_strategy: "LLMExtractionStrategy"):
+        self.llm_strategy = llm_strategy
+        # What its cars are cached under (see `ExtractionCache`)
+        self.version = extraction_version(llm_strategy)
+        self.requests = 0
+        self.listings = 0
+        self.accepted = 0
+        self.escalated = 0
+        self.seconds = 0.0
+
+    @property
+    def name(self) -> str:
+        return self.llm_strategy.provider
+
+
+class ModelCascade:
+    """
+    Tries cheaper models before the main one. Every listing goes to the first tier; the
+    listings whose car fails `rejection_reason` go on to the next tier, and the ones no
+    cheaper tier got right go to the main strategy, whose answer is final. Most listings
+    are easy, so most never reach the expensive model.
+
+    The tiers are strategies built like the main one (same instruction and schema) with a
+    cheaper or locally served model.
+    """
+
+    def __init__(self, llm_strategies: List["LLMExtractionStrategy"]):
+        self.tiers = [CascadeTier(llm_strategy) for llm_strategy in llm_strategies]
+        self._final_tiers: Dict[int, CascadeTier] = {}
+
+    def final_tier(self, llm_strategy: "LLMExtractionStrategy") -> CascadeTier:
+        tier = self._final_tiers.get(id(llm_strategy))
+        if tier is None:
+            tier = self._final_tiers[id(llm_strategy)] = CascadeTier(llm_strategy)
+        return tier
+
+    async def extract(
+        self,
+        element_htmls: List[str],
+        llm_strategy: "LLMExtractionStrategy",
+        required_keys: List[str],
+        extract_with: Callable[["LLMExtractionStrategy", List[str], bool], Awaitable[List[Optional[dict]]]],
+        label: str,
+    ) -> Tuple[List[Optional[dict]], List[Optional[str]]]:
+        """
+        Extracts one car per listing element, escalating through the tiers up to
+        `llm_strategy`. `extract_with(strategy, element_htmls, is_final)` runs one model
+        over the listings still pending and returns one car (or None) per element.
+        Returns the cars, and for each the version of the tier that extracted it.
+        """
+        cars: List[Optional[dict]] = [None] * len(element_htmls)
+        versions: List[Optional[str]] = [None] * len(element_htmls)
+        pending = list(range(len(element_htmls)))
+        tiers = self.tiers + [self.final_tier(llm_strategy)]
+
+        for level, tier in enumerate(tiers):
+            if not pending:
+                break
+            is_final = level == len(tiers) - 1
+            start = time.monotonic()
+            tier_cars = await extract_with(tier.llm_strategy, [element_htmls[position] for position in pending], is_final)
+            elapsed = time.monotonic() - start
+            tier.requests += 1
+            tier.seconds += elapsed
+            tier.listings += len(pending)
+            metrics.observe(f"cascade_tier_{level}_seconds", elapsed)
+
+            escalated = []
+            for position, car in zip(pending, tier_cars):
+                reason = rejection_reason(car, element_htmls[position], required_keys)
+                if reason is None:
+                    tier.accepted += 1
+                    cars[position] = car
+                    versions[position] = tier.version
+                elif is_final:
+                    # Nothing to escalate to; post-processing decides what to keep
+                    cars[position] = car
+                    versions[position] = tier.version
+                else:
+                    escalated.append(position)
+                    log(DEBUG, "Escalating listing", label=label, tier=tier.name, reason=reason, car=car)
+            tier.escalated += len(escalated)
+            if escalated:
+                metrics.count("cascade_escalations", len(escalated))
+            pending = escalated
+        return cars, versions
+
+    def show_stats(self) -> None:
+        """Print every tier's hit rate, latency and tokens, cheapest first."""
+        print("\n=== Model Cascade Summary ===")
+        print(
+            f"{'Tier':<28} {'Listings':>9} {'Accepted':>9} {'Hit rate':>9} {'Escalated':>10} "
+            f"{'ms/request':>11} {'Prompt tk':>10} {'Compl tk':>9} {'Tokens/car':>11}"
+        )
+        print("-" * 113)
+        for tier in self.tiers + list(self._final_tiers.values()):
+            usage = tier.llm_strategy.total_usage
+            tokens = usage.prompt_tokens + usage.completion_tokens
+            print(
+                f"{tier.name[:28]:<28} {tier.listings:>9,} {tier.accepted:>9,} "
+                f"{tier.accepted / tier.listings if tier.listings else 0.0:>9.1%} {tier.escalated:>10,} "
+                f"{tier.seconds / tier.requests * 1000 if tier.requests else 0.0:>11.0f} "
+                f"{usage.prompt_tokens:>10,} {usage.completion_tokens:>9,} "
+                f"{tokens / tier.accepted if tier.accepted else 0.0:>11,.0f}"
+            )
@@ -0,0 +1,239 @@
+import asyncio
+import itertools
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional
+
+from aiohttp import web
+
+from models.car import CarBatch
+from utils.metrics_utils import ERROR, INFO, log
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+
+class CrawlJob:
+    """
+    One crawl submitted to the daemon: a search URL with its own selector and limits, and
+    the cars extracted so far. The job is the car sink of its crawl, so every saved car is
+    appended to `cars` and wakes whoever streams them.
+    """
+
+    def __init__(self, job_id: str, url: str, css_selector: str, max_listings: int, max_scrolls: int):
+        self.job_id = job_id
+        self.url = url
+        self.css_selector = css_selector
+        self.max_listings = max_listings
+        self.max_scrolls = max_scrolls
+        self.status = QUEUED
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.cars = CarBatch()
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+
+    def _notify(self) -> None:
+        # Every waiter holds the event of the moment it started waiting, so setting it and
+        # starting a new one wakes them all exactly once
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def write(self, car: dict) -> None:
+        self.cars.append(car)
+        self._notify()
+
+    def set_status(self, status: str, error: Optional[str] = None) -> None:
+        self.status = status
+        self.error = error
+        if status == RUNNING:
+            self.started_at = time.time()
+        elif status in FINISHED:
+            self.finished_at = time.time()
+        self._notify()
+
+    async def stream(self, offset: int = 0):
+        """Yields the cars from position `offset` on, waiting for new ones until the job finishes."""
+        while True:
+            changed = self._changed
+            while offset < len(self.cars):
+                yield self.cars[offset]
+                offset += 1
+            if self.status in FINISHED:
+                return
+            await changed.wait()
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.job_id,
+            "url": self.url,
+            "css_selector": self.css_selector,
+            "max_listings": self.max_listings,
+            "max_scrolls": self.max_scrolls,
+            "status": self.status,
+            "cars": len(self.cars),
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class CrawlDaemon:
+    """
+    Local job API in front of a long-running crawler, so every crawl after the first skips
+    the imports, browser start and LLM strategy set-up that dominate a short one-shot run:
+
+        POST   /jobs              {"url": ..., "css_selector": ..., "max_listings": ..., "max_scrolls": ...}
+        GET    /jobs              every job the daemon still remembers
+        GET    /jobs/{id}         status of one job
+        GET    /jobs/{id}/cars    its cars as JSON lines, streamed until the job finishes;
+                                  ?offset=N starts after the first N
+        DELETE /jobs/{id}         cancels a queued or running job
+
+    `crawl(job)` runs one job with the warm browser and helpers its caller owns, writing
+    cars to the job. At most `max_concurrent_jobs` run at a time; the others wait in
+    order. Only the last `max_finished_jobs` finished jobs, and their cars, are kept.
+    """
+
+    def __init__(
+        self,
+        crawl: Callable[[CrawlJob], Awaitable[None]],
+        default_css_selector: str,
+        default_max_listings: int,
+        default_max_scrolls: int,
+        max_concurrent_jobs: int,
+        max_finished_jobs: int,
+    ):
+        self.crawl = crawl
+        self.defaults = {
+            "css_selector": default_css_selector,
+            "max_listings": default_max_listings,
+            "max_scrolls": default_max_scrolls,
+        }
+        self.slots = asyncio.Semaphore(max(1, max_concurrent_jobs))
+        self.max_finished_jobs = max_finished_jobs
+        self.jobs: "OrderedDict[str, CrawlJob]" = OrderedDict()
+        self.job_ids = itertools.count(1)
+
+        self.app = web.Application()
+        self.app.add_routes(
+            [
+                web.post("/jobs", self.submit),
+                web.get("/jobs", self.list_jobs),
+                web.get("/jobs/{job_id}", self.get_job),
+                web.get("/jobs/{job_id}/cars", self.stream_cars),
+                web.delete("/jobs/{job_id}", self.cancel_job),
+            ]
+        )
+
+    async def run_job(self, job: CrawlJob) -> None:
+        try:
+            async with self.slots:
+                job.set_status(RUNNING)
+                log(INFO, "Job started", job=job.job_id, url=job.url)
+                await self.crawl(job)
+        except asyncio.CancelledError:
+            job.set_status(CANCELLED)
+            log(INFO, "Job cancelled", job=job.job_id, cars=len(job.cars))
+        except Exception as e:
+            job.set_status(FAILED, str(e))
+            log(ERROR, "Job failed", job=job.job_id, error=e)
+        else:
+            job.set_status(DONE)
+            log(INFO, "Job finished", job=job.job_id, cars=len(job.cars))
+        finally:
+            self.forget_finished_jobs()
+
+    def forget_finished_jobs(self) -> None:
+        finished = [job_id for job_id, job in self.jobs.items() if job.status in FINISHED]
+        for job_id in finished[: max(0, len(finished) - self.max_finished_jobs)]:
+            del self.jobs[job_id]
+
+    def find_job(self, request: web.Request) -> CrawlJob:
+        job = self.jobs.get(request.match_info["job_id"])
+        if job is None:
+            raise web.HTTPNotFound(text=json.dumps({"error": "unknown job"}), content_type="application/json")
+        return job
+
+    async def submit(self, request: web.Request) -> web.Response:
+        try:
+            body = await request.json()
+            if not isinstance(body, dict) or not isinstance(body.get("url"), str):
+                raise ValueError("a job needs a 'url'")
+            options = {key: default if body.get(key) is None else body[key] for key, default in self.defaults.items()}
+            for key in ("max_listings", "max_scrolls"):
+                try:
+                    options[key] = int(options[key])
+                except (TypeError, ValueError):
+                    options[key] = 0
+                # A negative limit would cut listings off, and no scrolls would crawl nothing
+                if options[key] <= 0:
+                    raise ValueError(f"'{key}' must be a positive integer")
+        except (TypeError, ValueError) as e:
+            return web.json_response({"error": str(e)}, status=400)
+
+        job = CrawlJob(str(next(self.job_ids)), body["url"], **options)
+        self.jobs[job.job_id] = job
+        job.task = asyncio.create_task(self.run_job(job))
+        log(INFO, "Job queued", job=job.job_id, url=job.url)
+        return web.json_response(job.to_dict(), status=201)
+
+    async def list_jobs(self, request: web.Request) -> web.Response:
+        return web.json_response([job.to_dict() for job in self.jobs.values()])
+
+    async def get_job(self, request: web.Request) -> web.Response:
+        return web.json_response(self.find_job(request).to_dict())
+
+    async def stream_cars(self, request: web.Request) -> web.StreamResponse:
+        job = self.find_job(request)
+        offset = request.query.get("offset", "0")
+        if not offset.isdigit():
+            return web.json_response({"error": "'offset' must be a non-negative integer"}, status=400)
+        response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+        await response.prepare(request)
+        async for car in job.stream(int(offset)):
+            await response.write(json.dumps(car).encode("utf-8") + b"\n")
+        await response.write_eof()
+        return response
+
+    async def cancel_job(self, request: web.Request) -> web.Response:
+        job = self.find_job(request)
+        if job.status not in FINISHED:
+            job.task.cancel()
+            # Let the job unwind, so the response shows it cancelled
+            await asyncio.gather(job.task, return_exceptions=True)
+        return web.json_response(job.to_dict())
+
+    async def serve(self, host: str, port: int, socket_path: Optional[str] = None) -> None:
+        """
+        Serves the API on `socket_path` if given, otherwise on `host`:`port`, until the
+        task is cancelled. Jobs still running are cancelled on the way out.
+        """
+        # Jobs are logged by the daemon itself; one line per request would drown them
+        runner = web.AppRunner(self.app, access_log=None)
+        await runner.setup()
+        if socket_path:
+            if os.path.exists(socket_path):
+                os.remove(socket_path)
+            site = web.UnixSite(runner, socket_path)
+        else:
+            site = web.TCPSite(runner, host, port)
+        await site.start()
+        log(INFO, "Daemon listening", address=socket_path or f"http://{host}:{port}")
+        try:
+            await asyncio.Event().wait()
+        finally:
+            tasks = [job.task for job in self.jobs.values() if job.status not in FINISHED]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await runner.cleanup()
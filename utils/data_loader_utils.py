@@ -1,8 +1,8 @@
 import csv
-import csv
+import os
 from typing import List
-from models.car import Car
-from models.car import Car
+from models.car import Car, CarBatch
+from utils.metrics_utils import DEBUG, ERROR, INFO, log
 
 
 def is_duplicate_car(car_identifier: str, seen_identifiers: set) -> bool:
@@ -15,11 +15,11 @@ def is_complete_car(car: dict, required_keys: list) -> bool:
 
 def save_cars_to_csv(cars: List[dict], filename: str):
     if not cars:
-        print("[INFO] No cars to save.")
+        log(INFO, "No cars to save")
         return
 
-    fieldnames = list(Car.model_fields.keys())  # ['year', 'name', 'kilometers', 'price']
-    print(f"[INFO] Saving cars to '{filename}' with fieldnames: {fieldnames}")
+    fieldnames = list(Car.model_fields.keys())  # ['year', 'make', 'name', 'kilometers', 'price_cents', 'currency']
+    log(INFO, "Saving cars", path=filename, fieldnames=fieldnames)
 
     successful_cars = []
     for idx, car in enumerate(cars, 1):
@@ -27,13 +27,13 @@ def save_cars_to_csv(cars: List[dict], filename: str):
             # Remove the 'error' field and any other unexpected fields
             cleaned_car = {key: car[key] for key in fieldnames if key in car}
             successful_cars.append(cleaned_car)
-            print(f"[INFO] Car {idx}/{len(cars)}: Cleaned car data: {cleaned_car}")
+            log(DEBUG, "Cleaned car data", car=f"{idx}/{len(cars)}", data=cleaned_car)
         except Exception as e:
-            print(f"[ERROR] Car {idx}/{len(cars)}: Failed to clean car data: {e}. Original car: {car}. Skipping this car.")
+            log(ERROR, "Skipping car that failed cleaning", car=f"{idx}/{len(cars)}", error=e, data=car)
             continue
 
     if not successful_cars:
-        print("[INFO] No cars to save after cleaning.")
+        log(INFO, "No cars to save after cleaning")
         return
 
     try:
@@ -41,6 +41,218 @@ def save_cars_to_csv(cars: List[dict], filename: str):
             writer = csv.DictWriter(file, fieldnames=fieldnames)
             writer.writeheader()
             writer.writerows(successful_cars)
-        print(f"[INFO] Saved {len(successful_cars)} cars to '{filename}'.")
+        log(INFO, "Saved cars", path=filename, cars=len(successful_cars))
     except Exception as e:
-        print(f"[ERROR] Failed to save cars to '{filename}': {e}")
+        log(ERROR, "Failed to save cars", path=filename, error=e)
+
+
+def car_identifier(car: dict) -> str:
+    """
+    Identity of a saved car: all of its fields, so only the same row saved twice matches.
+    Listings are deduplicated by their own identity before they are extracted; this is
+    for outputs merged or resumed without it.
+    """
+    return "|".join(str(car[field]) for field in Car.model_fields)
+
+
+def check_resumable_columns(columns, path: str) -> None:
+    """
+    Refuses to resume an output written with other columns, e.g. by a version from before
+    cars were typed: its rows have no identity to skip by, and appended rows would not
+    line up with its header.
+    """
+    expected = list(Car.model_fields.keys())
+    if list(columns or []) != expected:
+        raise ValueError(
+            f"Cannot resume '{path}': it has the columns {list(columns or [])}, but this version writes {expected}. "
+            "Move the file aside or start a fresh run with RESUME_RUN = False."
+        )
+
+
+class CsvCarSink:
+    """
+    Appends validated cars to a CSV file as they are extracted.
+
+    Rows are buffered and written every `flush_every` cars, and each write is flushed and
+    fsynced, so a crash loses at most the last unflushed batch. With `resume` the existing
+    file is kept and `existing_identifiers` lists the cars it already holds; otherwise the
+    file is started from scratch. `on_flush` is called with the cars of every write that
+    reached the disk.
+    """
+
+    def __init__(self, filename: str, flush_every: int, resume: bool, on_flush=None):
+        self.filename = filename
+        self.on_flush = on_flush
+        self.flush_every = max(1, flush_every)
+        self.fieldnames = list(Car.model_fields.keys())
+        self.buffer = CarBatch()
+        self.written = 0
+        self.existing_identifiers = set()
+
+        resuming = resume and os.path.exists(filename) and os.path.getsize(filename) > 0
+        if resuming:
+            with open(filename, mode="r", newline="", encoding="utf-8") as file:
+                reader = csv.DictReader(file)
+                check_resumable_columns(reader.fieldnames, filename)
+                for row in reader:
+                    self.existing_identifiers.add(car_identifier(row))
+            log(INFO, "Resuming output", path=filename, cars=len(self.existing_identifiers))
+
+        self.file = open(filename, mode="a" if resuming else "w", newline="", encoding="utf-8")
+        self.writer = csv.DictWriter(self.file, fieldnames=self.fieldnames)
+        if not resuming:
+            self.writer.writeheader()
+            self._sync()
+
+    def write(self, car: dict) -> None:
+        try:
+            validated_car = Car.model_validate(car).model_dump()
+        except Exception as e:
+            log(ERROR, "Not saving car that failed validation", error=e, car=car)
+            return
+        self.buffer.append(validated_car)
+        if len(self.buffer) >= self.flush_every:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self.buffer:
+            return
+        self.writer.writerows(self.buffer)
+        self._sync()
+        self.written += len(self.buffer)
+        flushed, self.buffer = self.buffer, CarBatch()
+        if self.on_flush is not None:
+            self.on_flush(flushed)
+
+    def _sync(self) -> None:
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self) -> None:
+        self.flush()
+        self.file.close()
+        log(INFO, "Saved cars", path=self.filename, cars=self.written)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class ParquetCarSink:
+    """
+    Writes validated cars as a directory of typed Parquet files, one file per flushed batch.
+
+    Each file is written under a temporary name and renamed into place, so readers and a
+    resumed run only ever see complete files. The directory can be read as one table with
+    `pyarrow.parquet.read_table(directory)` or `pandas.read_parquet(directory)`.
+    `on_flush` is called with the cars of every file that was renamed into place.
+    """
+
+    def __init__(self, directory: str, flush_every: int, resume: bool, on_flush=None):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("Parquet output requires pyarrow. Install it with 'pip install pyarrow'.") from e
+        self.pq = pq
+        self.directory = directory
+        self.on_flush = on_flush
+        self.flush_every = max(1, flush_every)
+        self.buffer = CarBatch()
+        self.written = 0
+        self.existing_identifiers = set()
+
+        os.makedirs(directory, exist_ok=True)
+        part_files = sorted(name for name in os.listdir(directory) if name.endswith(".parquet"))
+        if resume:
+            for name in part_files:
+                table = pq.read_table(os.path.join(directory, name))
+                check_resumable_columns(table.column_names, os.path.join(directory, name))
+                for car in table.to_pylist():
+                    self.existing_identifiers.add(car_identifier(car))
+            log(INFO, "Resuming output", path=directory, cars=len(self.existing_identifiers))
+        else:
+            for name in part_files:
+                os.unlink(os.path.join(directory, name))
+            part_files = []
+        self.next_part = len(part_files)
+
+    def write(self, car: dict) -> None:
+        try:
+            validated_car = Car.model_validate(car).model_dump()
+        except Exception as e:
+            log(ERROR, "Not saving car that failed validation", error=e, car=car)
+            return
+        self.buffer.append(validated_car)
+        if len(self.buffer) >= self.flush_every:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self.buffer:
+            return
+        table = self.buffer.to_arrow()
+        part_name = f"part-{self.next_part:06d}.parquet"
+        part_path = os.path.join(self.directory, part_name)
+        # Hidden while incomplete: pyarrow skips files starting with "." when reading the directory
+        temp_path = os.path.join(self.directory, f".{part_name}.tmp")
+        self.pq.write_table(table, temp_path)
+        os.replace(temp_path, part_path)
+        self.next_part += 1
+        self.written += len(self.buffer)
+        flushed, self.buffer = self.buffer, CarBatch()
+        if self.on_flush is not None:
+            self.on_flush(flushed)
+
+    def close(self) -> None:
+        self.flush()
+        log(INFO, "Saved cars", path=self.directory, cars=self.written)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def open_car_sink(output_format: str, path: str, flush_every: int, resume: bool, on_flush=None):
+    if output_format == "csv":
+        return CsvCarSink(path, flush_every, resume, on_flush)
+    if output_format == "parquet":
+        return ParquetCarSink(path, flush_every, resume, on_flush)
+    raise ValueError(f"Unsupported output format '{output_format}'. Use 'csv' or 'parquet'.")
+
+
+def read_cars(output_format: str, path: str) -> CarBatch:
+    """Reads back the cars written by a sink opened with `open_car_sink`."""
+    if not os.path.exists(path):
+        return CarBatch()
+    if output_format == "csv":
+        with open(path, mode="r", newline="", encoding="utf-8") as file:
+            return CarBatch.from_cars(Car.model_validate(row).model_dump() for row in csv.DictReader(file))
+    if output_format == "parquet":
+        import pyarrow.parquet as pq
+
+        if not any(name.endswith(".parquet") for name in os.listdir(path)):
+            return CarBatch()
+        return CarBatch.from_arrow(pq.read_table(path))
+    raise ValueError(f"Unsupported output format '{output_format}'. Use 'csv' or 'parquet'.")
+
+
+def merge_car_outputs(output_format: str, shard_paths: List[str], path: str, flush_every: int, resume: bool) -> int:
+    """
+    Merges the outputs of several workers into one output at `path`, one after the other.
+    Workers claim every listing in the shared dedup, so their outputs hold distinct
+    listings even where two cars look the same. Only cars the output already holds when
+    resuming are skipped. Returns the number of cars written.
+    """
+    merged = 0
+    with open_car_sink(output_format, path, flush_every, resume) as car_sink:
+        for shard_path in shard_paths:
+            for car in read_cars(output_format, shard_path):
+                if is_duplicate_car(car_identifier(car), car_sink.existing_identifiers):
+                    continue
+                car_sink.write(car)
+                merged += 1
+    log(INFO, "Merged worker outputs", path=path, cars=merged, outputs=len(shard_paths))
+    return merged
@@ -0,0 +1,256 @@
+import hashlib
+import math
+import re
+import sqlite3
+from typing import Dict, Iterable, List, Optional
+
+from utils.data_loader_utils import car_identifier
+from utils.metrics_utils import INFO, log
+from utils.rule_extraction_utils import visible_texts
+from utils.work_queue_utils import default_worker_id
+
+# Prices are left out of listing fingerprints, since a relisted car often comes back re-priced
+PRICE_TEXT_PATTERN = re.compile(r"[$€£]\s?\d[\d,.]*|\b\d[\d,.]*\s?(?:cad|usd|eur|gbp)\b")
+WORD_PATTERN = re.compile(r"\w+")
+SIMHASH_BITS = 64
+
+
+class BloomFilter:
+    """
+    Set membership in a fixed-size bit array: `key in filter` is never False for a key that
+    was added, and True for a key that was not with probability `false_positive_rate`
+    while at most `capacity` keys were added. The size does not grow with the keys, and
+    the bits can be stored and loaded with `bits`.
+    """
+
+    def __init__(self, capacity: int, false_positive_rate: float, bits: Optional[bytes] = None):
+        capacity = max(1, capacity)
+        self.size = max(8, int(-capacity * math.log(false_positive_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray(bits) if bits is not None else bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: str):
+        # Double hashing: k positions from the two halves of one digest
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+        return [(first + i * second) % self.size for i in range(self.hash_count)]
+
+    def add(self, key: str) -> None:
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+def listing_fingerprint(element_html: str) -> int:
+    """
+    64-bit SimHash of a listing's visible text without prices: listings whose words are
+    mostly the same get fingerprints that differ in few bits.
+    """
+    text = PRICE_TEXT_PATTERN.sub(" ", " ".join(visible_texts(element_html)).lower())
+    words = WORD_PATTERN.findall(text)
+    features = words + [f"{first} {second}" for first, second in zip(words, words[1:])]
+    weights = [0] * SIMHASH_BITS
+    for feature in features:
+        value = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+        for bit in range(SIMHASH_BITS):
+            weights[bit] += 1 if value >> bit & 1 else -1
+    return sum(1 << bit for bit, weight in enumerate(weights) if weight > 0)
+
+
+def _to_signed(value: int) -> int:
+    # SQLite integers are signed 64-bit
+    return value - (1 << SIMHASH_BITS) if value >= 1 << (SIMHASH_BITS - 1) else value
+
+
+class ListingDedup:
+    """
+    Listings handled in the current run, by their identity (see `listing_key`), kept in a
+    SQLite file so a resumed run and the worker processes of one crawl share them.
+
+    A listing is claimed before it is extracted, so no listing is extracted twice, and
+    released again when its extraction gave no car, so a later sighting retries it. A claim
+    whose car was handed to `track` counts as saved once `confirm` is called with that car
+    after it was flushed to the output; `discard_unconfirmed` drops the claims a crashed
+    run never saved. Lookups go through a Bloom filter first, so
+    memory stays bounded however many listings there are, and only keys the filter may
+    hold are confirmed in SQLite.
+
+    Every listing's fingerprint is kept across runs as well. A new listing with the same
+    year, name and kilometers as one of an earlier run that this run has not seen, whose
+    fingerprint is at most `near_duplicate_distance` bits away, is that car relisted under
+    a new link.
+    """
+
+    def __init__(self, path: str, expected_listings: int, false_positive_rate: float, near_duplicate_distance: int):
+        self.path = path
+        self.expected_listings = expected_listings
+        self.false_positive_rate = false_positive_rate
+        self.near_duplicate_distance = near_duplicate_distance
+        self.owner = default_worker_id()
+        self.claimed = 0
+        self.duplicates = 0
+        self.false_positives = 0
+        self.released = 0
+        self.relisted = 0
+        # Claims waiting for their car to be flushed, by the car's identity
+        self.unsaved_keys: Dict[str, List[str]] = {}
+
+        # Autocommit, so a claim is visible to the other workers as soon as it is made
+        self.connection = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS seen_listings (key TEXT PRIMARY KEY, owner TEXT NOT NULL, saved INTEGER NOT NULL)"
+        )
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS bloom_filter ("
+            "id INTEGER PRIMARY KEY CHECK (id = 0), size INTEGER NOT NULL, hash_count INTEGER NOT NULL, "
+            "key_count INTEGER NOT NULL, bits BLOB NOT NULL)"
+        )
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS fingerprints ("
+            "key TEXT PRIMARY KEY, simhash INTEGER NOT NULL, year INTEGER, name TEXT, kilometers INTEGER)"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS fingerprints_car ON fingerprints (year, name, kilometers)")
+        self.bloom = self._load_bloom()
+
+    def _load_bloom(self) -> BloomFilter:
+        """
+        The stored filter when it holds exactly the seen listings, otherwise one rebuilt
+        from them, e.g. after other workers claimed listings or claims were released.
+        """
+        bloom = BloomFilter(self.expected_listings, self.false_positive_rate)
+        key_count = self.connection.execute("SELECT COUNT(*) FROM seen_listings").fetchone()[0]
+        self.bloom_key_count = key_count
+        row = self.connection.execute("SELECT size, hash_count, key_count, bits FROM bloom_filter").fetchone()
+        if row is not None and row[:3] == (bloom.size, bloom.hash_count, key_count):
+            return BloomFilter(self.expected_listings, self.false_positive_rate, row[3])
+        for (key,) in self.connection.execute("SELECT key FROM seen_listings"):
+            bloom.add(key)
+        return bloom
+
+    def _save_bloom(self) -> None:
+        # Stored with the number of keys this process put in it, which only matches the
+        # table when no other process claimed or released anything meanwhile
+        self.connection.execute(
+            "INSERT OR REPLACE INTO bloom_filter (id, size, hash_count, key_count, bits) VALUES (0, ?, ?, ?, ?)",
+            (self.bloom.size, self.bloom.hash_count, self.bloom_key_count, bytes(self.bloom.bits)),
+        )
+
+    def reset(self) -> None:
+        """Forgets the listings of the previous run. Fingerprints are kept."""
+        self.connection.execute("DELETE FROM seen_listings")
+        self.connection.execute("DELETE FROM bloom_filter")
+        self.bloom = BloomFilter(self.expected_listings, self.false_positive_rate)
+        self.bloom_key_count = 0
+
+    def discard_unconfirmed(self, owner: Optional[str] = None) -> None:
+        """
+        Releases the claims whose cars never reached the output: those of an interrupted
+        run, or with `owner` those of one worker that crashed.
+        """
+        if owner is None:
+            discarded = self.connection.execute("DELETE FROM seen_listings WHERE saved = 0").rowcount
+        else:
+            discarded = self.connection.execute(
+                "DELETE FROM seen_listings WHERE saved = 0 AND owner = ?", (owner,)
+            ).rowcount
+        if discarded:
+            log(INFO, "Retrying listings that were claimed but not saved", listings=discarded)
+
+    def __contains__(self, key: str) -> bool:
+        """Whether `key` was claimed in this run, as far as this process knows."""
+        if key not in self.bloom:
+            return False
+        return self.connection.execute("SELECT 1 FROM seen_listings WHERE key = ?", (key,)).fetchone() is not None
+
+    def claim(self, key: str) -> bool:
+        """
+        Claims the listing `key` for this process. Returns False when it was already claimed
+        in this run, by this or another process.
+        """
+        if key in self.bloom:
+            if self.connection.execute("SELECT 1 FROM seen_listings WHERE key = ?", (key,)).fetchone() is not None:
+                self.duplicates += 1
+                return False
+            self.false_positives += 1
+        inserted = self.connection.execute(
+            "INSERT OR IGNORE INTO seen_listings (key, owner, saved) VALUES (?, ?, 0)", (key, self.owner)
+        ).rowcount
+        self.bloom.add(key)
+        self.bloom_key_count += 1
+        if not inserted:
+            # Another worker claimed it since the lookup
+            self.duplicates += 1
+            return False
+        self.claimed += 1
+        return True
+
+    def release(self, key: str) -> None:
+        """Gives up an unsaved claim, e.g. because its extraction failed. The key stays in the filter."""
+        self.released += self.connection.execute(
+            "DELETE FROM seen_listings WHERE key = ? AND owner = ? AND saved = 0", (key, self.owner)
+        ).rowcount
+
+    def track(self, key: str, car: dict) -> None:
+        """Remembers that the claim `key` gave `car`, which `confirm` is called with once it is saved."""
+        self.unsaved_keys.setdefault(car_identifier(car), []).append(key)
+
+    def confirm(self, cars: Iterable[dict]) -> None:
+        """
+        Marks the claims that gave `cars` as saved; call it once the cars are flushed to the
+        output. Only those claims are: the ones of listings still being extracted, by this
+        or a concurrent crawl, can still be released.
+        """
+        keys = []
+        for car in cars:
+            identifier = car_identifier(car)
+            pending = self.unsaved_keys.get(identifier)
+            if pending:
+                keys.append(pending.pop())
+                if not pending:
+                    del self.unsaved_keys[identifier]
+        self.connection.executemany(
+            "UPDATE seen_listings SET saved = 1 WHERE key = ? AND owner = ?", [(key, self.owner) for key in keys]
+        )
+
+    def relisted_from(self, key: str, element_html: str, car: dict) -> Optional[str]:
+        """
+        Records the fingerprint of the listing `key` and returns the key of a listing of an
+        earlier run that this one relists, if there is one. Near-duplicates claimed in this
+        run are live listings of their own, not earlier versions of this one.
+        """
+        fingerprint = listing_fingerprint(element_html)
+        previous = None
+        for other_key, other_fingerprint in self.connection.execute(
+            "SELECT key, simhash FROM fingerprints WHERE year = ? AND name = ? AND kilometers = ? AND key != ?",
+            (car["year"], car["name"], car["kilometers"], key),
+        ):
+            distance = bin(fingerprint ^ (other_fingerprint & ((1 << SIMHASH_BITS) - 1))).count("1")
+            if distance <= self.near_duplicate_distance and other_key not in self:
+                previous = other_key
+                break
+        self.connection.execute(
+            "INSERT OR REPLACE INTO fingerprints (key, simhash, year, name, kilometers) VALUES (?, ?, ?, ?, ?)",
+            (key, _to_signed(fingerprint), car["year"], car["name"], car["kilometers"]),
+        )
+        if previous is not None:
+            self.relisted += 1
+        return previous
+
+    def show_stats(self) -> None:
+        print("\n=== Listing Dedup Summary ===")
+        print(f"{'Type':<22} {'Count':>10}")
+        print("-" * 33)
+        print(f"{'Claimed':<22} {self.claimed:>10,}")
+        print(f"{'Duplicates':<22} {self.duplicates:>10,}")
+        print(f"{'Filter false positives':<22} {self.false_positives:>10,}")
+        print(f"{'Released':<22} {self.released:>10,}")
+        print(f"{'Relisted':<22} {self.relisted:>10,}")
+        print(f"Bloom filter: {len(self.bloom.bits) / 1024:,.0f} KiB, {self.bloom.hash_count} hashes")
+
+    def close(self) -> None:
+        self._save_bloom()
+        self.connection.close()
@@ -0,0 +1,174 @@
+import asyncio
+import copy
+import json
+from typing import Any, Awaitable, Callable, Dict, Hashable, List
+
+from crawl4ai.extraction_strategy import LLMExtractionStrategy
+from crawl4ai.models import TokenUsage
+from crawl4ai.utils import (
+    escape_json_string,
+    extract_xml_data,
+    perform_completion_with_backoff,
+    sanitize_html,
+    split_and_parse_json_objects,
+)
+
+from utils.metrics_utils import metrics
+from utils.text_reduction_utils import count_tokens
+
+# crawl4ai's schema extraction prompt with everything that is the same for every listing
+# moved ahead of the listing, so consecutive prompts share a prefix byte for byte
+PROMPT_PREFIX_TEMPLATE = """You will be given the content of a URL and a request for what information to extract from it.
+
+The user has made the following request for what information to extract from the content:
+
+<user_request>
+{REQUEST}
+</user_request>
+
+<schema_block>
+{SCHEMA}
+</schema_block>
+
+Please carefully read the URL content and the user's request. If the user provided a desired JSON schema in the <schema_block> above, extract the requested information from the URL content according to that schema. If no schema was provided, infer an appropriate JSON schema based on the user's request that will best capture the key information they are looking for.
+
+Extraction instructions:
+Return the extracted information as a list of JSON objects, with each object in the list corresponding to a block of content from the URL, in the same order as it appears on the page. Wrap the entire JSON list in <blocks>...</blocks> XML tags.
+
+Quality Reflection:
+Before outputting your final answer, double check that the JSON you are returning is complete, containing all the information requested by the user, and is valid JSON that could be parsed by json.loads() with no errors or omissions. The outputted JSON objects should fully match the schema, either provided or inferred.
+
+Quality Score:
+After reflecting, score the quality and completeness of the JSON data you are about to return on a scale of 1 to 5. Write the score inside <score> tags.
+
+Avoid Common Mistakes:
+- Do NOT add any comments using "//" or "#" in the JSON output. It causes parsing errors.
+- Make sure the JSON is properly formatted with curly braces, square brackets, and commas in the right places.
+- Do not miss closing </blocks> tag at the end of the JSON output.
+- Do not generate Python code showing how to do the task; extract the information and return it in JSON format.
+
+Here is the content from the URL:
+"""
+PROMPT_CONTENT_TEMPLATE = """<url>{URL}</url>
+
+<url_content>
+{HTML}
+</url_content>
+
+Result
+Output the final list of JSON objects, wrapped in <blocks>...</blocks> XML tags. Make sure to close the tag properly."""
+# OpenAI only caches prompt prefixes of at least this many tokens
+MIN_CACHED_PREFIX_TOKENS = 1024
+
+
+class ExtractionClient(LLMExtractionStrategy):
+    """
+    `LLMExtractionStrategy` whose prompts start with a static prefix: the instruction,
+    the schema and the extraction rules, serialized once when the client is built. Only
+    the listing content follows it, so every request repeats the same leading bytes and
+    providers that cache prompt prefixes (OpenAI does so automatically from
+    MIN_CACHED_PREFIX_TOKENS tokens) bill and process them as cached. crawl4ai's own prompt
+    starts with the content, which defeats that cache. A prefix shorter than that is never
+    cached, so the instruction has to bring the prefix up to it, e.g. with worked examples.
+
+    `cached_prompt_tokens` adds up the prompt tokens the provider reported as cached.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prompt_prefix = PROMPT_PREFIX_TEMPLATE.replace("{REQUEST}", self.instruction or "").replace(
+            "{SCHEMA}", json.dumps(self.schema or {}, indent=2)
+        )
+        self.prompt_prefix_tokens = count_tokens(self.prompt_prefix)
+        self.cached_prompt_tokens = 0
+
+    def build_prompt(self, url: str, html: str) -> str:
+        content = PROMPT_CONTENT_TEMPLATE.replace("{URL}", url).replace("{HTML}", escape_json_string(sanitize_html(html)))
+        return self.prompt_prefix + content
+
+    def extract(self, url: str, ix: int, html: str) -> List[Dict[str, Any]]:
+        response = perform_completion_with_backoff(
+            self.provider,
+            self.build_prompt(url, html),
+            self.api_token,
+            base_url=self.api_base or self.base_url,
+            extra_args=self.extra_args,
+        )
+        usage = TokenUsage(
+            completion_tokens=response.usage.completion_tokens,
+            prompt_tokens=response.usage.prompt_tokens,
+            total_tokens=response.usage.total_tokens,
+            completion_tokens_details=(
+                response.usage.completion_tokens_details.__dict__ if response.usage.completion_tokens_details else {}
+            ),
+            prompt_tokens_details=(
+                response.usage.prompt_tokens_details.__dict__ if response.usage.prompt_tokens_details else {}
+            ),
+        )
+        self.usages.append(usage)
+        self.total_usage.completion_tokens += usage.completion_tokens
+        self.total_usage.prompt_tokens += usage.prompt_tokens
+        self.total_usage.total_tokens += usage.total_tokens
+        cached_tokens = (usage.prompt_tokens_details or {}).get("cached_tokens") or 0
+        if cached_tokens:
+            self.cached_prompt_tokens += cached_tokens
+            metrics.count("cached_prompt_tokens", cached_tokens)
+
+        # Parsed like crawl4ai does, so callers see the same blocks and error blocks
+        content = response.choices[0].message.content
+        try:
+            blocks = json.loads(extract_xml_data(["blocks"], content)["blocks"])
+            for block in blocks:
+                block["error"] = False
+        except Exception:
+            blocks, unparsed = split_and_parse_json_objects(content)
+            if unparsed:
+                blocks.append({"index": 0, "error": True, "tags": ["error"], "content": unparsed})
+        return blocks
+
+    def show_usage(self) -> None:
+        super().show_usage()
+        prompt_tokens = self.total_usage.prompt_tokens
+        cacheable = "cacheable" if self.prompt_prefix_tokens >= MIN_CACHED_PREFIX_TOKENS else "too short to be cached"
+        print(f"\nPrompt prefix: {self.prompt_prefix_tokens:,} tokens ({cacheable})")
+        print(
+            f"Cached prompt tokens: {self.cached_prompt_tokens:,} "
+            f"({self.cached_prompt_tokens / prompt_tokens if prompt_tokens else 0.0:.1%} of prompt tokens)"
+        )
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key: while a call is in flight, later calls
+    with its key wait for it and get a copy of its result (or its error) instead of
+    making their own. Finished calls are not remembered; that is the extraction cache's job.
+
+    The call runs in a task of its own, so a cancelled caller, the first one included,
+    only stops waiting: the call finishes for the callers still waiting on it.
+    """
+
+    def __init__(self):
+        self.in_flight: Dict[Hashable, asyncio.Task] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    def _finished(self, key: Hashable, task: asyncio.Task) -> None:
+        if self.in_flight.get(key) is task:
+            del self.in_flight[key]
+        # Retrieved here, so an error nobody waited for any more is not reported as unhandled
+        if not task.cancelled():
+            task.exception()
+
+    async def run(self, key: Hashable, call: Callable[[], Awaitable[Any]]) -> Any:
+        task = self.in_flight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            metrics.count("coalesced_llm_calls")
+        else:
+            self.calls += 1
+            task = asyncio.ensure_future(call())
+            self.in_flight[key] = task
+            task.add_done_callback(lambda finished: self._finished(key, finished))
+        # Shielded, so a cancelled caller does not cancel the call the others wait for.
+        # Every caller gets its own copy, because callers post-process the cars in place.
+        return copy.deepcopy(await asyncio.shield(task))
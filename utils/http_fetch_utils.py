@@ -0,0 +1,343 @@
+import hashlib
+import importlib.util
+import json
+import logging
+import re
+from decimal import Decimal, InvalidOperation
+from typing import Iterator, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from models.car import CURRENCY_SYMBOLS, Car, parse_kilometers, parse_price
+from utils.dedup_utils import ListingDedup
+from utils.listing_index_utils import ListingIndex, link_key
+from utils.metrics_utils import DEBUG, ERROR, INFO, log, metrics
+from utils.rate_limit_utils import RequestScheduler, raise_for_status
+
+# Same as the browser's, so both engines look alike to the site
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36"
+)
+
+NEXT_DATA_PATTERN = re.compile(r"<script[^>]*\bid=[\"']__NEXT_DATA__[\"'][^>]*>(.*?)</script>", re.DOTALL)
+JSON_LD_PATTERN = re.compile(r"<script[^>]*\btype=[\"']application/ld\+json[\"'][^>]*>(.*?)</script>", re.DOTALL)
+YEAR_PATTERN = re.compile(r"(?:19|20)\d{2}")
+
+# Names sites give car fields in their data, including schema.org's Car vocabulary
+YEAR_KEYS = ("year", "modelYear", "model_year", "vehicleModelDate", "productionDate")
+NAME_KEYS = ("name", "title", "displayName")
+MAKE_KEYS = ("make", "brand", "manufacturer")
+MODEL_KEYS = ("model",)
+TRIM_KEYS = ("trim", "vehicleConfiguration")
+KILOMETERS_KEYS = ("kilometers", "mileage", "odometer", "mileageFromOdometer", "km")
+PRICE_KEYS = ("price", "listPrice", "salePrice", "offers")
+CURRENCY_KEYS = ("currency", "priceCurrency")
+LINK_KEYS = ("url", "href", "link")
+ID_KEYS = ("id", "vin", "stockNumber", "sku")
+MILE_UNITS = ("SMI", "mi", "miles")
+KILOMETERS_PER_MILE = Decimal("1.609344")
+
+
+def _first(record: dict, keys: tuple):
+    return next((record[key] for key in keys if record.get(key) not in (None, "")), None)
+
+
+def _label(value) -> Optional[str]:
+    """A make or model, given as text or as an object with a name (schema.org Brand)."""
+    if isinstance(value, dict):
+        value = value.get("name")
+    return str(value).strip() if value not in (None, "") else None
+
+
+def _year(value) -> int:
+    match = YEAR_PATTERN.search(str(value))
+    if match is None:
+        raise ValueError(f"No year in {value!r}")
+    return int(match.group(0))
+
+
+def _kilometers(value) -> int:
+    unit = None
+    if isinstance(value, dict):
+        # schema.org QuantitativeValue, e.g. {"value": 72942, "unitCode": "KMT"}
+        unit = value.get("unitCode") or value.get("unit")
+        value = value.get("value")
+    if isinstance(value, str):
+        if any(word in value.lower() for word in ("mi", "mile")) and "km" not in value.lower():
+            unit = "mi"
+        kilometers = parse_kilometers(value)
+    else:
+        kilometers = int(value)
+    if unit in MILE_UNITS:
+        kilometers = int(kilometers * KILOMETERS_PER_MILE)
+    return kilometers
+
+
+def _price(value, currency: Optional[str]) -> Tuple[int, str]:
+    """Price in cents and currency code, from a number in currency units, a display string or an offer."""
+    if isinstance(value, list):
+        value = value[0] if value else None
+    if isinstance(value, dict):
+        currency = _first(value, CURRENCY_KEYS) or currency
+        value = _first(value, ("price", "amount", "value", "lowPrice"))
+    if isinstance(value, str) and not value.replace(".", "", 1).isdigit():
+        cents, parsed_currency = parse_price(value if currency is None else f"{value} {currency}")
+        return cents, parsed_currency
+    try:
+        cents = int(Decimal(str(value)) * 100)
+    except InvalidOperation as e:
+        raise ValueError(f"No price in {value!r}") from e
+    return cents, currency or CURRENCY_SYMBOLS["$"]
+
+
+def car_from_record(record: dict) -> Optional[dict]:
+    """
+    Maps one listing record of a site's data to a validated `Car` dict, or None when the
+    record does not hold a complete car.
+    """
+    make = _label(_first(record, MAKE_KEYS))
+    name = _first(record, NAME_KEYS)
+    if not isinstance(name, str) or not name.strip():
+        parts = [make, _label(_first(record, MODEL_KEYS)), _label(_first(record, TRIM_KEYS))]
+        name = " ".join(part for part in parts if part)
+    try:
+        year = _year(_first(record, YEAR_KEYS))
+        # Titles often start with the year, which the name leaves out
+        name = re.sub(rf"^\s*{year}\s+", "", name.strip())
+        price_cents, currency = _price(_first(record, PRICE_KEYS), _first(record, CURRENCY_KEYS))
+        car = {
+            "year": year,
+            "name": name,
+            "kilometers": _kilometers(_first(record, KILOMETERS_KEYS)),
+            "price_cents": price_cents,
+            "currency": currency,
+        }
+        if make:
+            car["make"] = make
+        return Car.model_validate(car).model_dump()
+    except (TypeError, ValueError):
+        return None
+
+
+def is_car_record(value) -> bool:
+    """Whether a JSON object looks like a car listing: it has a year, a mileage and a price."""
+    return isinstance(value, dict) and all(
+        _first(value, keys) is not None for keys in (YEAR_KEYS, KILOMETERS_KEYS, PRICE_KEYS)
+    )
+
+
+def iter_car_records(data) -> Iterator[dict]:
+    """Every car listing record anywhere in a JSON document, in document order."""
+    stack = [data]
+    while stack:
+        value = stack.pop()
+        if is_car_record(value):
+            yield value
+        elif isinstance(value, dict):
+            stack.extend(reversed(list(value.values())))
+        elif isinstance(value, list):
+            stack.extend(reversed(value))
+
+
+def embedded_data(html: str) -> List:
+    """The JSON documents a page embeds for its scripts: Next.js page data and JSON-LD blocks."""
+    documents = []
+    for pattern in (NEXT_DATA_PATTERN, JSON_LD_PATTERN):
+        for match in pattern.finditer(html):
+            try:
+                documents.append(json.loads(match.group(1)))
+            except ValueError:
+                log(DEBUG, "Skipped embedded data that is not JSON", length=len(match.group(1)))
+    return documents
+
+
+def record_key(record: dict, base_url: str) -> str:
+    """
+    Identity of a listing record, in the form `listing_key` gives the same listing in the
+    browser: its link's path (see `link_key`), its id, or a digest of the record.
+    """
+    link = _first(record, LINK_KEYS)
+    if isinstance(link, str):
+        return link_key(link, base_url)
+    identifier = _first(record, ID_KEYS)
+    if identifier is not None:
+        return f"id:{identifier}"
+    return f"digest:{hashlib.sha256(json.dumps(record, sort_keys=True).encode('utf-8')).hexdigest()}"
+
+
+class HttpFetcher:
+    """
+    Pooled async HTTP client for fetching listing pages and APIs without a browser.
+
+    Connections are kept alive and reused, HTTP/2 is used when the `h2` package is
+    installed, and at most `max_connections` requests are in flight; the others wait for
+    a connection. Hosts whose pages held no listing data are remembered, so later crawls
+    of them go straight to the browser.
+    """
+
+    def __init__(self, max_connections: int, timeout_seconds: float, http2: bool = True):
+        try:
+            import httpx
+        except ImportError as e:
+            raise ImportError("HTTP fetching requires httpx. Install it with 'pip install httpx[http2]'.") from e
+        # httpx logs every request at INFO; the fetcher logs per search instead
+        logging.getLogger("httpx").setLevel(logging.WARNING)
+        self.http2 = http2 and importlib.util.find_spec("h2") is not None
+        self.client = httpx.AsyncClient(
+            http2=self.http2,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            # Waiting for a free connection is how concurrency is bounded, so it has no timeout
+            timeout=httpx.Timeout(timeout_seconds, pool=None),
+            follow_redirects=True,
+            headers={"User-Agent": USER_AGENT, "Accept": "text/html,application/json;q=0.9,*/*;q=0.8"},
+        )
+        self.unstructured_hosts = set()
+        self.requests = 0
+        self.bytes_received = 0
+        self.structured_urls = 0
+        self.fallbacks = 0
+        self.continued_in_browser = 0
+        self.cars = 0
+
+    async def get(self, url: str, request_scheduler: Optional[RequestScheduler] = None):
+        """GETs `url`, through the site's rate limit and retries when a scheduler is given. Raises for error statuses."""
+
+        async def fetch():
+            with metrics.time("http_fetch"):
+                response = await self.client.get(url)
+            self.requests += 1
+            self.bytes_received += len(response.content)
+            raise_for_status(response, url)
+            return response
+
+        if request_scheduler is None:
+            response = await fetch()
+        else:
+            response = await request_scheduler.site(urlsplit(url).hostname or url).run(fetch, label=url)
+        # Only throttling and server errors are retried; any other error status fails at once
+        response.raise_for_status()
+        return response
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+    def show_stats(self) -> None:
+        print("\n=== HTTP Fetch Summary ===")
+        print(f"{'Type':<22} {'Value':>12}")
+        print("-" * 35)
+        print(f"{'Requests':<22} {self.requests:>12,}")
+        print(f"{'Received (KiB)':<22} {self.bytes_received / 1024:>12,.0f}")
+        print(f"{'URLs from data':<22} {self.structured_urls:>12,}")
+        print(f"{'Browser fallbacks':<22} {self.fallbacks:>12,}")
+        print(f"{'Continued in browser':<22} {self.continued_in_browser:>12,}")
+        print(f"{'Cars':<22} {self.cars:>12,}")
+        print(f"{'HTTP/2':<22} {'yes' if self.http2 else 'no':>12}")
+
+
+async def fetch_records(
+    http_fetcher: HttpFetcher,
+    base_url: str,
+    max_listings: int,
+    listings_api_url: Optional[str] = None,
+    request_scheduler: Optional[RequestScheduler] = None,
+) -> List[dict]:
+    """
+    The car listing records of a search: the pages of `listings_api_url` (a JSON endpoint
+    with a `{page}` placeholder, counted from 1) until one brings no new record, or else
+    the data embedded in the `base_url` page.
+    """
+    if not listings_api_url:
+        response = await http_fetcher.get(base_url, request_scheduler)
+        return [record for document in embedded_data(response.text) for record in iter_car_records(document)]
+
+    records = []
+    keys = set()
+    page = 1
+    while len(records) < max_listings:
+        response = await http_fetcher.get(listings_api_url.format(page=page), request_scheduler)
+        new_records = []
+        for record in iter_car_records(response.json()):
+            key = record_key(record, base_url)
+            if key not in keys:
+                keys.add(key)
+                new_records.append(record)
+        # An API that ignores the page number keeps serving the same records
+        if not new_records:
+            break
+        records.extend(new_records)
+        page += 1
+    return records
+
+
+async def fetch_cars_over_http(
+    http_fetcher: HttpFetcher,
+    base_url: str,
+    seen_listings: ListingDedup,
+    max_listings: int,
+    listings_api_url: Optional[str] = None,
+    listing_index: Optional[ListingIndex] = None,
+    request_scheduler: Optional[RequestScheduler] = None,
+) -> Optional[Tuple[List[dict], bool]]:
+    """
+    Fetches the cars of a search without a browser or the LLM, from the structured data
+    the site serves (see `fetch_records`), and returns the new ones and whether they are
+    all of the search. Returns None when the site gave no usable data, so the caller can
+    fall back to `stream_cars`.
+
+    Without `listings_api_url`, the data a page embeds holds its first listings only, so
+    fewer than `max_listings` records leave the rest of an infinitely scrolling search to
+    the browser; `stream_cars` skips the listings claimed here.
+
+    Listings are claimed in `seen_listings` like in the browser path, with the same keys
+    when the records link to their listing pages, and recorded in `listing_index`.
+    """
+    host = urlsplit(base_url).hostname
+    if host in http_fetcher.unstructured_hosts and not listings_api_url:
+        http_fetcher.fallbacks += 1
+        return None
+
+    log(INFO, "Fetching listings over HTTP", url=base_url, api=listings_api_url)
+    try:
+        records = await fetch_records(http_fetcher, base_url, max_listings, listings_api_url, request_scheduler)
+    except Exception as e:
+        http_fetcher.fallbacks += 1
+        log(ERROR, "HTTP fetch failed, falling back to the browser", url=base_url, error=e)
+        return None
+
+    cars = []
+    mapped = 0
+    for record in records:
+        car = car_from_record(record)
+        if car is None:
+            metrics.count("skipped_invalid")
+            log(DEBUG, "Record is not a complete car", record=record)
+            continue
+        mapped += 1
+        key = record_key(record, base_url)
+        if not seen_listings.claim(key):
+            metrics.count("duplicate_listings")
+            continue
+        if listing_index is not None:
+            content = json.dumps(record, sort_keys=True)
+            if listing_index.observe(content, key=key) is None:
+                listing_index.record(content, car, key=key)
+        seen_listings.track(key, car)
+        cars.append(car)
+        if len(cars) >= max_listings:
+            break
+
+    if not mapped:
+        http_fetcher.fallbacks += 1
+        if not listings_api_url:
+            http_fetcher.unstructured_hosts.add(host)
+        log(INFO, "No listing data over HTTP, falling back to the browser", url=base_url, records=len(records))
+        return None
+
+    http_fetcher.structured_urls += 1
+    http_fetcher.cars += len(cars)
+    metrics.count("http_cars", len(cars))
+    log(INFO, "Fetched cars over HTTP", url=base_url, records=len(records), cars=len(cars))
+    complete = bool(listings_api_url) or len(records) >= max_listings or len(cars) >= max_listings
+    if not complete:
+        http_fetcher.continued_in_browser += 1
+        log(INFO, "Page data ends before the listing limit, scrolling for the rest", url=base_url, records=len(records))
+    return cars, complete
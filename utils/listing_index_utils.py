@@ -0,0 +1,177 @@
+import json
+import re
+import sqlite3
+import time
+from typing import Optional
+from urllib.parse import urljoin, urlsplit
+
+from models.car import parse_price
+from utils.cache_utils import listing_digest
+
+HREF_PATTERN = re.compile(r"""href\s*=\s*["']([^"'#?]+)""")
+
+
+def link_key(href: str, base_url: str = "") -> str:
+    """
+    Identity of the listing page `href` links to: its path, resolved against `base_url`,
+    so relative and absolute links to the same page give the same key.
+    """
+    return f"url:{urlsplit(urljoin(base_url, href)).path}"
+
+
+def listing_key(element_html: str, base_url: str = "") -> str:
+    """
+    Identity of a listing across runs, from its HTML alone: the first link in the element,
+    or the content digest when the element has no link. Listings snapshotted in the browser
+    are keyed by the link `snapshot_listings` picked instead (see `link_key`).
+    """
+    match = HREF_PATTERN.search(element_html)
+    if match:
+        return link_key(match.group(1), base_url)
+    return f"digest:{listing_digest(element_html)}"
+
+
+def price_cents(car: dict) -> Optional[int]:
+    """Price of a stored car in cents. Cars stored before prices were typed hold the display price."""
+    if "price_cents" in car:
+        return car["price_cents"]
+    try:
+        return parse_price(car["price"])[0]
+    except (KeyError, ValueError):
+        return None
+
+
+def stored_price(value):
+    """Reads a price back from the TEXT price columns: cents as an int, or an older display price."""
+    if isinstance(value, str) and value.isdigit():
+        return int(value)
+    return value
+
+
+class ListingIndex:
+    """
+    Persistent index of every listing ever crawled: its key, content digest, when it was
+    first and last seen, and the car last extracted from it.
+
+    A run looks listings up with `observe`, which returns the stored car when the content
+    is unchanged so the listing needs no extraction, and stores newly extracted cars with
+    `record`. `finish_run` returns what changed since the previous run.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.run_started_at = time.time()
+        self.seen_this_run = 0
+
+        # Worker processes share the index, so wait for each other's writes
+        self.connection = sqlite3.connect(path, timeout=30)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS listings ("
+            "key TEXT PRIMARY KEY, digest TEXT NOT NULL, car TEXT, "
+            "first_seen REAL NOT NULL, last_seen REAL NOT NULL)"
+        )
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS price_changes ("
+            "key TEXT NOT NULL, old_price TEXT, new_price TEXT, car TEXT NOT NULL, changed_at REAL NOT NULL)"
+        )
+        self.connection.execute("CREATE TABLE IF NOT EXISTS runs (started_at REAL NOT NULL)")
+        row = self.connection.execute("SELECT MAX(started_at) FROM runs").fetchone()
+        self.previous_run_started_at = row[0]
+        self.connection.commit()
+
+    def observe(self, element_html: str, key: Optional[str] = None) -> Optional[dict]:
+        """
+        Marks the listing as seen in this run. Returns a copy of its stored car when the
+        listing's content has not changed since it was extracted, otherwise None. `key`
+        overrides `listing_key`, for listings that were not fetched as markup.
+        """
+        key = key or listing_key(element_html)
+        row = self.connection.execute("SELECT digest, car FROM listings WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+
+        self.connection.execute("UPDATE listings SET last_seen = ? WHERE key = ?", (time.time(), key))
+        self.connection.commit()
+        if row[0] != listing_digest(element_html) or row[1] is None:
+            return None
+        return json.loads(row[1])
+
+    def record(self, element_html: str, car: dict, key: Optional[str] = None) -> None:
+        """
+        Stores the car extracted from a new or changed listing.
+        """
+        key = key or listing_key(element_html)
+        now = time.time()
+        row = self.connection.execute("SELECT car FROM listings WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.connection.execute(
+                "INSERT INTO listings (key, digest, car, first_seen, last_seen) VALUES (?, ?, ?, ?, ?)",
+                (key, listing_digest(element_html), json.dumps(car), now, now),
+            )
+        else:
+            previous_price = price_cents(json.loads(row[0])) if row[0] else None
+            if previous_price != price_cents(car):
+                self.connection.execute(
+                    "INSERT INTO price_changes (key, old_price, new_price, car, changed_at) VALUES (?, ?, ?, ?, ?)",
+                    (key, previous_price, price_cents(car), json.dumps(car), now),
+                )
+            self.connection.execute(
+                "UPDATE listings SET digest = ?, car = ?, last_seen = ? WHERE key = ?",
+                (listing_digest(element_html), json.dumps(car), now, key),
+            )
+        self.connection.commit()
+
+    def finish_run(self) -> dict:
+        """
+        Returns the listings added, removed and re-priced since the previous run, and
+        records this run. The diff is read back from the index, so it includes what other
+        worker processes recorded since this index was opened.
+
+        Removed listings are the ones the previous run saw and this run did not, so they
+        are only reported when this run saw any listing at all.
+        """
+        added = [
+            {"key": key, "car": json.loads(car)}
+            for key, car in self.connection.execute(
+                "SELECT key, car FROM listings WHERE first_seen >= ? ORDER BY first_seen", (self.run_started_at,)
+            )
+        ]
+        price_changed = [
+            {"key": key, "old_price": stored_price(old_price), "new_price": stored_price(new_price), "car": json.loads(car)}
+            for key, old_price, new_price, car in self.connection.execute(
+                "SELECT key, old_price, new_price, car FROM price_changes WHERE changed_at >= ? ORDER BY changed_at",
+                (self.run_started_at,),
+            )
+        ]
+        self.seen_this_run = self.connection.execute(
+            "SELECT COUNT(*) FROM listings WHERE last_seen >= ?", (self.run_started_at,)
+        ).fetchone()[0]
+
+        removed = []
+        if self.seen_this_run and self.previous_run_started_at is not None:
+            for key, car in self.connection.execute(
+                "SELECT key, car FROM listings WHERE last_seen >= ? AND last_seen < ?",
+                (self.previous_run_started_at, self.run_started_at),
+            ):
+                removed.append({"key": key, "car": json.loads(car) if car else None})
+        if self.seen_this_run:
+            self.connection.execute("INSERT INTO runs (started_at) VALUES (?)", (self.run_started_at,))
+            self.connection.commit()
+        return {"added": added, "removed": removed, "price_changed": price_changed}
+
+    def write_diff(self, filename: str) -> dict:
+        diff = self.finish_run()
+        with open(filename, mode="w", encoding="utf-8") as file:
+            json.dump(diff, file, indent=2)
+        print("\n=== Listing Changes ===")
+        print(f"{'Type':<15} {'Count':>12}")
+        print("-" * 30)
+        print(f"{'Seen':<15} {self.seen_this_run:>12,}")
+        print(f"{'Added':<15} {len(diff['added']):>12,}")
+        print(f"{'Removed':<15} {len(diff['removed']):>12,}")
+        print(f"{'Price changed':<15} {len(diff['price_changed']):>12,}")
+        print(f"Written to '{filename}'.")
+        return diff
+
+    def close(self) -> None:
+        self.connection.close()
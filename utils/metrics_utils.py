@@ -0,0 +1,204 @@
+import json
+import os
+import time
+from typing import Dict, List
+
+DEBUG = 10
+INFO = 20
+ERROR = 40
+LEVEL_NAMES = {DEBUG: "DEBUG", INFO: "INFO", ERROR: "ERROR"}
+
+# Upper bounds, in seconds, of the histogram buckets every stage is timed into
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_log_level = INFO
+_log_format = "text"
+
+
+def configure_logging(level: str, log_format: str = "text") -> None:
+    """
+    Sets the lowest level that is logged ("DEBUG", "INFO" or "ERROR") and the format of
+    log lines: "text" for `[INFO] event key=value` or "json" for one JSON object per line.
+    """
+    global _log_level, _log_format
+    _log_level = {name: level for level, name in LEVEL_NAMES.items()}[level.upper()]
+    _log_format = log_format
+
+
+def log_enabled(level: int) -> bool:
+    return level >= _log_level
+
+
+def log(level: int, event: str, **fields) -> None:
+    """
+    Logs `event` with structured `fields`. A disabled level returns before anything is
+    formatted, so debug logging on the hot path only costs the call. Pass values such as
+    cars as they are rather than pre-formatted strings.
+    """
+    if level < _log_level:
+        return
+    if _log_format == "json":
+        line = json.dumps({"ts": round(time.time(), 3), "level": LEVEL_NAMES[level], "event": event, **fields}, default=str)
+    else:
+        line = " ".join([f"[{LEVEL_NAMES[level]}] {event}"] + [f"{key}={value}" for key, value in fields.items()])
+    print(line)
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram of durations in seconds, in the Prometheus layout.
+    """
+
+    def __init__(self, buckets=STAGE_BUCKETS):
+        self.buckets = buckets
+        self.bucket_counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+        for position, upper_bound in enumerate(self.buckets):
+            if seconds <= upper_bound:
+                self.bucket_counts[position] += 1
+                break
+
+    def cumulative_counts(self) -> List[int]:
+        counts, total = [], 0
+        for bucket_count in self.bucket_counts:
+            total += bucket_count
+            counts.append(total)
+        return counts
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the `q` quantile, or the maximum past the last bucket."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        for upper_bound, cumulative in zip(self.buckets, self.cumulative_counts()):
+            if cumulative >= rank:
+                return upper_bound
+        return self.max
+
+
+class StageTimer:
+    """Context manager that times one run of a stage into its histogram."""
+
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram: Histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start)
+
+
+class Metrics:
+    """
+    Per-stage timers and event counters of a run, exported as JSON and as a Prometheus
+    textfile (for node_exporter's textfile collector) when the run ends.
+
+    Stages are timed with `with metrics.time("goto"):` and events counted with
+    `metrics.count("duplicates")`.
+    """
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.stages: Dict[str, Histogram] = {}
+        self.counters: Dict[str, int] = {}
+
+    def time(self, stage: str) -> StageTimer:
+        histogram = self.stages.get(stage)
+        if histogram is None:
+            histogram = self.stages[stage] = Histogram()
+        return StageTimer(histogram)
+
+    def observe(self, stage: str, seconds: float) -> None:
+        histogram = self.stages.get(stage)
+        if histogram is None:
+            histogram = self.stages[stage] = Histogram()
+        histogram.observe(seconds)
+
+    def count(self, event: str, amount: int = 1) -> None:
+        self.counters[event] = self.counters.get(event, 0) + amount
+
+    def to_dict(self) -> dict:
+        return {
+            "started_at": self.started_at,
+            "duration_seconds": time.time() - self.started_at,
+            "stages": {
+                stage: {
+                    "count": histogram.count,
+                    "sum_seconds": histogram.sum,
+                    "max_seconds": histogram.max,
+                    "p50_seconds": histogram.quantile(0.5),
+                    "p95_seconds": histogram.quantile(0.95),
+                    "buckets": dict(zip(map(str, histogram.buckets), histogram.cumulative_counts())),
+                }
+                for stage, histogram in sorted(self.stages.items())
+            },
+            "counters": dict(sorted(self.counters.items())),
+        }
+
+    def to_prometheus(self) -> str:
+        lines = [
+            "# HELP web_miner_stage_seconds Time spent in each crawl stage.",
+            "# TYPE web_miner_stage_seconds histogram",
+        ]
+        for stage, histogram in sorted(self.stages.items()):
+            for upper_bound, cumulative in zip(histogram.buckets, histogram.cumulative_counts()):
+                lines.append(f'web_miner_stage_seconds_bucket{{stage="{stage}",le="{upper_bound}"}} {cumulative}')
+            lines.append(f'web_miner_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}')
+            lines.append(f'web_miner_stage_seconds_sum{{stage="{stage}"}} {histogram.sum}')
+            lines.append(f'web_miner_stage_seconds_count{{stage="{stage}"}} {histogram.count}')
+        lines.append("# HELP web_miner_events_total Listings skipped, deduplicated and failed, and other crawl events.")
+        lines.append("# TYPE web_miner_events_total counter")
+        for event, value in sorted(self.counters.items()):
+            lines.append(f'web_miner_events_total{{event="{event}"}} {value}')
+        lines.append("# HELP web_miner_run_started_timestamp_seconds Start of the run.")
+        lines.append("# TYPE web_miner_run_started_timestamp_seconds gauge")
+        lines.append(f"web_miner_run_started_timestamp_seconds {self.started_at}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, json_path: str, prometheus_path: str) -> None:
+        """
+        Writes both exports. Each file is written under a temporary name and renamed into
+        place, so a collector never reads a half-written file.
+        """
+        for path, content in (
+            (json_path, json.dumps(self.to_dict(), indent=2)),
+            (prometheus_path, self.to_prometheus()),
+        ):
+            if not path:
+                continue
+            temp_path = f"{path}.tmp"
+            with open(temp_path, mode="w", encoding="utf-8") as file:
+                file.write(content)
+            os.replace(temp_path, path)
+        log(INFO, "Metrics exported", json=json_path, prometheus=prometheus_path)
+
+    def show_stats(self) -> None:
+        """Print where the time went, per stage."""
+        print("\n=== Stage Timing Summary ===")
+        print(f"{'Stage':<22} {'Count':>8} {'Total (s)':>10} {'p50 (ms)':>9} {'p95 (ms)':>9}")
+        print("-" * 62)
+        for stage, histogram in sorted(self.stages.items(), key=lambda item: -item[1].sum):
+            print(
+                f"{stage:<22} {histogram.count:>8,} {histogram.sum:>10.2f} "
+                f"{histogram.quantile(0.5) * 1000:>9,.0f} {histogram.quantile(0.95) * 1000:>9,.0f}"
+            )
+        if self.counters:
+            print(f"\n{'Event':<22} {'Count':>8}")
+            print("-" * 31)
+            for event, value in sorted(self.counters.items()):
+                print(f"{event:<22} {value:>8,}")
+
+
+# Shared by every module of the process, like the crawl's single browser pool
+metrics = Metrics()
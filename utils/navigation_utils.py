@@ -0,0 +1,128 @@
+import asyncio
+import time
+from typing import List, Optional
+from urllib.parse import urlsplit
+
+from playwright.async_api import Page, Request, Route
+
+from utils.metrics_utils import INFO, log, metrics
+from utils.rate_limit_utils import raise_for_status
+
+
+def host_matches(host: str, domains: List[str]) -> bool:
+    return any(host == domain or host.endswith(f".{domain}") for domain in domains)
+
+
+class NavigationProfile:
+    """
+    Navigation settings for listing pages: requests for blocked resource types or domains
+    are aborted before they leave the browser, and navigation only waits for the first
+    listing instead of the full page load.
+
+    When `allowed_domains` is given, every request to a domain outside it is blocked as well.
+    Every navigation is reported with its time to first listing and the bytes transferred
+    up to that point.
+    """
+
+    def __init__(
+        self,
+        blocked_resource_types: List[str],
+        blocked_domains: List[str],
+        allowed_domains: Optional[List[str]] = None,
+    ):
+        self.blocked_resource_types = set(blocked_resource_types)
+        self.blocked_domains = blocked_domains
+        self.allowed_domains = allowed_domains
+        self.navigations = 0
+        self.total_time_to_first_listing = 0.0
+        self.total_bytes = 0
+        self.total_requests = 0
+        self.total_blocked = 0
+
+    def should_block(self, request: Request) -> bool:
+        if request.resource_type in self.blocked_resource_types:
+            return True
+        host = urlsplit(request.url).hostname or ""
+        if not host:
+            return False
+        if host_matches(host, self.blocked_domains):
+            return True
+        return self.allowed_domains is not None and not host_matches(host, self.allowed_domains)
+
+    async def navigate(self, page: Page, url: str, css_selector: str, timeout_ms: int) -> None:
+        """
+        Opens `url` with blocking enabled and returns once the first listing is in the DOM.
+        Blocking stays in place for the rest of the page's life, e.g. while scrolling.
+        """
+        blocked = 0
+        transferred = 0
+        finished = 0
+        size_tasks = set()
+
+        async def route_request(route: Route):
+            nonlocal blocked
+            if self.should_block(route.request):
+                blocked += 1
+                await route.abort()
+            else:
+                await route.continue_()
+
+        async def add_request_size(request: Request):
+            nonlocal transferred
+            try:
+                sizes = await request.sizes()
+                transferred += sizes["responseHeadersSize"] + sizes["responseBodySize"]
+            except Exception:
+                pass
+
+        def on_request_finished(request: Request):
+            nonlocal finished
+            finished += 1
+            task = asyncio.create_task(add_request_size(request))
+            size_tasks.add(task)
+            task.add_done_callback(size_tasks.discard)
+
+        # A pooled page keeps the handler of its previous navigation, so replace it
+        await page.unroute("**/*")
+        await page.route("**/*", route_request)
+        page.on("requestfinished", on_request_finished)
+        try:
+            start = time.perf_counter()
+            response = await page.goto(url, wait_until="commit")
+            committed = time.perf_counter()
+            raise_for_status(response, url)
+            await page.wait_for_selector(css_selector, timeout=timeout_ms)
+            time_to_first_listing = time.perf_counter() - start
+            metrics.observe("goto", committed - start)
+            metrics.observe("wait_for_selector", start + time_to_first_listing - committed)
+        finally:
+            page.remove_listener("requestfinished", on_request_finished)
+            if size_tasks:
+                await asyncio.gather(*size_tasks, return_exceptions=True)
+
+        self.navigations += 1
+        self.total_time_to_first_listing += time_to_first_listing
+        self.total_bytes += transferred
+        self.total_requests += finished
+        self.total_blocked += blocked
+        log(
+            INFO,
+            "Navigation",
+            url=url,
+            first_listing_ms=round(time_to_first_listing * 1000),
+            kb=round(transferred / 1024, 1),
+            requests=finished,
+            blocked=blocked,
+        )
+
+    def show_stats(self) -> None:
+        """Print navigation totals for this run."""
+        average = self.total_time_to_first_listing / self.navigations if self.navigations else 0.0
+        print("\n=== Navigation Summary ===")
+        print(f"{'Type':<25} {'Value':>12}")
+        print("-" * 38)
+        print(f"{'Navigations':<25} {self.navigations:>12,}")
+        print(f"{'Avg first listing (ms)':<25} {average * 1000:>12,.0f}")
+        print(f"{'Transferred (KB)':<25} {self.total_bytes / 1024:>12,.1f}")
+        print(f"{'Requests':<25} {self.total_requests:>12,}")
+        print(f"{'Requests blocked':<25} {self.total_blocked:>12,}")
@@ -1,12 +1,46 @@
-from crawl4ai import AsyncWebCrawler, BrowserConfig, CacheMode, CrawlerRunConfig, LLMExtractionStrategy
-from models.car import Car
+from crawl4ai import BrowserConfig, LLMExtractionStrategy
+from models.car import Car, IndexedCar, ListingCar, strip_price_extras
+from utils.browser_utils import BrowserPool, borrow_page
+from utils.cache_utils import ExtractionCache
+from utils.cascade_utils import ModelCascade
+from utils.data_loader_utils import save_cars_to_csv
+from utils.dedup_utils import ListingDedup
+from utils.extraction_client_utils import ExtractionClient, SingleFlight
+from utils.listing_index_utils import ListingIndex, link_key, listing_key
+from utils.metrics_utils import DEBUG, ERROR, INFO, log, metrics
+from utils.navigation_utils import NavigationProfile
+from utils.rate_limit_utils import RequestScheduler, ThrottledError, is_throttle_error, raise_for_status
+from utils.rule_extraction_utils import RuleExtractor
+from utils.text_reduction_utils import TextReducer, count_tokens
+import asyncio
 import os
-import tempfile
 import json
-from typing import List, Set
-from crawl4ai import AsyncWebCrawler, CrawlerRunConfig
+from typing import AsyncIterator, Awaitable, Callable, List, Optional, Tuple
+from urllib.parse import urlsplit
+from crawl4ai.content_scraping_strategy import WebScrapingStrategy
 from crawl4ai.extraction_strategy import LLMExtractionStrategy
-from playwright.async_api import async_playwright
+from crawl4ai.markdown_generation_strategy import DefaultMarkdownGenerator
+from playwright.async_api import Page
+
+# URL reported to the extraction strategy for listing HTML that never had a URL of its own
+LISTING_URL = "raw:listing"
+# DOM attribute set on listing elements once their HTML has been collected
+SEEN_ATTRIBUTE = "data-miner-seen"
+# crawl4ai turns a request that is still rate limited after its own retries into an error
+# block with this message, because it reads the usage of the error list it got back
+EXHAUSTED_RATE_LIMIT_MESSAGE = "object has no attribute 'usage'"
+
+
+class CrawlError(Exception):
+    """A search URL could not be crawled: its page did not load, or the crawl broke off."""
+
+
+_scraping_strategy = WebScrapingStrategy()
+_markdown_generator = DefaultMarkdownGenerator()
+# LLM requests in flight in this process, so identical listings extracted at the same time share one
+_in_flight_extractions = SingleFlight()
+# Tokens of each strategy's instruction and schema, which are the same in every prompt
+_prompt_overhead_tokens = {}
 
 def get_browser_config() -> BrowserConfig:
     return BrowserConfig(
@@ -14,252 +48,911 @@ def get_browser_config() -> BrowserConfig:
         headless=True,
         verbose=True,
         user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36",
+        viewport_width=1920,
+        viewport_height=1080,
     )
 
-def get_llm_strategy() -> LLMExtractionStrategy:
-    return LLMExtractionStrategy(
-        provider="openai/gpt-4o",
+# Worked examples for the extraction instructions. They are part of the prompt prefix that
+# is the same for every request, which with them reaches the 1024 tokens providers need
+# before they cache a prefix.
+EXTRACTION_EXAMPLES = """
+
+Worked examples. Each shows the text of one listing and the car to extract from it:
+
+Listing: "[![2020 Mercedes-Benz C-Class C 300 4MATIC](https://images.example/101.jpg)2020 Mercedes-Benz C-Class C 300 4MATIC 72,942 km $32,990 or $329/biweekly Est. financing at 7.99% APR, $0 down payment. + tax & licensing"
+Car: {"year": 2020, "name": "Mercedes-Benz C-Class C 300 4MATIC", "kilometers": "72,942 km", "price": "$32,990"}
+Why: the biweekly payment and the financing terms are not the price.
+
+Listing: "Certified 2018 Honda Civic LX 101,220 km $17,590 or $175/biweekly"
+Car: {"year": 2018, "name": "Honda Civic LX", "kilometers": "101,220 km", "price": "$17,590"}
+Why: badges such as 'Certified', 'Price drop', 'Electric' or 'Low km' come before the title and are not part of the name.
+
+Listing: "2021 Toyota RAV4 XLE AWD 38,004 km SALE ~~$36,990~~ $34,490 or $344/biweekly"
+Car: {"year": 2021, "name": "Toyota RAV4 XLE AWD", "kilometers": "38,004 km", "price": "$34,490"}
+Why: a struck-through price is the price before the sale; the price is the current one.
+
+Listing: "Electric 2022 Hyundai Ioniq 5 Preferred AWD Long Range 12,310 km $47,990"
+Car: {"year": 2022, "name": "Hyundai Ioniq 5 Preferred AWD Long Range", "kilometers": "12,310 km", "price": "$47,990"}
+Why: numbers inside the model name ('5') belong to the name, not to the kilometers.
+
+Listing: "Low km 2023 Kia Seltos EX Premium 5,120 km $31,490"
+Car: {"year": 2023, "name": "Kia Seltos EX Premium", "kilometers": "5,120 km", "price": "$31,490"}
+Why: the kilometers keep their thousands separator and the 'km' unit exactly as shown.
+
+Listing: "2019 Volkswagen Golf GTI Autobahn 64,002 km Coming soon"
+Car: none, because the listing shows no price. Never guess a missing field from another listing or from typical values.
+
+With several listings, every car additionally carries the 'index' of the listing it was taken from."""
+
+
+def get_llm_strategy(provider: str = "openai/gpt-4o", api_base: Optional[str] = None) -> LLMExtractionStrategy:
+    return ExtractionClient(
+        provider=provider,
         api_token=os.getenv("OPENAI_API_KEY"),
-        schema=Car.model_json_schema(),
+        api_base=api_base,
+        schema=ListingCar.model_json_schema(),
         extraction_type="schema",
         instruction=(
             "Extract a car object with 'year', 'name', 'kilometers', and 'price' from the following content. "
-            "The content represents a single car listing in HTML format. Follow these rules strictly:\n"
+            "The content represents a single car listing. Follow these rules strictly:\n"
             "- 'year' must be an integer (e.g., 2020). It is typically the first part of the car title.\n"
             "- 'name' must be the car model as a string (e.g., 'Mercedes-Benz C-Class C 300 4MATIC'). It follows the year in the car title.\n"
             "- 'kilometers' must be a string with the unit 'km' (e.g., '72,942 km'). It is usually below the car title.\n"
             "- 'price' must be a string with the currency symbol (e.g., '$32,990'). It is the main price, typically the largest price text. "
             "Exclude any additional text like 'or $321/biweekly', 'SALE', or other payment details.\n"
             "If any field cannot be extracted correctly, return an empty object {}."
+            + EXTRACTION_EXAMPLES
+        ),
+        input_format="markdown",
+        verbose=True,
+    )
+
+def get_batch_llm_strategy(provider: str = "openai/gpt-4o", api_base: Optional[str] = None) -> LLMExtractionStrategy:
+    return ExtractionClient(
+        provider=provider,
+        api_token=os.getenv("OPENAI_API_KEY"),
+        api_base=api_base,
+        schema=IndexedCar.model_json_schema(),
+        extraction_type="schema",
+        instruction=(
+            "Extract one car object with 'index', 'year', 'name', 'kilometers', and 'price' for every car listing in the following content. "
+            "The content contains several car listings, each one introduced by a heading of the form 'LISTING <n>'. Follow these rules strictly:\n"
+            "- 'index' must be the integer <n> from the heading of the listing the car was taken from.\n"
+            "- Never merge fields from different listings into one object, and return at most one object per listing.\n"
+            "- 'year' must be an integer (e.g., 2020). It is typically the first part of the car title.\n"
+            "- 'name' must be the car model as a string (e.g., 'Mercedes-Benz C-Class C 300 4MATIC'). It follows the year in the car title.\n"
+            "- 'kilometers' must be a string with the unit 'km' (e.g., '72,942 km'). It is usually below the car title.\n"
+            "- 'price' must be a string with the currency symbol (e.g., '$32,990'). It is the main price, typically the largest price text. "
+            "Exclude any additional text like 'or $321/biweekly', 'SALE', or other payment details.\n"
+            "If any field of a listing cannot be extracted correctly, leave that listing out of the result."
+            + EXTRACTION_EXAMPLES
         ),
         input_format="markdown",
+        # A batch must reach the model in one piece, otherwise listings get split across chunks
+        apply_chunking=False,
         verbose=True,
     )
 
 
-async def fetch_and_process_page(
-    crawler: AsyncWebCrawler,
-    base_url: str,
-    css_selector: str,
+def build_batch_html(element_htmls: List[str]) -> str:
+    """
+    Packs several listing elements into one document. Each listing is introduced by a
+    'LISTING <n>' heading, where <n> is its position in the batch.
+    """
+    sections = "".join(
+        f"<section><h2>LISTING {position}</h2>{element_html}</section>"
+        for position, element_html in enumerate(element_htmls)
+    )
+    return f"<html><body>{sections}</body></html>"
+
+
+def split_batch_results(extracted_data: List[dict], batch_size: int, required_keys: List[str]) -> List[Optional[dict]]:
+    """
+    Maps the blocks returned for a batch back to the listing positions they came from.
+    Positions without a usable car (missing, errored or incomplete) are left as None.
+    """
+    cars = [None] * batch_size
+    for block in extracted_data:
+        if not isinstance(block, dict) or block.get("error") is True:
+            continue
+        try:
+            position = int(block.get("index"))
+        except (TypeError, ValueError):
+            continue
+        if not 0 <= position < batch_size or cars[position] is not None:
+            continue
+        car = {key: value for key, value in block.items() if key != "index"}
+        if all(key in car for key in required_keys):
+            cars[position] = car
+    return cars
+
+
+def html_to_markdown(html: str) -> str:
+    """
+    Converts listing HTML to the same markdown crawl4ai would feed to the LLM, entirely in
+    memory: no temporary file and no crawler round trip.
+    """
+    cleaned_html = _scraping_strategy.scrap(LISTING_URL, html).get("cleaned_html", "")
+    return _markdown_generator.generate_markdown(cleaned_html=cleaned_html).raw_markdown
+
+
+def listing_markdown(element_htmls: List[str], batch: bool) -> str:
+    """
+    Markdown of one listing, or of several packed by `build_batch_html` as a batch.
+    """
+    if batch:
+        return html_to_markdown(build_batch_html(element_htmls))
+    return html_to_markdown(f"<html><body>{element_htmls[0]}</body></html>")
+
+
+def estimated_prompt_tokens(llm_strategy: LLMExtractionStrategy, text: str) -> int:
+    """
+    Tokens of an extraction prompt, for the tokens-per-minute limit: the text, instruction
+    and schema. The instruction and schema are counted once per strategy.
+    """
+    overhead = _prompt_overhead_tokens.get(id(llm_strategy))
+    if overhead is None:
+        overhead = count_tokens(llm_strategy.instruction or "") + count_tokens(json.dumps(llm_strategy.schema or {}))
+        _prompt_overhead_tokens[id(llm_strategy)] = overhead
+    return count_tokens(text) + overhead
+
+
+def raise_for_error_blocks(extracted_data) -> None:
+    """
+    `LLMExtractionStrategy.run` reports a failed request as error blocks instead of
+    raising. Raises for a result made only of error blocks, as a `ThrottledError` when
+    the request was rate limited, so the request can be retried.
+    """
+    blocks = extracted_data if isinstance(extracted_data, list) else [extracted_data]
+    if not blocks or not all(isinstance(block, dict) and block.get("error") is True for block in blocks):
+        return
+    message = str(blocks[0].get("content"))
+    if EXHAUSTED_RATE_LIMIT_MESSAGE in message or is_throttle_error(RuntimeError(message)):
+        raise ThrottledError(f"LLM request was rate limited: {message}")
+    raise RuntimeError(f"LLM request failed: {message}")
+
+
+async def run_extraction(
+    element_htmls: List[str],
+    batch: bool,
+    llm_strategy: LLMExtractionStrategy,
+    label: str,
+    text_reducer: Optional[TextReducer] = None,
+    request_scheduler: Optional[RequestScheduler] = None,
+) -> Optional[list]:
+    """
+    Runs the LLM extraction over one listing element, or over several as a batch, and
+    returns the parsed blocks, or None when the extraction failed.
+
+    The elements are sent as markdown, or as their reduced visible text when a
+    `text_reducer` is given. The LLM call runs in a worker thread, because
+    `LLMExtractionStrategy.run` is blocking and would otherwise stall the event loop and
+    every other extraction in flight. With a `request_scheduler`, the call waits for the
+    LLM's rate limits, and a failed or throttled call is retried with backoff. A call for
+    the same text and strategy as one already in flight waits for that one instead.
+    """
+    # Convert the HTML to the text sent to the LLM
+    try:
+        with metrics.time("html_to_text"):
+            if text_reducer is None:
+                markdown = listing_markdown(element_htmls, batch)
+            else:
+                markdown = text_reducer.reduce(element_htmls, batch)
+                if text_reducer.report_tokens:
+                    text_reducer.add_baseline(listing_markdown(element_htmls, batch))
+        log(DEBUG, "Converted HTML to text", label=label, length=len(markdown))
+    except Exception as e:
+        metrics.count("extraction_failures")
+        log(ERROR, "Text conversion failed", label=label, error=e)
+        return None
+
+    if not markdown.strip():
+        metrics.count("extraction_failures")
+        log(ERROR, "Text conversion failed: no content", label=label)
+        return None
+
+    # Run the LLM extraction off the event loop
+    async def call_llm():
+        with metrics.time("llm_extraction"):
+            extracted_data = await asyncio.to_thread(llm_strategy.run, LISTING_URL, [markdown])
+        raise_for_error_blocks(extracted_data)
+        return extracted_data
+
+    async def call_scheduled_llm():
+        if request_scheduler is None:
+            return await call_llm()
+        return await request_scheduler.llm.run(call_llm, tokens=estimated_prompt_tokens(llm_strategy, markdown), label=label)
+
+    try:
+        extracted_data = await _in_flight_extractions.run((id(llm_strategy), batch, markdown), call_scheduled_llm)
+        log(DEBUG, "Extracted data", label=label, data=extracted_data)
+    except Exception as e:
+        metrics.count("extraction_failures")
+        log(ERROR, "Extraction failed", label=label, error=e)
+        return None
+
+    if not extracted_data:
+        metrics.count("extraction_failures")
+        log(ERROR, "Extraction failed: no content returned", label=label)
+        return None
+
+    return extracted_data if isinstance(extracted_data, list) else [extracted_data]
+
+
+async def extract_car(
+    element_html: str,
+    llm_strategy: LLMExtractionStrategy,
+    label: str,
+    text_reducer: Optional[TextReducer] = None,
+    request_scheduler: Optional[RequestScheduler] = None,
+) -> Optional[dict]:
+    """
+    Extracts a single car from one listing element.
+    """
+    extracted_data = await run_extraction([element_html], False, llm_strategy, label, text_reducer, request_scheduler)
+    if extracted_data is None:
+        return None
+
+    # Determine car object
+    car = extracted_data[0] if extracted_data else None
+    log(DEBUG, "Car object", label=label, car=car)
+    return car
+
+
+async def extract_car_batch(
+    element_htmls: List[str],
     llm_strategy: LLMExtractionStrategy,
-    session_id: str,
     required_keys: List[str],
-    seen_names: Set[str],
+    retries: int,
+    label: str,
+    text_reducer: Optional[TextReducer] = None,
+    request_scheduler: Optional[RequestScheduler] = None,
+) -> List[Optional[dict]]:
+    """
+    Extracts cars from several listing elements with one LLM request per batch.
+    Listings the model failed on are re-sent as a smaller batch, up to `retries` times.
+    Returns one entry per element, in the same order, with None for listings that failed.
+    """
+    cars = [None] * len(element_htmls)
+    pending = list(range(len(element_htmls)))
+
+    for attempt in range(retries + 1):
+        if not pending:
+            break
+        attempt_label = f"{label} (attempt {attempt + 1}, {len(pending)} listings)"
+        extracted_data = await run_extraction(
+            [element_htmls[position] for position in pending],
+            True,
+            llm_strategy,
+            attempt_label,
+            text_reducer,
+            request_scheduler,
+        )
+        if extracted_data is None:
+            continue
+
+        with metrics.time("parsing"):
+            batch_cars = split_batch_results(extracted_data, len(pending), required_keys)
+        failed = []
+        for batch_position, position in enumerate(pending):
+            if batch_cars[batch_position] is None:
+                failed.append(position)
+            else:
+                cars[position] = batch_cars[batch_position]
+        if failed:
+            log(INFO, "Listings failed and will be retried", label=attempt_label, failed=len(failed))
+        pending = failed
+
+    if pending:
+        metrics.count("extraction_failures", len(pending))
+        log(ERROR, "Listings could not be extracted", label=label, failed=len(pending), attempts=retries + 1)
+    return cars
+
+
+def post_process_car(car: Optional[dict], idx: int, required_keys: List[str]) -> Optional[dict]:
+    """
+    Validates an extracted car into a typed `Car` dict and returns it, or None when it has
+    to be skipped. Cars resolved from the cache, the listing index or the rules are typed
+    already; cars from the LLM are checked for `required_keys` and their display strings parsed.
+    """
+    if not car:
+        metrics.count("skipped_no_data")
+        log(DEBUG, "Skipping car: No valid data extracted", element=idx + 1)
+        return None
+
+    # Check for extraction error
+    if car.get("error") is True:
+        metrics.count("skipped_extraction_error")
+        log(DEBUG, "Skipping car due to extraction error", element=idx + 1, car=car)
+        return None
+
+    if "price_cents" not in car:
+        # Check for required keys
+        if not all(key in car for key in required_keys):
+            metrics.count("skipped_incomplete")
+            log(DEBUG, "Skipping car: Missing required keys", element=idx + 1, car=car)
+            return None
+        if isinstance(car.get("price"), str):
+            car["price"] = strip_price_extras(car["price"])
+
+    # Parse the display strings into typed fields
+    try:
+        return Car.model_validate(car).model_dump()
+    except Exception as e:
+        metrics.count("skipped_invalid")
+        log(ERROR, "Error post-processing car data", element=idx + 1, error=e, car=car)
+        return None
+
+
+async def run_extraction_pipeline(
+    units: List[List[Tuple[int, str]]],
+    extract_unit: Callable[[List[Tuple[int, str]]], Awaitable[List[Optional[dict]]]],
+    required_keys: List[str],
+    max_concurrency: int,
+    on_valid_car: Optional[Callable[[int, dict], None]] = None,
+    is_duplicate: Optional[Callable[[int, dict], bool]] = None,
 ) -> List[dict]:
-    print(f"[INFO] Starting fetch_and_process_page for URL: {base_url} (initial load only)")
+    """
+    Extracts cars from units of (element index, element HTML) listings in three stages
+    connected by queues: extraction, post-processing and dedup.
+
+    Up to `max_concurrency` units are extracted at the same time. The dedup stage puts
+    listings back in element order before asking `is_duplicate`, so the returned cars do
+    not depend on how listings were grouped into units or on which call finishes first.
+    `on_valid_car` is called with every car that passes post-processing, duplicates included.
+    """
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+    extracted_queue = asyncio.Queue()
+    processed_queue = asyncio.Queue()
+    element_order = sorted(idx for unit in units for idx, _ in unit)
     all_cars = []
-    seen_elements = set()
-
-    # Step 1: Set up Playwright browser
-    print("[INFO] Launching Playwright browser")
-    async with async_playwright() as p:
-        try:
-            browser = await p.chromium.launch(headless=True, args=["--no-sandbox", "--disable-gpu", "--disable-dev-shm-usage"])
-            print("[INFO] Browser launched successfully")
-        except Exception as e:
-            print(f"[ERROR] Failed to launch browser: {e}")
-            return []
-
-        try:
-            context = await browser.new_context(
-                user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36",
-                viewport={"width": 1920, "height": 1080},
-            )
-            print("[INFO] Browser context created")
-            await context.add_init_script("Object.defineProperty(navigator, 'webdriver', { get: () => undefined })")
-            print("[INFO] Anti-detection script added to context")
-        except Exception as e:
-            print(f"[ERROR] Failed to create browser context: {e}")
-            await browser.close()
-            return []
 
-        try:
-            page = await context.new_page()
-            print("[INFO] New page created")
-        except Exception as e:
-            print(f"[ERROR] Failed to create new page: {e}")
-            await browser.close()
-            return []
+    async def extract(unit: List[Tuple[int, str]]):
+        async with semaphore:
+            try:
+                cars = await extract_unit(unit)
+            except Exception as e:
+                metrics.count("extraction_failures", len(unit))
+                log(ERROR, "Extraction failed", elements=f"{unit[0][0] + 1}-{unit[-1][0] + 1}", error=e)
+                cars = [None] * len(unit)
+        await extracted_queue.put((unit, cars))
+
+    async def post_process():
+        while True:
+            item = await extracted_queue.get()
+            if item is None:
+                await processed_queue.put(None)
+                return
+            unit, cars = item
+            processed = []
+            for (idx, _), car in zip(unit, cars):
+                with metrics.time("parsing"):
+                    car = post_process_car(car, idx, required_keys)
+                if car is not None and on_valid_car is not None:
+                    on_valid_car(idx, car)
+                processed.append((idx, car))
+            await processed_queue.put(processed)
+
+    async def dedup():
+        buffered = {}
+        next_position = 0
+        while True:
+            processed = await processed_queue.get()
+            if processed is None:
+                return
+            buffered.update(processed)
+            while next_position < len(element_order) and element_order[next_position] in buffered:
+                idx = element_order[next_position]
+                car = buffered.pop(idx)
+                next_position += 1
+                if car is None:
+                    continue
+                if is_duplicate is not None and is_duplicate(idx, car):
+                    metrics.count("duplicates")
+                    log(DEBUG, "Duplicate car skipped", element=idx + 1, car=car)
+                    continue
+                all_cars.append(car)
+                log(DEBUG, "Car added", element=idx + 1, car=car)
+
+    post_process_task = asyncio.create_task(post_process())
+    dedup_task = asyncio.create_task(dedup())
+    await asyncio.gather(*(extract(unit) for unit in units))
+    await extracted_queue.put(None)
+    await asyncio.gather(post_process_task, dedup_task)
+    return all_cars
+
+
+async def open_listing_page(
+    page: Page,
+    base_url: str,
+    css_selector: str,
+    navigation_profile: Optional[NavigationProfile] = None,
+    request_scheduler: Optional[RequestScheduler] = None,
+) -> bool:
+    """
+    Opens `base_url` on a pooled page and waits for the first listings to render.
+    Returns False when either step failed. With a `request_scheduler`, navigation waits
+    for the site's rate limit, and a failed or throttled navigation is retried with backoff.
+    """
+    async def navigate():
+        # Step 2: Navigate to the page and wait for the first listing, blocking unneeded resources
+        if navigation_profile is not None:
+            await navigation_profile.navigate(page, base_url, css_selector, timeout_ms=10000)
+            return
 
         # Step 2: Navigate to the page
-        try:
-            print(f"[INFO] Navigating to URL: {base_url}")
-            await page.goto(base_url)
-            print("[INFO] Page navigation successful")
-        except Exception as e:
-            print(f"[ERROR] Failed to navigate to URL {base_url}: {e}")
-            await browser.close()
-            return []
+        with metrics.time("goto"):
+            response = await page.goto(base_url)
+        raise_for_status(response, base_url)
+        log(DEBUG, "Page navigation successful")
 
         # Step 3: Wait for car listings to load
-        try:
-            print(f"[INFO] Waiting for elements with selector: {css_selector}")
+        log(DEBUG, "Waiting for elements", selector=css_selector)
+        with metrics.time("wait_for_selector"):
             await page.wait_for_selector(css_selector, timeout=10000)
-            print("[INFO] Elements found within timeout")
-        except Exception as e:
-            print(f"[ERROR] Error waiting for selector '{css_selector}': {e}")
-            await browser.close()
-            return []
-
-        # Step 4: Find all car listing elements
-        try:
-            elements = await page.query_selector_all(css_selector)
-            print(f"[INFO] Found {len(elements)} elements with selector '{css_selector}'")
-        except Exception as e:
-            print(f"[ERROR] Failed to find elements with selector '{css_selector}': {e}")
-            await browser.close()
-            return []
-
-        # Step 5: Process each element
-        for idx, element in enumerate(elements):
-            print(f"[INFO] Processing element {idx + 1}/{len(elements)}")
-
-            # Step 5.1: Extract HTML for the element
-            try:
-                element_html = await element.inner_html()
-                print(f"[INFO] Element {idx + 1}: HTML extracted successfully (length: {len(element_html)})")
-            except Exception as e:
-                print(f"[ERROR] Element {idx + 1}: Failed to extract HTML: {e}")
-                continue
-
-            # Step 5.2: Check for duplicate elements
-            element_id = hash(element_html)
-            if element_id in seen_elements:
-                print(f"[INFO] Element {idx + 1}: Skipped (duplicate element)")
-                continue
-            seen_elements.add(element_id)
-            print(f"[INFO] Element {idx + 1}: Added to seen_elements (ID: {element_id})")
-
-            # Step 5.3: Write HTML to temporary file
-            try:
-                with tempfile.NamedTemporaryFile(mode='w', suffix='.html', delete=False, encoding='utf-8') as temp_file:
-                    temp_file.write(f"<html><body>{element_html}</body></html>")
-                    temp_file_path = temp_file.name
-                print(f"[INFO] Element {idx + 1}: Temporary file created at {temp_file_path}")
-            except Exception as e:
-                print(f"[ERROR] Element {idx + 1}: Failed to create temporary file: {e}")
-                continue
+        log(DEBUG, "Elements found within timeout")
+
+    try:
+        log(INFO, "Navigating to URL", url=base_url)
+        if request_scheduler is None:
+            await navigate()
+        else:
+            await request_scheduler.site(urlsplit(base_url).hostname or base_url).run(navigate, label=base_url)
+        return True
+    except Exception as e:
+        metrics.count("navigation_failures")
+        log(ERROR, "Failed to load listings", url=base_url, error=e)
+        return False
+
+
+async def snapshot_listings(page, css_selector: str) -> List[Tuple[str, Optional[str]]]:
+    """
+    Snapshots the inner HTML and the link of every listing element that has not been
+    handled yet and marks it in the DOM, in a single `page.evaluate` round trip. No element
+    handles are created, so the browser round trips and the handles kept alive do not grow
+    with the number of listings. Only markup is read: the rules and the text reduction work
+    from the HTML, and reading innerText would lay the page out.
+
+    The link is the `href` attribute of the listing page link: the element itself or the
+    anchor around it, else the title link (in or around a heading), else the link most
+    anchors in the element point to, such as a photo and a "details" button that both
+    open the listing, then the one with the most text. A dealer or photo link that comes
+    first in the markup is thereby not taken for the listing.
+    """
+    return await page.evaluate(
+        """([selector, attribute]) => {
+            const listingLink = element => {
+                const around = element.closest("a[href]");
+                if (around) {
+                    return around.getAttribute("href");
+                }
+                const title = element.querySelector(
+                    ":is(h1, h2, h3, h4, h5, h6) a[href], a[href]:has(h1, h2, h3, h4, h5, h6)"
+                );
+                if (title) {
+                    return title.getAttribute("href");
+                }
+                const links = new Map();
+                for (const anchor of element.querySelectorAll("a[href]")) {
+                    const href = anchor.getAttribute("href");
+                    const link = links.get(href) || {anchors: 0, text: 0};
+                    link.anchors += 1;
+                    link.text += anchor.textContent.trim().length;
+                    links.set(href, link);
+                }
+                let best = null;
+                for (const [href, link] of links) {
+                    const better = best === null || link.anchors > best.anchors
+                        || (link.anchors === best.anchors && link.text > best.text);
+                    if (better) {
+                        best = {href, ...link};
+                    }
+                }
+                return best && best.href;
+            };
+            const elements = Array.from(document.querySelectorAll(`${selector}:not([${attribute}])`));
+            const snapshots = elements.map(element => [element.innerHTML, listingLink(element)]);
+            elements.forEach(element => element.setAttribute(attribute, ""));
+            return snapshots;
+        }""",
+        [css_selector, SEEN_ATTRIBUTE],
+    )
 
-            # Step 5.4: Process the temporary file with crawl4ai
-            temp_file_path_fixed = temp_file_path.replace('\\', '/')
-            temp_file_url = f"file://{temp_file_path_fixed}"
-            print(f"[INFO] Element {idx + 1}: Processing temporary file URL: {temp_file_url}")
 
-            try:
-                result = await crawler.arun(
-                    url=temp_file_url,
-                    config=CrawlerRunConfig(
-                        cache_mode="BYPASS",
-                        extraction_strategy=llm_strategy,
-                        css_selector="",
-                        session_id=session_id,
-                    ),
-                )
-                print(f"[INFO] Element {idx + 1}: crawl4ai processing completed (success: {result.success})")
-            except Exception as e:
-                print(f"[ERROR] Element {idx + 1}: crawl4ai processing failed: {e}")
-                os.unlink(temp_file_path)
-                continue
+async def collect_new_listings(
+    page, css_selector: str, first_idx: int
+) -> Tuple[List[Tuple[int, str, Optional[str]]], int]:
+    """
+    Collects the HTML and link of the listing elements that have not been handled yet and
+    marks them in the DOM, so the next call after a scroll only sees the listings that were
+    added. Elements are numbered from `first_idx`. Returns the new (element index, element
+    HTML, link) listings and the number of elements that were looked at. Listings shown
+    twice are left to `process_listings`, which knows every listing of the run.
+    """
+    # Step 4: Snapshot the car listing elements that were not handled yet
+    try:
+        with metrics.time("snapshot"):
+            snapshots = await snapshot_listings(page, css_selector)
+        log(INFO, "Found new elements", count=len(snapshots), selector=css_selector)
+    except Exception as e:
+        log(ERROR, "Failed to snapshot elements", selector=css_selector, error=e)
+        return [], 0
+
+    listings = []
+    for position, (element_html, href) in enumerate(snapshots):
+        idx = first_idx + position
+        log(DEBUG, "HTML extracted", element=idx + 1, length=len(element_html), link=href)
+        listings.append((idx, element_html, href))
+
+    return listings, len(snapshots)
+
+
+async def load_more_listings(page, css_selector: str, load_more_selector: Optional[str], wait_ms: int) -> bool:
+    """
+    Scrolls to the bottom of the page (and clicks `load_more_selector` when the site
+    paginates with a button) and waits up to `wait_ms` for listings that were not handled yet.
+    Returns False when none appeared.
+    """
+    try:
+        await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+        if load_more_selector:
+            load_more = await page.query_selector(load_more_selector)
+            if load_more is not None:
+                await load_more.click()
+        await page.wait_for_function(
+            "([selector, attribute]) => document.querySelector(`${selector}:not([${attribute}])`) !== null",
+            arg=[css_selector, SEEN_ATTRIBUTE],
+            timeout=wait_ms,
+        )
+        return True
+    except Exception as e:
+        log(INFO, "No new listings appeared after scrolling", reason=e)
+        return False
+
+
+async def process_listings(
+    listings: List[Tuple[int, str, Optional[str]]],
+    llm_strategy: LLMExtractionStrategy,
+    required_keys: List[str],
+    seen_listings: ListingDedup,
+    batch_size: int = 1,
+    batch_retries: int = 1,
+    max_concurrency: int = 1,
+    extraction_cache: Optional[ExtractionCache] = None,
+    rule_extractor: Optional[RuleExtractor] = None,
+    listing_index: Optional[ListingIndex] = None,
+    text_reducer: Optional[TextReducer] = None,
+    request_scheduler: Optional[RequestScheduler] = None,
+    model_cascade: Optional[ModelCascade] = None,
+    base_url: str = "",
+) -> List[dict]:
+    """
+    Extracts a car from every (element index, element HTML, link) listing and returns the
+    complete, non-duplicate cars in element order. A listing is identified by its link,
+    resolved against `base_url`, the page it was found on (see `link_key`), or by its
+    HTML when it has none (see `listing_key`).
+
+    Every listing is first claimed in `seen_listings` by its identity, so a listing shown
+    twice, on another search URL or to another worker is only extracted once. The claim
+    is released when no car came out of the listing. A car that is a near-duplicate of a
+    listing from an earlier run is counted as relisted; near-duplicates within the run
+    are different cars and all kept.
+
+    With a `model_cascade`, listings go to its cheaper models first and only reach
+    `llm_strategy` when those gave no car the listing backs up.
+    """
+    # Step 5: Skip listings that were already claimed in this run
+    keys = {}
+    claimed_listings = []
+    for idx, element_html, href in listings:
+        key = link_key(href, base_url) if href else listing_key(element_html, base_url)
+        if not seen_listings.claim(key):
+            metrics.count("duplicate_listings")
+            log(DEBUG, "Skipped (listing already handled)", element=idx + 1, key=key)
+            continue
+        keys[idx] = key
+        claimed_listings.append((idx, element_html))
+    listings = claimed_listings
+
+    # Step 6: Resolve listings without the LLM where possible: first listings that did not
+    # change since an earlier run, then the cache of earlier runs, then the rule-based fast path
+    indexed_cars = {}
+    cached_cars = {}
+    rule_cars = {}
+    pending_listings = []
+    for idx, element_html in listings:
+        car = listing_index.observe(element_html, key=keys[idx]) if listing_index is not None else None
+        if car is not None:
+            indexed_cars[idx] = car
+            log(DEBUG, "Unchanged since the last run", element=idx + 1, car=car)
+            continue
+        car = extraction_cache.get(element_html) if extraction_cache is not None else None
+        if car is not None:
+            cached_cars[idx] = car
+            log(DEBUG, "Loaded car from extraction cache", element=idx + 1, car=car)
+            continue
+        car = rule_extractor.extract(element_html) if rule_extractor is not None else None
+        if car is not None:
+            rule_cars[idx] = car
+            log(DEBUG, "Extracted car with rules", element=idx + 1, car=car)
+            continue
+        pending_listings.append((idx, element_html))
+    metrics.count("skipped_unchanged", len(indexed_cars))
+    metrics.count("skipped_cached", len(cached_cars))
+    metrics.count("skipped_rules", len(rule_cars))
+    metrics.count("sent_to_llm", len(pending_listings))
+    log(
+        INFO,
+        "Resolved listings",
+        unchanged=len(indexed_cars),
+        cached=len(cached_cars),
+        rules=len(rule_cars),
+        llm=len(pending_listings),
+    )
+    resolved_cars = {**indexed_cars, **cached_cars, **rule_cars}
+    html_by_idx = dict(listings)
+
+    # Step 7: Extract, post-process and dedup the listings concurrently
+    if batch_size > 1:
+        units = [
+            pending_listings[start:start + batch_size]
+            for start in range(0, len(pending_listings), batch_size)
+        ]
+
+        async def extract_with(strategy, element_htmls, label, is_final=True):
+            # Listings a cheaper model failed on are escalated rather than retried
+            return await extract_car_batch(
+                element_htmls,
+                strategy,
+                required_keys,
+                batch_retries if is_final else 0,
+                label,
+                text_reducer,
+                request_scheduler,
+            )
 
-            # Step 5.5: Clean up temporary file
-            try:
-                os.unlink(temp_file_path)
-                print(f"[INFO] Element {idx + 1}: Temporary file deleted: {temp_file_path}")
-            except Exception as e:
-                print(f"[ERROR] Element {idx + 1}: Failed to delete temporary file {temp_file_path}: {e}")
+        def unit_label(unit):
+            return f"Elements {unit[0][0] + 1}-{unit[-1][0] + 1}"
+    else:
+        units = [[listing] for listing in pending_listings]
+
+        async def extract_with(strategy, element_htmls, label, is_final=True):
+            return [await extract_car(element_htmls[0], strategy, label, text_reducer, request_scheduler)]
+
+        def unit_label(unit):
+            return f"Element {unit[0][0] + 1}"
+
+    # The cascade tier that extracted each car, whose version the car is cached under
+    car_versions = {}
+
+    async def extract_unit(unit):
+        element_htmls = [element_html for _, element_html in unit]
+        label = unit_label(unit)
+        if model_cascade is None:
+            return await extract_with(llm_strategy, element_htmls, label)
+
+        def extract_tier(strategy, tier_htmls, is_final):
+            return extract_with(strategy, tier_htmls, label, is_final)
+
+        cars, versions = await model_cascade.extract(element_htmls, llm_strategy, required_keys, extract_tier, label)
+        for (idx, _), version in zip(unit, versions):
+            car_versions[idx] = version
+        return cars
+
+    units.extend([(idx, html_by_idx[idx])] for idx in resolved_cars)
+
+    async def extract_unit_or_cached(unit):
+        if unit[0][0] in resolved_cars:
+            return [resolved_cars[unit[0][0]]]
+        return await extract_unit(unit)
+
+    valid_idxs = set()
+
+    def store_car(idx, car):
+        valid_idxs.add(idx)
+        if extraction_cache is not None and idx not in resolved_cars:
+            extraction_cache.put(html_by_idx[idx], car, version=car_versions.get(idx))
+        if listing_index is not None and idx not in indexed_cars:
+            listing_index.record(html_by_idx[idx], car, key=keys[idx])
+        # Counted, not dropped: a near-duplicate claimed in this run is another live listing,
+        # e.g. the same trim at another dealer, and one from an earlier run is gone
+        previous_key = seen_listings.relisted_from(keys[idx], html_by_idx[idx], car)
+        if previous_key is not None:
+            metrics.count("relisted_listings")
+            log(INFO, "Relisted car", element=idx + 1, key=keys[idx], previous_key=previous_key)
+        # Every valid car is returned, so its claim counts as saved once the car is flushed
+        seen_listings.track(keys[idx], car)
+
+    cars = await run_extraction_pipeline(units, extract_unit_or_cached, required_keys, max_concurrency, store_car)
+    for idx, key in keys.items():
+        if idx not in valid_idxs:
+            seen_listings.release(key)
+    return cars
 
-            # Step 5.6: Check extraction result
-            if not (result.success and result.extracted_content):
-                print(f"[ERROR] Element {idx + 1}: Extraction failed: {result.error_message}")
-                continue
-            print(f"[INFO] Element {idx + 1}: Extraction successful, content available")
 
-            # Step 5.7: Parse extracted content
-            try:
-                extracted_data = json.loads(result.extracted_content)
-                print(f"[INFO] Element {idx + 1}: Extracted data: {extracted_data}")
-            except Exception as e:
-                print(f"[ERROR] Element {idx + 1}: Failed to parse extracted content: {e}")
-                continue
+async def fetch_and_process_page(
+    browser_pool: Optional[BrowserPool],
+    base_url: str,
+    css_selector: str,
+    llm_strategy: LLMExtractionStrategy,
+    required_keys: List[str],
+    seen_listings: ListingDedup,
+    batch_size: int = 1,
+    batch_retries: int = 1,
+    max_concurrency: int = 1,
+    extraction_cache: Optional[ExtractionCache] = None,
+    rule_extractor: Optional[RuleExtractor] = None,
+    navigation_profile: Optional[NavigationProfile] = None,
+    listing_index: Optional[ListingIndex] = None,
+    text_reducer: Optional[TextReducer] = None,
+    request_scheduler: Optional[RequestScheduler] = None,
+    model_cascade: Optional[ModelCascade] = None,
+) -> List[dict]:
+    """
+    Loads the listing page, extracts a car from every listing element and returns the
+    complete, non-duplicate cars. With `batch_size` > 1 the listings are sent to the LLM
+    `batch_size` at a time, which expects a strategy from `get_batch_llm_strategy`.
+    Up to `max_concurrency` LLM requests are in flight at once. Listings found in
+    `extraction_cache` skip the LLM, and newly extracted cars are added to it.
+    Listings that `rule_extractor` can parse on its own skip the LLM as well, and so do
+    listings `listing_index` has seen unchanged in an earlier run. With a `text_reducer`,
+    listings are sent to the LLM as their reduced visible text instead of markdown.
+    Only the initial page load is processed; see `stream_cars` for scrolling.
+    The page is borrowed from `browser_pool`, or from a browser launched for this call
+    when it is None, and opened with `navigation_profile` when one is given.
+    Navigation and LLM requests go through `request_scheduler`'s rate limits and retries
+    when one is given. With a `model_cascade`, cheaper models try the listings first.
+    """
+    log(INFO, "Starting fetch_and_process_page (initial load only)", url=base_url)
+
+    # Step 1: Borrow a page from the shared browser
+    try:
+        async with borrow_page(browser_pool, get_browser_config()) as page:
+            if not await open_listing_page(page, base_url, css_selector, navigation_profile, request_scheduler):
+                return []
+            listings, _ = await collect_new_listings(page, css_selector, 0)
+    except Exception as e:
+        log(ERROR, "Failed to get a browser page", error=e)
+        return []
+
+    all_cars = await process_listings(
+        listings,
+        llm_strategy,
+        required_keys,
+        seen_listings,
+        batch_size,
+        batch_retries,
+        max_concurrency,
+        extraction_cache,
+        rule_extractor,
+        listing_index,
+        text_reducer,
+        request_scheduler,
+        model_cascade,
+        base_url=base_url,
+    )
 
-            # Step 5.8: Determine car object
-            car = extracted_data if isinstance(extracted_data, dict) else extracted_data[0] if extracted_data else None
-            print(f"[INFO] Element {idx + 1}: Car object: {car}")
+    log(INFO, "Extracted cars from the initial page load", cars=len(all_cars))
+    return all_cars
 
-            if not car:
-                print(f"[INFO] Element {idx + 1}: Skipping car: No valid data extracted")
-                continue
 
-            # Step 5.9: Post-process the extracted data
+async def stream_cars(
+    browser_pool: Optional[BrowserPool],
+    base_url: str,
+    css_selector: str,
+    llm_strategy: LLMExtractionStrategy,
+    required_keys: List[str],
+    seen_listings: ListingDedup,
+    max_listings: int,
+    max_scrolls: int,
+    scroll_wait_ms: int,
+    load_more_selector: Optional[str] = None,
+    batch_size: int = 1,
+    batch_retries: int = 1,
+    max_concurrency: int = 1,
+    extraction_cache: Optional[ExtractionCache] = None,
+    rule_extractor: Optional[RuleExtractor] = None,
+    navigation_profile: Optional[NavigationProfile] = None,
+    listing_index: Optional[ListingIndex] = None,
+    text_reducer: Optional[TextReducer] = None,
+    request_scheduler: Optional[RequestScheduler] = None,
+    model_cascade: Optional[ModelCascade] = None,
+) -> AsyncIterator[dict]:
+    """
+    Crawls an infinitely scrolling (or "load more" paginated) listing page and yields
+    cars as they are extracted.
+
+    A loader task keeps scrolling and collecting the listings that were added since the
+    previous scroll, while the listings it already found are being extracted. Loading stops
+    after `max_listings` listings, after `max_scrolls` scrolls, or when a scroll brings no
+    new listings within `scroll_wait_ms`. The browser and extraction options are the
+    same as for `fetch_and_process_page`.
+
+    Raises `CrawlError` when the page did not load or the crawl broke off, after the cars
+    extracted until then were yielded, so callers can tell a failed crawl from an empty one.
+    """
+    log(INFO, "Starting stream_cars", url=base_url, max_listings=max_listings)
+    listing_queue = asyncio.Queue()
+    extracted_count = 0
+
+    # Step 1: Borrow a page from the shared browser
+    try:
+        async with borrow_page(browser_pool, get_browser_config()) as page:
+            if not await open_listing_page(page, base_url, css_selector, navigation_profile, request_scheduler):
+                raise CrawlError(f"Failed to load listings from {base_url}")
+
+            async def load():
+                next_idx = 0
+                collected = 0
+                try:
+                    for scroll in range(max_scrolls + 1):
+                        if scroll > 0 and not await load_more_listings(page, css_selector, load_more_selector, scroll_wait_ms):
+                            break
+                        listings, element_count = await collect_new_listings(page, css_selector, next_idx)
+                        next_idx += element_count
+                        listings = listings[:max_listings - collected]
+                        collected += len(listings)
+                        if listings:
+                            log(INFO, "New listings", scroll=scroll, new=len(listings), total=collected)
+                            listing_queue.put_nowait(listings)
+                        if collected >= max_listings:
+                            log(INFO, "Reached the listing limit", max_listings=max_listings)
+                            break
+                finally:
+                    listing_queue.put_nowait(None)
+
+            loader = asyncio.create_task(load())
             try:
-                if "year" in car:
-                    car["year"] = int(car["year"])
-                    print(f"[INFO] Element {idx + 1}: Post-processed 'year': {car['year']}")
-                if "price" in car:
-                    car["price"] = car["price"].split(" or ")[0].strip().replace("SALE", "").strip()
-                    print(f"[INFO] Element {idx + 1}: Post-processed 'price': {car['price']}")
-                if "kilometers" in car and "km" not in car["kilometers"]:
-                    car["kilometers"] = f"{car['kilometers']} km"
-                    print(f"[INFO] Element {idx + 1}: Post-processed 'kilometers': {car['kilometers']}")
-            except Exception as e:
-                print(f"[ERROR] Element {idx + 1}: Error post-processing car data: {e}")
-                continue
-
-            # Step 5.10: Check for extraction error
-            if car.get("error") is True:
-                print(f"[INFO] Element {idx + 1}: Skipping car due to extraction error (error: {car.get('error')})")
-                continue
-            print(f"[INFO] Element {idx + 1}: No extraction error (error: {car.get('error', 'not present')})")
-
-            # Step 5.11: Check for required keys
-            if not all(key in car for key in required_keys):
-                print(f"[INFO] Element {idx + 1}: Skipping car: Missing required keys. Car: {car}")
-                continue
-            print(f"[INFO] Element {idx + 1}: All required keys present: {required_keys}")
-
-            # Step 5.12: Check for duplicates
-            car_identifier = f"{car['year']}_{car['name']}"
-            if car_identifier in seen_names:
-                print(f"[INFO] Element {idx + 1}: Duplicate car '{car_identifier}' skipped")
-                continue
-            seen_names.add(car_identifier)
-            print(f"[INFO] Element {idx + 1}: Added car identifier to seen_names: {car_identifier}")
-
-            # Step 5.13: Add car to list
-            all_cars.append(car)
-            print(f"[INFO] Element {idx + 1}: Car added to all_cars: {car}")
-
-        # Step 6: Close browser
-        try:
-            await browser.close()
-            print("[INFO] Browser closed successfully")
-        except Exception as e:
-            print(f"[ERROR] Failed to close browser: {e}")
-
-    print(f"[INFO] Extracted {len(all_cars)} cars from the initial page load")
-    return all_cars  
+                while True:
+                    listings = await listing_queue.get()
+                    if listings is None:
+                        break
+                    for car in await process_listings(
+                        listings,
+                        llm_strategy,
+                        required_keys,
+                        seen_listings,
+                        batch_size,
+                        batch_retries,
+                        max_concurrency,
+                        extraction_cache,
+                        rule_extractor,
+                        listing_index,
+                        text_reducer,
+                        request_scheduler,
+                        model_cascade,
+                        base_url=base_url,
+                    ):
+                        extracted_count += 1
+                        yield car
+                # Raises what stopped the loader, e.g. a page that crashed while scrolling
+                await loader
+            finally:
+                loader.cancel()
+                await asyncio.gather(loader, return_exceptions=True)
+    except CrawlError:
+        raise
+    except Exception as e:
+        log(ERROR, "Crawl failed", url=base_url, cars=extracted_count, error=e)
+        raise CrawlError(f"Crawl of {base_url} failed after {extracted_count} cars: {e}") from e
+
+    log(INFO, "Extracted cars while scrolling", url=base_url, cars=extracted_count)
 
 # Example usage
 async def main():
-    crawler = AsyncWebCrawler(get_browser_config())
     base_url = "https://www.clutch.ca/cars"  # Adjust as needed
     css_selector = ".vehicle-listing"  # Adjust based on actual HTML structure
     llm_strategy = get_llm_strategy()
-    session_id = "session_123"
     required_keys = ["year", "name", "kilometers", "price"]
-    seen_names = set()
+    seen_listings = ListingDedup(":memory:", 10000, 0.001, 3)
 
     cars = await fetch_and_process_page(
-        crawler, base_url, css_selector, llm_strategy, session_id, required_keys, seen_names
+        None, base_url, css_selector, llm_strategy, required_keys, seen_listings
     )
 
     # Save to CSV or process as needed
-    import csv
-    with open("complete_cars.csv", "w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=required_keys)
-        writer.writeheader()
-        writer.writerows(cars)
+    save_cars_to_csv(cars, "complete_cars.csv")
 
 if __name__ == "__main__":
     import asyncio
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
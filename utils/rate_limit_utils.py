@@ -0,0 +1,265 @@
+import asyncio
+import random
+import re
+import time
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+
+from utils.metrics_utils import ERROR, INFO, log, metrics
+
+T = TypeVar("T")
+
+THROTTLE_PATTERN = re.compile(r"rate.?limit|too many requests|\b429\b|quota", re.IGNORECASE)
+
+
+class ThrottledError(Exception):
+    """
+    The endpoint refused a request because of its rate limit (HTTP 429 and the like).
+    `retry_after` is the number of seconds the endpoint asked to wait, when it said.
+    """
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def is_throttle_error(error: Exception) -> bool:
+    """
+    Whether `error` means the endpoint is throttling: a `ThrottledError`, an exception
+    with a 429 status (litellm's RateLimitError has one), or a message saying so.
+    """
+    if isinstance(error, ThrottledError):
+        return True
+    if getattr(error, "status_code", None) == 429 or "RateLimit" in type(error).__name__:
+        return True
+    return bool(THROTTLE_PATTERN.search(str(error)))
+
+
+def raise_for_status(response, url: str) -> None:
+    """
+    Raises for a response the site throttled (429, 503) or failed (other 5xx), so the
+    request is retried. Takes Playwright navigation responses and httpx responses. Other
+    responses, and no response at all, pass.
+    """
+    if response is None:
+        return
+    status = getattr(response, "status_code", None) or response.status
+    if status in (429, 503):
+        retry_after = response.headers.get("retry-after", "")
+        raise ThrottledError(
+            f"{url} answered {status}",
+            float(retry_after) if retry_after.replace(".", "", 1).isdigit() else None,
+        )
+    if status >= 500:
+        raise RuntimeError(f"{url} answered {status}")
+
+
+class TokenBucket:
+    """
+    Allows `per_minute` units a minute on average, in bursts of up to `capacity` units.
+    A rate of 0 disables the bucket.
+    """
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        self.rate = per_minute / 60
+        self.capacity = capacity if capacity is not None else max(1.0, per_minute / 60)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self, amount: float = 1) -> float:
+        """Waits until `amount` units are available and takes them. Returns the seconds waited."""
+        if not self.rate:
+            return 0.0
+        # A request larger than a full bucket would never fit; it waits for a full bucket instead
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return waited
+                delay = (amount - self.tokens) / self.rate
+                await asyncio.sleep(delay)
+                waited += delay
+
+
+class AdaptiveConcurrency:
+    """
+    Concurrency limit adjusted with AIMD, like TCP congestion control: every request that
+    finishes quickly while all slots were taken adds 1/limit (about one more slot per
+    round of requests), and a throttled request, or one slower than `latency_tolerance`
+    times the fastest recent one, halves the limit. The limit stays between `min_limit`
+    and `max_limit`, and is lowered at most once per round trip so a burst of 429s counts
+    as one signal.
+    """
+
+    def __init__(self, max_limit: int, min_limit: int = 1, latency_tolerance: float = 3.0):
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.latency_tolerance = latency_tolerance
+        self.limit = float(self.max_limit)
+        self.in_flight = 0
+        self.latency_floor = None
+        self.decreased_at = 0.0
+        self.condition = asyncio.Condition()
+
+    async def __aenter__(self):
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+        return self
+
+    async def __aexit__(self, *exc_info):
+        async with self.condition:
+            self.in_flight -= 1
+            self.condition.notify_all()
+
+    @property
+    def saturated(self) -> bool:
+        return self.in_flight >= int(self.limit)
+
+    def on_success(self, latency: float, saturated: bool) -> None:
+        """
+        Adjusts the limit after a successful request. Only a request that ran while every
+        slot was taken says the limit can grow; otherwise the limit was not what held
+        the requests back.
+        """
+        # The floor creeps up by 1% a request, so it follows a provider that got slower for good
+        self.latency_floor = latency if self.latency_floor is None else min(latency, self.latency_floor * 1.01)
+        if latency > self.latency_tolerance * self.latency_floor:
+            self.decrease()
+        elif saturated:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+    def decrease(self) -> None:
+        now = time.monotonic()
+        if now - self.decreased_at < (self.latency_floor or 1.0):
+            return
+        self.decreased_at = now
+        self.limit = max(self.min_limit, self.limit / 2)
+
+
+class Endpoint:
+    """
+    One rate-limited endpoint, e.g. the LLM provider or a site's host. Requests go through
+    `run`, which waits for the request and token buckets and a concurrency slot, and
+    retries failed requests with jittered exponential backoff.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        requests_per_minute: float,
+        tokens_per_minute: float,
+        max_concurrency: int,
+        max_retries: int,
+        backoff_base_seconds: float,
+        backoff_max_seconds: float,
+        latency_tolerance: float,
+    ):
+        self.name = name
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute, capacity=tokens_per_minute)
+        self.concurrency = AdaptiveConcurrency(max_concurrency, latency_tolerance=latency_tolerance)
+        self.max_retries = max_retries
+        self.backoff_base_seconds = backoff_base_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self.calls = 0
+        self.retries = 0
+        self.throttled = 0
+        self.failures = 0
+        self.wait_seconds = 0.0
+
+    def backoff(self, attempt: int, error: Exception) -> float:
+        """Full jitter: a random delay up to base * 2^attempt, or at least what the endpoint asked for."""
+        delay = random.uniform(0, min(self.backoff_max_seconds, self.backoff_base_seconds * 2 ** attempt))
+        retry_after = getattr(error, "retry_after", None)
+        return max(delay, retry_after) if retry_after else delay
+
+    async def run(self, call: Callable[[], Awaitable[T]], tokens: float = 0, label: str = "") -> T:
+        """
+        Runs `call` within the endpoint's limits and returns its result. `tokens` is the
+        request's estimated token count, for the tokens-per-minute bucket. Raises the last
+        error once `max_retries` retries failed.
+        """
+        for attempt in range(self.max_retries + 1):
+            waited = await self.requests.acquire()
+            if tokens:
+                waited += await self.tokens.acquire(tokens)
+            if waited:
+                self.wait_seconds += waited
+                metrics.observe(f"{self.name}_rate_limit_wait", waited)
+
+            self.calls += 1
+            async with self.concurrency:
+                saturated = self.concurrency.saturated
+                start = time.monotonic()
+                try:
+                    result = await call()
+                except Exception as e:
+                    error = e
+                else:
+                    self.concurrency.on_success(time.monotonic() - start, saturated)
+                    return result
+
+            if is_throttle_error(error):
+                self.throttled += 1
+                metrics.count(f"{self.name}_throttled")
+                self.concurrency.decrease()
+            if attempt == self.max_retries:
+                break
+            self.retries += 1
+            metrics.count(f"{self.name}_retries")
+            delay = self.backoff(attempt, error)
+            log(INFO, "Retrying request", endpoint=self.name, label=label, attempt=attempt + 1, delay=round(delay, 2), error=error)
+            await asyncio.sleep(delay)
+
+        self.failures += 1
+        metrics.count(f"{self.name}_failures")
+        log(ERROR, "Request failed after retries", endpoint=self.name, label=label, attempts=self.max_retries + 1, error=error)
+        raise error
+
+
+class RequestScheduler:
+    """
+    Shared by every crawl in the process: the LLM endpoint, and one endpoint per site host
+    created on first use with the same site limits.
+    """
+
+    def __init__(
+        self,
+        llm_requests_per_minute: float,
+        llm_tokens_per_minute: float,
+        llm_max_concurrency: int,
+        site_requests_per_minute: float,
+        site_max_concurrency: int,
+        max_retries: int,
+        backoff_base_seconds: float,
+        backoff_max_seconds: float,
+        latency_tolerance: float,
+    ):
+        self.retry_settings = (max_retries, backoff_base_seconds, backoff_max_seconds, latency_tolerance)
+        self.site_limits = (site_requests_per_minute, site_max_concurrency)
+        self.llm = Endpoint("llm", llm_requests_per_minute, llm_tokens_per_minute, llm_max_concurrency, *self.retry_settings)
+        self.sites: Dict[str, Endpoint] = {}
+
+    def site(self, host: str) -> Endpoint:
+        endpoint = self.sites.get(host)
+        if endpoint is None:
+            requests_per_minute, max_concurrency = self.site_limits
+            endpoint = self.sites[host] = Endpoint("site", requests_per_minute, 0, max_concurrency, *self.retry_settings)
+        return endpoint
+
+    def show_stats(self) -> None:
+        """Print the requests, retries and throttling of every endpoint, and where AIMD left its limit."""
+        print("\n=== Request Scheduler Summary ===")
+        print(f"{'Endpoint':<28} {'Calls':>7} {'Retries':>8} {'429s':>6} {'Failed':>7} {'Waited (s)':>11} {'Limit':>6}")
+        print("-" * 78)
+        for name, endpoint in [("llm", self.llm)] + sorted(self.sites.items()):
+            print(
+                f"{name[:28]:<28} {endpoint.calls:>7,} {endpoint.retries:>8,} {endpoint.throttled:>6,} "
+                f"{endpoint.failures:>7,} {endpoint.wait_seconds:>11.1f} {endpoint.concurrency.limit:>6.1f}"
+            )
@@ -0,0 +1,103 @@
+import re
+from html.parser import HTMLParser
+from typing import List, Optional
+
+from models.car import Car
+
+TITLE_PATTERN = re.compile(r"^((?:19|20)\d{2})\s+(\S.*)$")
+KILOMETERS_PATTERN = re.compile(r"^\d{1,3}(?:,\d{3})*\s*km$", re.IGNORECASE)
+PRICE_PATTERN = re.compile(r"^\$\d{1,3}(?:,\d{3})*$")
+
+
+class _TextCollector(HTMLParser):
+    """
+    Collects the visible text nodes of an HTML fragment, in document order.
+    """
+
+    SKIPPED_TAGS = {"script", "style", "svg", "noscript"}
+
+    def __init__(self, skipped_tags=None):
+        super().__init__()
+        self.skipped_tags = self.SKIPPED_TAGS if skipped_tags is None else skipped_tags
+        self.texts = []
+        self.skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.skipped_tags:
+            self.skip_depth += 1
+
+    def handle_endtag(self, tag):
+        if tag in self.skipped_tags and self.skip_depth:
+            self.skip_depth -= 1
+
+    def handle_data(self, data):
+        text = " ".join(data.split())
+        if text and not self.skip_depth:
+            self.texts.append(text)
+
+
+def visible_texts(html: str, skipped_tags: Optional[set] = None) -> List[str]:
+    """
+    Visible text nodes of `html`. `skipped_tags` replaces the tags whose text is never
+    visible, for callers that want to drop more.
+    """
+    collector = _TextCollector(skipped_tags)
+    collector.feed(html)
+    collector.close()
+    return collector.texts
+
+
+def extract_car_with_rules(element_html: str) -> Optional[dict]:
+    """
+    Extracts a car from a listing element with fixed patterns instead of the LLM.
+
+    A field is only trusted when exactly one text node matches its pattern, e.g. a listing
+    showing both a struck-through and a sale price is ambiguous. Returns None whenever
+    a field is missing or ambiguous, or the result does not validate against `Car`, so the
+    listing can be sent to the LLM instead.
+    """
+    titles, kilometers, prices = [], [], []
+    for text in visible_texts(element_html):
+        if TITLE_PATTERN.match(text):
+            titles.append(text)
+        elif KILOMETERS_PATTERN.match(text):
+            kilometers.append(text)
+        elif PRICE_PATTERN.match(text):
+            prices.append(text)
+
+    if len(set(titles)) != 1 or len(set(kilometers)) != 1 or len(set(prices)) != 1:
+        return None
+
+    year, name = TITLE_PATTERN.match(titles[0]).groups()
+    try:
+        car = Car(year=int(year), name=name, kilometers=kilometers[0], price=prices[0])
+    except Exception:
+        return None
+    return car.model_dump()
+
+
+class RuleExtractor:
+    """
+    Fast path in front of the LLM that keeps track of how many listings it resolved.
+    """
+
+    def __init__(self):
+        self.fast_path = 0
+        self.fallbacks = 0
+
+    def extract(self, element_html: str) -> Optional[dict]:
+        car = extract_car_with_rules(element_html)
+        if car is None:
+            self.fallbacks += 1
+        else:
+            self.fast_path += 1
+        return car
+
+    def show_stats(self) -> None:
+        """Print how many listings were extracted by rules and how many fell back to the LLM."""
+        total = self.fast_path + self.fallbacks
+        print("\n=== Rule Fast Path Summary ===")
+        print(f"{'Type':<15} {'Count':>12} {'Ratio':>8}")
+        print("-" * 37)
+        print(f"{'Fast path':<15} {self.fast_path:>12,} {self.fast_path / total if total else 0.0:>8.1%}")
+        print(f"{'LLM fallback':<15} {self.fallbacks:>12,} {self.fallbacks / total if total else 0.0:>8.1%}")
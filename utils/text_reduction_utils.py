@@ -0,0 +1,106 @@
+import re
+from typing import List
+
+from utils.rule_extraction_utils import _TextCollector, visible_texts
+
+# Struck-through text is an old price, never the one to extract
+REDUCED_SKIPPED_TAGS = _TextCollector.SKIPPED_TAGS | {"s", "del", "strike"}
+
+# Text nodes that never hold a `Car` field: payment plans, financing and tax notes
+BOILERPLATE_PATTERN = re.compile(
+    r"/\s*(?:bi-?weekly|weekly|wk|mo|month)\b|\bper (?:week|month)\b|financ|\bAPR\b|down payment|\+\s*(?:tax|hst|gst)\b",
+    re.IGNORECASE,
+)
+
+_encoding = None
+
+
+def count_tokens(text: str) -> int:
+    """
+    Counts gpt-4o tokens with tiktoken. When the encoding cannot be loaded, e.g. offline,
+    falls back to the usual estimate of four characters per token.
+    """
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+
+            _encoding = tiktoken.encoding_for_model("gpt-4o")
+        except Exception:
+            _encoding = False
+    if _encoding is False:
+        return (len(text) + 3) // 4
+    return len(_encoding.encode(text))
+
+
+def reduce_listing_html(element_html: str) -> str:
+    """
+    Strips a listing element down to the visible text the LLM needs to extract a car,
+    one text node per line. Markup, class names, SVGs and scripts are dropped with the
+    tags, struck-through old prices are dropped, and so is the payment and financing text
+    matched by `BOILERPLATE_PATTERN`.
+    """
+    lines = []
+    for text in visible_texts(element_html, REDUCED_SKIPPED_TAGS):
+        if BOILERPLATE_PATTERN.search(text):
+            continue
+        if lines and lines[-1] == text:
+            continue
+        lines.append(text)
+    return "\n".join(lines)
+
+
+def reduce_listing_batch(element_htmls: List[str]) -> str:
+    """
+    Packs several reduced listings into one text, each introduced by the same
+    'LISTING <n>' heading as `build_batch_html`.
+    """
+    return "\n\n".join(
+        f"## LISTING {position}\n{reduce_listing_html(element_html)}"
+        for position, element_html in enumerate(element_htmls)
+    )
+
+
+class TextReducer:
+    """
+    Reduction stage in front of the LLM that keeps track of how many tokens it sent.
+
+    With `report_tokens`, the caller also converts every listing to the markdown that
+    would have been sent without reduction and passes it to `add_baseline`, so the summary
+    can compare tokens before and after. That conversion costs more than the reduction
+    itself, so it is off by default.
+    """
+
+    def __init__(self, report_tokens: bool = False):
+        self.report_tokens = report_tokens
+        self.listings = 0
+        self.tokens_before = 0
+        self.tokens_after = 0
+
+    def reduce(self, element_htmls: List[str], batch: bool) -> str:
+        """
+        Reduces one listing, or several as a batch with 'LISTING <n>' headings.
+        """
+        text = reduce_listing_batch(element_htmls) if batch else reduce_listing_html(element_htmls[0])
+        self.listings += len(element_htmls)
+        self.tokens_after += count_tokens(text)
+        return text
+
+    def add_baseline(self, markdown: str) -> None:
+        """Counts the markdown the reduced listings replaced, when `report_tokens` is set."""
+        self.tokens_before += count_tokens(markdown)
+
+    def show_stats(self) -> None:
+        """Print the tokens sent per listing, and before reduction when they were measured."""
+        print("\n=== Text Reduction Summary ===")
+        print(f"{'Type':<25} {'Value':>12}")
+        print("-" * 38)
+        print(f"{'Listings':<25} {self.listings:>12,}")
+        after = self.tokens_after / self.listings if self.listings else 0.0
+        if self.report_tokens:
+            before = self.tokens_before / self.listings if self.listings else 0.0
+            print(f"{'Tokens/listing before':<25} {before:>12,.1f}")
+            print(f"{'Tokens/listing after':<25} {after:>12,.1f}")
+            print(f"{'Reduction':<25} {1 - after / before if before else 0.0:>12.1%}")
+        else:
+            print(f"{'Tokens/listing':<25} {after:>12,.1f}")
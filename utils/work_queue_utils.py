@@ -0,0 +1,162 @@
+import json
+import os
+import socket
+import sqlite3
+import time
+from typing import Optional
+
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+
+def default_worker_id(pid: Optional[int] = None) -> str:
+    """Identifies a worker process across hosts: the host name and the process id (this process's by default)."""
+    return f"{socket.gethostname()}-{pid or os.getpid()}"
+
+
+class WorkUnit:
+    """
+    A unit of crawl work leased from the queue, e.g. one search URL.
+    """
+
+    def __init__(self, unit_id: int, kind: str, payload: dict, attempts: int):
+        self.unit_id = unit_id
+        self.kind = kind
+        self.payload = payload
+        self.attempts = attempts
+
+
+class WorkQueue:
+    """
+    Durable work queue in a SQLite file, shared by every worker process that opens it.
+
+    A worker leases a unit for `lease_seconds` and acknowledges it once it is done. A unit
+    whose lease runs out, because its worker crashed or hung, is handed to the next worker
+    that asks, and a unit that was leased `max_attempts` times without being acknowledged
+    is marked as failed. Workers on other hosts share the queue by opening the same file
+    on a shared file system whose locking SQLite can rely on.
+    """
+
+    def __init__(self, path: str, lease_seconds: float, max_attempts: int):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max(1, max_attempts)
+        self.leased = 0
+        self.acked = 0
+        self.failed = 0
+
+        # Transactions are started explicitly, so a lease is taken under a write lock
+        self.connection = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS work_units ("
+            "unit_id INTEGER PRIMARY KEY, kind TEXT NOT NULL, payload TEXT NOT NULL, "
+            "status TEXT NOT NULL, lease_owner TEXT, lease_expires_at REAL, "
+            "attempts INTEGER NOT NULL DEFAULT 0, error TEXT, UNIQUE (kind, payload))"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS work_units_status ON work_units (status)")
+
+    def reset(self) -> None:
+        """Drops every unit, e.g. before a run that should not resume the previous one."""
+        self.connection.execute("DELETE FROM work_units")
+
+    def enqueue(self, kind: str, payload: dict) -> None:
+        """Adds a unit. A unit that is already queued, whatever its status, is not added again."""
+        self.connection.execute(
+            "INSERT OR IGNORE INTO work_units (kind, payload, status) VALUES (?, ?, ?)",
+            (kind, json.dumps(payload, sort_keys=True), PENDING),
+        )
+
+    def lease(self, worker_id: str) -> Optional[WorkUnit]:
+        """
+        Leases the oldest pending unit, or a unit whose lease has expired, to `worker_id`.
+        Returns None when no unit is available right now.
+        """
+        now = time.time()
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            # Units that used up their attempts and whose last lease expired are given up on
+            cursor = self.connection.execute(
+                "UPDATE work_units SET status = ?, lease_owner = NULL, error = 'lease expired' "
+                "WHERE status = ? AND lease_expires_at < ? AND attempts >= ?",
+                (FAILED, LEASED, now, self.max_attempts),
+            )
+            self.failed += cursor.rowcount
+            row = self.connection.execute(
+                "SELECT unit_id, kind, payload, attempts FROM work_units "
+                "WHERE status = ? OR (status = ? AND lease_expires_at < ?) ORDER BY unit_id LIMIT 1",
+                (PENDING, LEASED, now),
+            ).fetchone()
+            if row is not None:
+                self.connection.execute(
+                    "UPDATE work_units SET status = ?, lease_owner = ?, lease_expires_at = ?, "
+                    "attempts = attempts + 1 WHERE unit_id = ?",
+                    (LEASED, worker_id, now + self.lease_seconds, row[0]),
+                )
+            self.connection.execute("COMMIT")
+        except Exception:
+            self.connection.execute("ROLLBACK")
+            raise
+
+        if row is None:
+            return None
+        self.leased += 1
+        return WorkUnit(row[0], row[1], json.loads(row[2]), row[3] + 1)
+
+    def extend_lease(self, unit: WorkUnit, worker_id: str) -> bool:
+        """
+        Renews the lease of a unit that is still being worked on. Returns False when the
+        lease was lost, i.e. the unit expired and was handed to another worker.
+        """
+        cursor = self.connection.execute(
+            "UPDATE work_units SET lease_expires_at = ? WHERE unit_id = ? AND status = ? AND lease_owner = ?",
+            (time.time() + self.lease_seconds, unit.unit_id, LEASED, worker_id),
+        )
+        return cursor.rowcount == 1
+
+    def ack(self, unit: WorkUnit, worker_id: str) -> None:
+        cursor = self.connection.execute(
+            "UPDATE work_units SET status = ?, lease_owner = NULL, error = NULL "
+            "WHERE unit_id = ? AND status = ? AND lease_owner = ?",
+            (DONE, unit.unit_id, LEASED, worker_id),
+        )
+        if cursor.rowcount == 1:
+            self.acked += 1
+
+    def fail(self, unit: WorkUnit, worker_id: str, error: str) -> None:
+        """
+        Returns a unit to the queue after a failed attempt, or marks it as failed once it
+        has used up its attempts.
+        """
+        status = FAILED if unit.attempts >= self.max_attempts else PENDING
+        cursor = self.connection.execute(
+            "UPDATE work_units SET status = ?, lease_owner = NULL, error = ? "
+            "WHERE unit_id = ? AND status = ? AND lease_owner = ?",
+            (status, error, unit.unit_id, LEASED, worker_id),
+        )
+        if cursor.rowcount == 1 and status == FAILED:
+            self.failed += 1
+
+    def counts(self) -> dict:
+        counts = {PENDING: 0, LEASED: 0, DONE: 0, FAILED: 0}
+        for status, count in self.connection.execute("SELECT status, COUNT(*) FROM work_units GROUP BY status"):
+            counts[status] = count
+        return counts
+
+    def is_drained(self) -> bool:
+        """True once every unit is either done or failed."""
+        counts = self.counts()
+        return counts[PENDING] == 0 and counts[LEASED] == 0
+
+    def show_stats(self) -> None:
+        """Print how many units are in each state."""
+        counts = self.counts()
+        print("\n=== Work Queue Summary ===")
+        print(f"{'Status':<15} {'Count':>12}")
+        print("-" * 30)
+        for status in (PENDING, LEASED, DONE, FAILED):
+            print(f"{status.capitalize():<15} {counts[status]:>12,}")
+
+    def close(self) -> None:
+        self.connection.close()